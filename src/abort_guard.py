@@ -0,0 +1,119 @@
+import logging
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunAborted(BaseException):
+    """Ends a run terminated by a signal.
+
+    A ``BaseException``, so the ``except Exception`` around a trigger or a job poll that tolerates a failed request
+    does not swallow it and carry on with the run.
+    """
+
+
+class AbortGuard:
+    """Cancels the refresh jobs a run is waiting for when the run is terminated with SIGTERM or SIGINT.
+
+    Waits register the jobs they wait for with ``watching``; the dictionaries are read when the signal arrives, so
+    jobs that finished and were removed from them in the meantime are not cancelled. Cancel requests are sent in
+    parallel and given ``grace_period`` seconds, then ``RunAborted`` ends the run.
+
+    The signal is handled on the main thread only; work running on other threads calls ``check`` between its steps
+    and ends with ``RunAborted`` there, too, once the run was terminated.
+    """
+
+    SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+    def __init__(self, grace_period, max_workers=16):
+        self.grace_period = grace_period
+        self.max_workers = max_workers
+        self._watched = dict()
+        # re-entrant: the handler runs on the main thread, possibly while that thread holds the lock
+        self._lock = threading.RLock()
+        self._previous_handlers = dict()
+        self._terminated = threading.Event()
+
+    def install(self):
+        """Handle the termination signals; must be called from the main thread."""
+        for signum in self.SIGNALS:
+            self._previous_handlers[signum] = signal.signal(signum, self._handle)
+
+    def uninstall(self):
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_handlers.clear()
+
+    @contextmanager
+    def watching(self, server, jobs, labels=None):
+        """Within the block, the jobs in ``jobs`` (key -> job ID) on ``server`` are cancelled on termination.
+
+        They are reported by their entry in ``labels``, when given, and by their key otherwise.
+        """
+        token = object()
+        with self._lock:
+            self._watched[token] = (server, jobs, labels or {})
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._watched[token]
+
+    def check(self):
+        """Raise ``RunAborted`` if the run was terminated."""
+        if self._terminated.is_set():
+            raise RunAborted("The job was terminated, the work still in progress was stopped.")
+
+    def _handle(self, signum, frame):
+        # set first, so the other threads stop at their next check while the unfinished jobs are cancelled
+        self._terminated.set()
+        with self._lock:
+            unfinished = [
+                (server, labels.get(key, key), job_id)
+                for server, jobs, labels in self._watched.values()
+                for key, job_id in list(jobs.items())
+            ]
+        signal_name = signal.Signals(signum).name
+        if not unfinished:
+            raise RunAborted(f"The job was terminated ({signal_name}) while no refresh job was unfinished.")
+
+        logging.warning(
+            f"The job was terminated ({signal_name}), cancelling {len(unfinished)} unfinished extract refresh jobs."
+        )
+        # Plain threads, not an executor: the signal can interrupt the main thread within an executor's submit,
+        # holding a lock the submit of every executor takes.
+        pending = list(unfinished)
+        cancelled = []
+
+        def cancel_pending():
+            while pending:
+                try:
+                    server, name, job_id = pending.pop()
+                except IndexError:  # taken by another thread meanwhile
+                    return
+                try:
+                    server.jobs.cancel(job_id)
+                except Exception:
+                    continue
+                cancelled.append((name, job_id))
+
+        threads = [threading.Thread(target=cancel_pending, daemon=True) for _ in range(min(len(unfinished), self.max_workers))]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + self.grace_period
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+        cancelled = list(cancelled)  # the jobs cancelled within the grace period; the threads may still add some
+        not_cancelled = [(name, job_id) for _, name, job_id in unfinished if (name, job_id) not in cancelled]
+        message = (
+            f"The job was terminated ({signal_name}). Cancelled {len(cancelled)} of {len(unfinished)} unfinished "
+            f"extract refresh jobs: {', '.join(f'{name!r} ({job_id})' for name, job_id in cancelled) or '-'}."
+        )
+        if not_cancelled:
+            message += (
+                f" These could not be cancelled within {self.grace_period}s and continue in Tableau: "
+                f"{', '.join(f'{name!r} ({job_id})' for name, job_id in not_cancelled)}."
+            )
+        raise RunAborted(message)
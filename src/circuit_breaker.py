@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from refresh_target import RefreshTarget
+
+
+class CircuitBreaker:
+    """Holds back the targets whose refresh keeps failing, letting one probe through every ``probe_interval``.
+
+    A target's failure count is the larger of the ``consecutive_failed_count`` Tableau keeps on its extract refresh
+    task (datasources only) and the failures in a row this component saw, kept in the state under ``STATE_KEY`` by
+    the target's state key. From ``threshold`` failures the breaker is open and the target is not triggered, until
+    ``probe_interval`` has passed since its last attempt: it is then half-open and one trigger probes whether the
+    refresh works again. A success closes it; a failure opens it for another interval.
+    """
+
+    STATE_KEY = "circuit_breaker"
+
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half-open"
+
+    def __init__(self, state, threshold, probe_interval, now):
+        self._history = state.setdefault(self.STATE_KEY, {})
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.now = now
+
+    def failures(self, key, target) -> int:
+        task_failures = 0
+        if target.kind == RefreshTarget.Kind.Datasource:
+            task_failures = int(getattr(target.item, "consecutive_failed_count", 0) or 0)
+        return max(task_failures, self._history.get(key, {}).get("failures", 0))
+
+    def last_attempt_at(self, key, target):
+        """When the target's refresh was last tried, by this component or (as the task's last run) by Tableau."""
+        attempts = [target.last_refreshed_at]
+        if self._history.get(key, {}).get("last_attempt_at"):
+            attempts.append(datetime.fromisoformat(self._history[key]["last_attempt_at"]))
+        attempts = [attempt for attempt in attempts if attempt is not None]
+        return max(attempts) if attempts else None
+
+    def state(self, key, target) -> str:
+        if self.failures(key, target) < self.threshold:
+            return self.Closed
+        last_attempt_at = self.last_attempt_at(key, target)
+        if last_attempt_at and self.now - last_attempt_at < self.probe_interval:
+            return self.Open
+        return self.HalfOpen
+
+    def record(self, key, target):
+        """Count the outcome of ``target`` in this run: a failed trigger or job is a failure, a success clears them."""
+        if target.outcome not in (
+            RefreshTarget.Outcome.Triggered,
+            RefreshTarget.Outcome.Attached,
+            RefreshTarget.Outcome.Failed,
+        ):
+            return
+        entry = self._history.setdefault(key, {"failures": 0})
+        entry["last_attempt_at"] = self.now.isoformat()
+        job = target.job
+        if target.outcome == RefreshTarget.Outcome.Failed or (job and int(job.finish_code) == 1):
+            entry["failures"] = self.failures(key, target) + 1
+        elif job and int(job.finish_code) == 0:
+            del self._history[key]
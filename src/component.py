@@ -3,17 +3,44 @@ Template Component main class.
 
 """
 
+import contextlib
+import copy
+import csv
 import logging
 import os
+import signal
+import sys
+import tempfile
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import UTC, datetime, timedelta
 
 import requests
 import tableauserverclient as tsc
 import xmltodict
 from keboola.component import ComponentBase, UserException
+from keboola.component.base import sync_action
+from keboola.component.sync_actions import MessageType, SelectElement, ValidationResult
 
 # configuration variables
+from abort_guard import AbortGuard, RunAborted
+from circuit_breaker import CircuitBreaker
+from file_cache import FileCache
+from job_completions import JobCompletions
+from job_events import JobEventLog
+from metadata_resolver import MetadataItem, MetadataResolver, MetadataUnavailableError
+from paging import fetch_all_pages
+from refresh_target import RefreshTarget
+from run_checkpoint import RunCheckpoint
+from run_metrics import RunMetrics
+from run_profile import RunProfile
 from tableau_custom.endpoints.tasks_endpoint import TaskCustom
+from target_catalogue import TargetCatalogue
+from task_snapshot import TaskSnapshot
+from traffic_cassette import TrafficRecorder, TrafficReplay
+from trigger_service import TriggerService
 
 # global constants
 
@@ -31,8 +58,38 @@ KEY_DS_TYPE = "type"
 KEY_DATASOURCES = "datasources"
 KEY_WORKBOOKS = "workbooks"
 KEY_SITE_ID = "site_id"
+KEY_SITES = "sites"
 KEY_CONTINUE_ON_ERROR = "continue_on_error"
 KEY_ALREADY_IN_QUEUE_AS_WARNING = "already_in_queue_as_warning"
+KEY_MAX_CONCURRENT_REFRESHES = "max_concurrent_refreshes"
+KEY_MIN_REFRESH_INTERVAL = "min_refresh_interval"
+KEY_INPUT_TABLES = "input_tables"
+KEY_RUN_RESULTS_TABLE = "run_results_table"
+KEY_DATASOURCE_SELECTORS = "datasource_selectors"
+KEY_PROJECT = "project"
+KEY_INCLUDE_SUBPROJECTS = "include_subprojects"
+KEY_RESUME_WINDOW = "resume_window"
+KEY_JOB_EVENTS_FILE = "job_events_file"
+KEY_FAIL_FAST = "fail_fast"
+KEY_CANCEL_ON_FAILURE = "cancel_on_failure"
+KEY_POLL_TIMEOUT = "poll_timeout"
+KEY_MAX_DURATION = "max_duration"
+KEY_CANCEL_OVERDUE_JOBS = "cancel_overdue_jobs"
+KEY_CANCEL_ON_ABORT = "cancel_on_abort"
+KEY_CACHE_TASK_LIST = "cache_task_list"
+KEY_METADATA_API = "metadata_api"
+KEY_DRY_RUN = "dry_run"
+KEY_WEBHOOK_PORT = "webhook_port"
+KEY_WEBHOOK_HOST = "webhook_host"
+KEY_WEBHOOK_RELAY_URL = "webhook_relay_url"
+KEY_METRICS_FILE = "metrics_file"
+KEY_METRICS_PUSH_URL = "metrics_push_url"
+KEY_PROFILE = "profile"
+KEY_CIRCUIT_BREAKER_THRESHOLD = "circuit_breaker_threshold"
+KEY_CIRCUIT_BREAKER_PROBE_INTERVAL = "circuit_breaker_probe_interval"
+KEY_RECORD_TRAFFIC = "record_traffic"
+KEY_REPLAY_TRAFFIC = "replay_traffic"
+KEY_REPLAY_LATENCY_SCALE = "replay_latency_scale"
 
 KEY_AUTH_TYPE = "authentication_type"
 AUTH_NAMES = [KEY_USER_NAME, KEY_TOKEN_NAME]
@@ -42,12 +99,81 @@ MANDATORY_PARS = [AUTH_NAMES, AUTH_SECRETS, KEY_DATASOURCES, KEY_ENDPOINT]
 KEY_LUID_REQUIRED = "luid_required"
 KEY_POLL_MODE_DISABLED = "poll_mode_disabled"
 
+RUN_RESULTS_TABLE_NAME = "run_results.csv"
+JOB_EVENTS_FILE_NAME = "job_events.jsonl"
+METRICS_FILE_NAME = "metrics.prom"
+TRAFFIC_CASSETTE_FILE_NAME = "tableau_traffic.json"
+# values of the profile parameter
+PROFILE_RUN = "run"
+PROFILE_CONNECT_AND_RUN = "connect_and_run"
+RUN_RESULTS_COLUMNS = [
+    "run_id",
+    "run_started_at",
+    "site_id",
+    "kind",
+    "name",
+    "luid",
+    "task_type",
+    "task_id",
+    "job_id",
+    "outcome",
+    "trigger_latency_seconds",
+    "finish_code",
+    "queued_seconds",
+    "run_seconds",
+    "completed_at",
+]
+
+# state keys
+STATE_INPUT_TABLE_CHANGES = "input_table_changes"
+STATE_TASK_SNAPSHOTS = "task_snapshots"
+
 APP_VERSION = "0.0.1"
 
+# The target catalogue behind the LUID dropdowns is kept this long, so reopening a dropdown does not rescan the site.
+CATALOGUE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "tableau-extract-refresh-trigger")
+CATALOGUE_CACHE_TTL_SECONDS = 300
+TASK_TYPE_TITLES = {"refreshextracttask": "Full", "incrementextracttask": "Incremental"}
+
+# A warm run checks the task snapshot against a first page of this many tasks (see _get_site_tasks), and rescans
+# the whole list at least this often, catching a change the check cannot see.
+TASK_SNAPSHOT_SPOT_CHECK_SIZE = 20
+TASK_SNAPSHOT_MAX_AGE = timedelta(hours=24)
+
+# Configured names looked up by one filtered listing; keeps the request URL well within server limits.
+NAME_FILTER_CHUNK_SIZE = 50
+
 # Bounded retry for the very first network call to the Tableau Server (see _connect_to_server).
 CONNECT_MAX_ATTEMPTS = 3
 CONNECT_RETRY_BACKOFF_SECONDS = 2
 
+# Sites of a multi-site configuration processed at the same time, each over its own signed-in session.
+MAX_CONCURRENT_SITES = 4
+
+# Pause between two passes over the jobs being polled, preventing too many requests errors.
+POLL_INTERVAL_SECONDS = 60
+
+# With refresh webhooks, how often arrived events are checked, and how often every job is polled anyway in case
+# its event never comes.
+WEBHOOK_CHECK_INTERVAL_SECONDS = 10
+WEBHOOK_FALLBACK_POLL_SECONDS = 600
+# The webhook listener is not authenticated, so it is only reachable from the host unless webhook_host says otherwise.
+DEFAULT_WEBHOOK_HOST = "127.0.0.1"
+
+# Time the cancel requests sent when the job is terminated get, within the platform's own grace period before a kill.
+ABORT_CANCEL_GRACE_SECONDS = 5
+
+# Minutes between the probes of a target the circuit breaker holds back, unless configured.
+DEFAULT_CIRCUIT_BREAKER_PROBE_INTERVAL = 24 * 60
+
+# The port the trigger service listens on when none is given (see serve).
+SERVICE_PORT = 8080
+SERVE_USAGE = "python src/component.py --serve PATH [PORT]"
+BATCH_USAGE = "python src/component.py --batch PATH..."
+
+# The statuses of a job queued or running in Tableau, as its job listing filters them (see _find_running_jobs).
+RUNNING_JOB_STATUSES = ("Pending", "InProgress")
+
 # How Tableau reports "a refresh for this target is already queued or running" on a refresh
 # trigger (see _is_refresh_already_queued). The code is the one observed in production; the
 # markers are a fallback for deployments/versions that use a different code for the same thing.
@@ -58,8 +184,38 @@ logger = logging.getLogger("tableau.endpoint.tasks")
 
 
 class Component(ComponentBase):
-    def __init__(self):
-        super().__init__(required_parameters=MANDATORY_PARS)
+    # set by run(); reports the state changes of the jobs it polls
+    job_events = None
+    # set by run() with cancel_on_abort; cancels the jobs being waited for when the job is terminated
+    abort_guard = None
+    # set by run() with cache_task_list; the state's task snapshots by site (see _get_site_tasks)
+    task_snapshots = None
+    # set by run_batch; the sign-in its configurations on this server share, so _sign_in does not sign in again
+    batch_session = None
+    # set by _run_site; the names jobs are reported by, per target key (see _job_labels)
+    job_labels = None
+    # set by run() with webhooks configured in poll mode; the jobs their events confirmed (see _wait_for_finish)
+    job_completions = None
+    # set by run() with metrics_file or metrics_push_url; counts the REST calls of every site's session
+    run_metrics = None
+    # set by run() with circuit_breaker_threshold; holds back the targets that keep failing (see _breaker_reason)
+    circuit_breaker = None
+    # set by _resolve_targets; the site's listed datasources, workbooks and tasks
+    catalogue = None
+    # set by a dry run; seconds spent per phase of resolving the targets (see _timed)
+    phase_timings = None
+    # set with profile; profiles the run, from __init__ on with connect_and_run (see run)
+    run_profile = None
+    # set by __init__ with record_traffic or replay_traffic; makes the sessions of every server (see traffic_cassette)
+    traffic_cassette = None
+    # set by serve; the list a service run appends its targets to, so they are reported while it runs
+    run_targets = None
+    # set by __init__; seconds the first connection to the server took
+    connect_seconds = None
+
+    def __init__(self, data_path_override=None, servers=None):
+        # servers: the connections a batch made so far by _session_key, so configurations sharing one connect once
+        super().__init__(data_path_override=data_path_override, required_parameters=MANDATORY_PARS)
         self.cfg_params = self.configuration.parameters
         self.image_params = self.configuration.image_parameters
 
@@ -80,45 +236,79 @@ class Component(ComponentBase):
         site_id = self.cfg_params.get(KEY_SITE_ID) or ""
         # intialize instance parameteres
 
-        # If 'luid_required' is set to true, the component will validate that the LUID and Name
-        # is present for all datasources and workbooks
-        luid_required = self.image_params.get(KEY_LUID_REQUIRED, False)
-        if luid_required:
-            for ds in self.cfg_params[KEY_DATASOURCES]:
-                self._validate_required(ds.get(KEY_NAME), "Name")
-                self._validate_required(ds.get(KEY_LUID), "LUID")
-            for wb in (self.cfg_params.get(KEY_WORKBOOKS) or []):
-                self._validate_required(wb.get(KEY_NAME), "Name")
-                self._validate_required(wb.get(KEY_LUID), "LUID")
+        self._validate_image_policy(self.cfg_params)
 
-        # If 'poll_mode_disabled' is set to true, the component will not poll the job statuses
-        poll_mode_disabled = self.image_params.get(KEY_POLL_MODE_DISABLED, False)
-        if poll_mode_disabled:
-            if self.cfg_params.get(KEY_POLL_MODE):
-                raise UserException("Poll must be set to false.")
+        if self.cfg_params.get(KEY_PROFILE) == PROFILE_CONNECT_AND_RUN and self.configuration.action in ("", "run"):
+            self.run_profile = RunProfile()
+            self.run_profile.start()
 
-        if self.cfg_params.get(KEY_AUTH_TYPE, "user/password") == "user/password":
-            self.auth = tsc.TableauAuth(self.cfg_params[KEY_USER_NAME], self.cfg_params[KEY_API_PASS], site_id=site_id)
-        elif self.cfg_params.get(KEY_AUTH_TYPE) == "Personal Access Token":
-            self.auth = tsc.PersonalAccessTokenAuth(
-                token_name=self.cfg_params[KEY_TOKEN_NAME],
-                personal_access_token=self.cfg_params[KEY_TOKEN],
-                site_id=site_id,
-            )
+        if self.cfg_params.get(KEY_REPLAY_TRAFFIC):
+            self.traffic_cassette = self._traffic_replay()
+        elif self.cfg_params.get(KEY_RECORD_TRAFFIC):
+            self.traffic_cassette = TrafficRecorder()
+
+        self.auth = self._create_auth(site_id)
         api_version = self.cfg_params.get("api_version", "use_server_version")
         if api_version == "use_server_version":
             user_server_version = True
         else:
             user_server_version = False
         logging.debug(f"use server:{user_server_version}, api: {api_version}")
-        self.server, self.server_info = self._connect_to_server(
-            self.cfg_params[KEY_ENDPOINT], user_server_version, api_version
-        )
+        if servers is not None and self._session_key() in servers:
+            self.server, self.server_info = servers[self._session_key()]
+        else:
+            connect_started = time.monotonic()
+            self.server, self.server_info = self._connect_to_server(
+                self.cfg_params[KEY_ENDPOINT],
+                user_server_version,
+                api_version,
+                session_factory=self.traffic_cassette.session_factory if self.traffic_cassette else None,
+            )
+            self.connect_seconds = time.monotonic() - connect_started
+            if servers is not None:
+                servers[self._session_key()] = (self.server, self.server_info)
         logging.info(f"Using API version: {self.server.version}")
 
+    def _traffic_replay(self) -> TrafficReplay:
+        """Return the replay of the cassette ``replay_traffic`` names, relative to the data folder."""
+        value = self.cfg_params.get(KEY_REPLAY_LATENCY_SCALE)
+        try:
+            latency_scale = 1.0 if value in (None, "") else float(value)
+        except (TypeError, ValueError):
+            latency_scale = -1
+        if latency_scale < 0:
+            raise UserException(f"Replay latency scale must be a positive number, or empty, got: {value}")
+        path = os.path.join(self.data_folder_path, self.cfg_params[KEY_REPLAY_TRAFFIC])
+        try:
+            return TrafficReplay(path, latency_scale)
+        except (OSError, ValueError, KeyError) as ex:
+            raise UserException(f"Cannot read the traffic cassette {path}: {ex}") from ex
+
+    def _session_key(self) -> tuple:
+        """Tell apart the connections a batch can share: one per server, API version, site and credentials."""
+        params = self.cfg_params
+        return (
+            params[KEY_ENDPOINT],
+            params.get("api_version", "use_server_version"),
+            params.get(KEY_SITE_ID) or "",
+            params.get(KEY_AUTH_TYPE, "user/password"),
+            params.get(KEY_TOKEN_NAME) or params.get(KEY_USER_NAME),
+            params.get(KEY_TOKEN) or params.get(KEY_API_PASS),
+        )
+
+    def _create_auth(self, site_id):
+        if self.cfg_params.get(KEY_AUTH_TYPE, "user/password") == "user/password":
+            return tsc.TableauAuth(self.cfg_params[KEY_USER_NAME], self.cfg_params[KEY_API_PASS], site_id=site_id)
+        elif self.cfg_params.get(KEY_AUTH_TYPE) == "Personal Access Token":
+            return tsc.PersonalAccessTokenAuth(
+                token_name=self.cfg_params[KEY_TOKEN_NAME],
+                personal_access_token=self.cfg_params[KEY_TOKEN],
+                site_id=site_id,
+            )
+
     @staticmethod
     def _connect_to_server(
-        endpoint: str, use_server_version: bool, api_version: str
+        endpoint: str, use_server_version: bool, api_version: str, session_factory=None
     ) -> tuple[tsc.Server, tsc.ServerInfoItem]:
         """Open the first connection to the Tableau Server, retrying a refused/dropped one.
 
@@ -138,7 +328,7 @@ class Component(ComponentBase):
         """
         for attempt in range(1, CONNECT_MAX_ATTEMPTS + 1):
             try:
-                server = tsc.Server(endpoint, use_server_version=use_server_version)
+                server = tsc.Server(endpoint, use_server_version=use_server_version, session_factory=session_factory)
                 if not use_server_version:
                     server.version = api_version
                 return server, server.server_info.get()
@@ -161,7 +351,263 @@ class Component(ComponentBase):
         """
         Main execution code
         """
+        # caught around everything: the run can be terminated in the cleanup of _run, or of the profile, too
+        try:
+            if self.cfg_params.get(KEY_PROFILE) not in (PROFILE_RUN, PROFILE_CONNECT_AND_RUN):
+                self._run()
+                return
+            if not self.run_profile:
+                self.run_profile = RunProfile()
+                self.run_profile.start()
+            try:
+                self._run()
+            finally:
+                self.run_profile.stop()
+                paths = self.run_profile.write(self.files_out_path)
+                logging.info(f"Profile of the run written to: {', '.join(os.path.basename(path) for path in paths)}.")
+        except RunAborted as ex:
+            raise UserException(str(ex)) from None
+
+    def _run(self):
         params = self.cfg_params  # noqa
+        max_concurrent_refreshes = self._non_negative_int(
+            params, KEY_MAX_CONCURRENT_REFRESHES, "Max concurrent refreshes"
+        )
+        # minutes; a target whose extract refreshed more recently than this is not triggered again
+        min_refresh_interval = self._non_negative_int(params, KEY_MIN_REFRESH_INTERVAL, "Minimum refresh interval")
+        # minutes; a run started this soon after a run that did not finish resumes its triggered jobs
+        resume_window = self._non_negative_int(params, KEY_RESUME_WINDOW, "Resume window")
+        # minutes; read when polling, validated here so a wrong value fails the run before anything is triggered
+        self._non_negative_int(params, KEY_POLL_TIMEOUT, "Poll timeout")
+        webhook_port = self._non_negative_int(params, KEY_WEBHOOK_PORT, "Webhook port")
+        # consecutive failures from which a target is triggered only as a probe, every probe interval minutes
+        breaker_threshold = self._non_negative_int(params, KEY_CIRCUIT_BREAKER_THRESHOLD, "Circuit breaker threshold")
+        breaker_probe_interval = (
+            self._non_negative_int(params, KEY_CIRCUIT_BREAKER_PROBE_INTERVAL, "Circuit breaker probe interval")
+            or DEFAULT_CIRCUIT_BREAKER_PROBE_INTERVAL
+        )
+        run_started_at = datetime.now(UTC)
+
+        # Targets mapped to input tables are only triggered when one of those tables changed since the
+        # previous run saw it (see _input_tables_changed). Manifests and state are read only when configured.
+        conditional_entries = [
+            entry
+            for site in [params] + (params.get(KEY_SITES) or [])
+            for entry in (site.get(KEY_DATASOURCES) or []) + (site.get(KEY_WORKBOOKS) or [])
+            if entry.get(KEY_INPUT_TABLES)
+        ]
+        table_changes = previous_changes = None
+        cache_task_list = params.get(KEY_CACHE_TASK_LIST) and self._can_use_task_snapshot(params)
+        if params.get(KEY_CACHE_TASK_LIST) and min_refresh_interval:
+            logging.info("The minimum refresh interval needs the current task list, the task list cache is not used.")
+        elif params.get(KEY_CACHE_TASK_LIST) and breaker_threshold:
+            logging.info("The circuit breaker needs the current task list, the task list cache is not used.")
+
+        uses_state = conditional_entries or resume_window or cache_task_list or breaker_threshold
+        state = self.get_state_file() if uses_state else {}
+        if breaker_threshold:
+            self.circuit_breaker = CircuitBreaker(
+                state, breaker_threshold, timedelta(minutes=breaker_probe_interval), run_started_at
+            )
+        if cache_task_list:
+            self.task_snapshots = state.setdefault(STATE_TASK_SNAPSHOTS, {})
+        if conditional_entries:
+            table_changes = self._get_input_table_changes()
+            previous_changes = state.get(STATE_INPUT_TABLE_CHANGES, {})
+
+        if params.get(KEY_DRY_RUN):
+            for line in self._plan_lines(self._plan(table_changes, previous_changes, min_refresh_interval)):
+                logging.info(line)
+            logging.info("Dry run finished, no extract refresh was triggered.")
+            return
+
+        events_path = None
+        if params.get(KEY_JOB_EVENTS_FILE):
+            os.makedirs(self.files_out_path, exist_ok=True)
+            events_path = os.path.join(self.files_out_path, JOB_EVENTS_FILE_NAME)
+        self.job_events = JobEventLog(events_path)
+
+        checkpoint = None
+        if resume_window:
+            checkpoint = RunCheckpoint(state, self.write_state_file, run_started_at, resume_window)
+            if checkpoint.resumable:
+                logging.info(
+                    f"Resuming the run started at {checkpoint.started_at.isoformat()}, which did not finish: "
+                    f"{len(checkpoint.resumable)} targets it triggered are checked before being triggered again."
+                )
+
+        if params.get(KEY_CANCEL_ON_ABORT):
+            self.abort_guard = AbortGuard(ABORT_CANCEL_GRACE_SECONDS)
+            self.abort_guard.install()
+
+        if params.get(KEY_POLL_MODE) and (webhook_port or params.get(KEY_WEBHOOK_RELAY_URL)):
+            self.job_completions = JobCompletions(params.get(KEY_WEBHOOK_RELAY_URL))
+            if webhook_port:
+                self.job_completions.listen(webhook_port, params.get(KEY_WEBHOOK_HOST) or DEFAULT_WEBHOOK_HOST)
+
+        if params.get(KEY_METRICS_FILE) or params.get(KEY_METRICS_PUSH_URL):
+            self.run_metrics = RunMetrics()
+            self.run_metrics.watch(self.server.session)
+
+        targets = self.run_targets if self.run_targets is not None else []
+        try:
+            self._run_sites(
+                targets, table_changes, previous_changes, min_refresh_interval, max_concurrent_refreshes, checkpoint
+            )
+
+            if conditional_entries:
+                # Only a target that was actually triggered has seen its input tables' current state; a
+                # skipped or failed one keeps what the previous run stored, so its changes are not lost.
+                for target in targets:
+                    if target.input_table_changes and target.outcome == RefreshTarget.Outcome.Triggered:
+                        previous_changes[self._state_key(target)] = target.input_table_changes
+                state[STATE_INPUT_TABLE_CHANGES] = previous_changes
+            if checkpoint:
+                checkpoint.clear()
+            # with the circuit breaker, the state is written below even when the run fails
+            if (conditional_entries or checkpoint or cache_task_list) and not self.circuit_breaker:
+                self.write_state_file(state)
+        finally:
+            if self.abort_guard:
+                self.abort_guard.uninstall()
+            if self.job_completions:
+                self.job_completions.close()
+            if self.circuit_breaker:
+                # A refresh failing in poll mode fails the run, and is exactly what the breaker has to count. The
+                # platform may not keep the state of a failed job though (see the README's circuit breaker section).
+                for target in targets:
+                    self.circuit_breaker.record(self._state_key(target), target)
+                self.write_state_file(state)
+            # Written on failure too: that is when the per-target record is most needed.
+            if params.get(KEY_RUN_RESULTS_TABLE):
+                self._write_run_results(targets, run_started_at)
+            if self.run_metrics:
+                self._export_run_metrics(targets)
+            if isinstance(self.traffic_cassette, TrafficRecorder):
+                os.makedirs(self.files_out_path, exist_ok=True)
+                self.traffic_cassette.save(os.path.join(self.files_out_path, TRAFFIC_CASSETTE_FILE_NAME))
+
+        logging.info("Trigger finished successfully!")
+
+    @staticmethod
+    def _can_use_task_snapshot(params) -> bool:
+        """Can a run of ``params`` take the site's tasks from a task snapshot (see _get_site_tasks)?
+
+        The snapshot keeps the last_run_at and consecutive_failed_count of the run that took it, too old to tell a
+        recent refresh or a failing task by.
+        """
+        return not params.get(KEY_MIN_REFRESH_INTERVAL) and not params.get(KEY_CIRCUIT_BREAKER_THRESHOLD)
+
+    def _site_components(self):
+        """Return ``(site_id, component)`` for every site the configuration refreshes extracts on.
+
+        The top-level datasources, workbooks and selectors belong to the top-level ``site_id`` and are handled by this
+        component itself; every entry of ``sites`` gets a copy of it bound to that site (see _for_site).
+        """
+        params = self.cfg_params
+        site_components = []
+        if (
+            params.get(KEY_DATASOURCES)
+            or params.get(KEY_WORKBOOKS)
+            or params.get(KEY_DATASOURCE_SELECTORS)
+            or not params.get(KEY_SITES)
+        ):
+            site_components.append((params.get(KEY_SITE_ID) or "", self))
+        for site in params.get(KEY_SITES) or []:
+            site_components.append((site.get(KEY_SITE_ID) or "", self._for_site(site)))
+        return site_components
+
+    def _for_site(self, site):
+        """Return a copy of this component that refreshes the extracts of one ``sites`` entry.
+
+        The copy has a session of its own, so sites can be signed in to concurrently, but reuses the API version
+        negotiated at start-up: no further ``/serverInfo`` round trip is made per site.
+        """
+        site_id = site.get(KEY_SITE_ID) or ""
+        site_component = copy.copy(self)
+        site_component.cfg_params = {
+            **self.cfg_params,
+            KEY_SITE_ID: site_id,
+            KEY_DATASOURCES: site.get(KEY_DATASOURCES) or [],
+            KEY_WORKBOOKS: site.get(KEY_WORKBOOKS) or [],
+            KEY_DATASOURCE_SELECTORS: site.get(KEY_DATASOURCE_SELECTORS) or [],
+            KEY_SITES: [],
+        }
+        site_component.auth = site_component._create_auth(site_id)
+        site_component.batch_session = None
+        site_component.server = tsc.Server(
+            self.cfg_params[KEY_ENDPOINT],
+            use_server_version=False,
+            session_factory=self.traffic_cassette.session_factory if self.traffic_cassette else None,
+        )
+        site_component.server.version = self.server.version
+        if self.run_metrics:
+            self.run_metrics.watch(site_component.server.session)
+        return site_component
+
+    def _run_sites(
+        self, targets, table_changes, previous_changes, min_refresh_interval, max_concurrent_refreshes, checkpoint=None
+    ):
+        """Refresh the extracts of every configured site, appending their targets to ``targets`` in site order.
+
+        Sites are processed concurrently; one failing does not stop the others. The errors of all failed sites
+        are raised together as a single ``UserException`` once every site is done.
+        """
+        site_components = self._site_components()
+        if len(site_components) == 1:
+            site_components[0][1]._run_site(
+                targets, table_changes, previous_changes, min_refresh_interval, max_concurrent_refreshes, checkpoint
+            )
+            return
+
+        logging.info(
+            f"Refreshing extracts on {len(site_components)} sites: "
+            f"{', '.join(repr(site_id) for site_id, _ in site_components)}."
+        )
+        site_targets = [[] for _ in site_components]
+        executor = ThreadPoolExecutor(max_workers=min(len(site_components), MAX_CONCURRENT_SITES))
+        futures = [
+            executor.submit(
+                site_component._run_site,
+                site_targets[i],
+                table_changes,
+                previous_changes,
+                min_refresh_interval,
+                max_concurrent_refreshes,
+                checkpoint,
+            )
+            for i, (_, site_component) in enumerate(site_components)
+        ]
+        try:
+            wait(futures)
+        finally:
+            # Terminated, the sites stop at their next check of the abort guard (see _check_not_aborted); they are
+            # waited for all the same, so their targets are complete when the results of the run are written.
+            executor.shutdown()
+            for targets_of_site in site_targets:
+                targets.extend(targets_of_site)
+
+        site_errors = []
+        for (site_id, _), future in zip(site_components, futures):
+            ex = future.exception()
+            if ex is None:
+                continue
+            if not isinstance(ex, UserException):
+                raise ex
+            site_errors.append(f"Site '{site_id}': {ex}")
+        if site_errors:
+            raise UserException("\n".join(site_errors))
+
+    def _run_site(
+        self, targets, table_changes, previous_changes, min_refresh_interval, max_concurrent_refreshes, checkpoint=None
+    ):
+        """Resolve, trigger and (in poll mode) wait for the targets of this component's site.
+
+        The targets are appended to ``targets`` as soon as they are resolved, and each one's finished job is
+        recorded on it, so the caller has them even when this raises. With a ``checkpoint``, every trigger is
+        saved to it, and a target the resumed run already triggered is taken over instead (see _resumed_job).
+        """
+        params = self.cfg_params
         continue_on_error = params.get(KEY_CONTINUE_ON_ERROR, False)
         # Opt-in, default off: an extract whose refresh Tableau says is already queued or running
         # is logged as a warning and the job still finishes successfully. Off, it fails the job as
@@ -171,88 +617,856 @@ class Component(ComponentBase):
         # Counted so the run can state the aggregate: N individual warnings followed by
         # "finished successfully" otherwise reads like a fully successful run.
         triggers_attempted = 0
-        already_queued_skipped = 0
 
+        with self._sign_in():
+            site_targets = self._resolve_targets(params, min_refresh_interval, table_changes)
+            targets.extend(site_targets)
+            for target in site_targets:
+                target.site_id = params.get(KEY_SITE_ID) or ""
+
+            # Jobs are tracked by target key (see _state_key) and reported by target name, with the LUID and task
+            # type added to a name more than one target has.
+            self.job_labels = self._job_labels(site_targets)
+            executed_jobs = dict()
+            # Jobs the admission window already saw finish, so polling does not ask about them again.
+            finished_jobs = dict()
+            # Triggered jobs not seen finishing yet: those the admission window waits for, and those cancelled when
+            # the run is terminated while it is still triggering.
+            in_flight_jobs = dict()
+            max_durations = {
+                self._state_key(target): target.max_duration for target in site_targets if target.max_duration
+            }
+            # the admission window counts poll_timeout from here, as it polls before the final poll starts
+            triggering_started_at = datetime.now(UTC)
+            try:
+                # a refresh already queued or running counts as the target's refresh with this option; its job is
+                # taken over rather than a trigger being sent only for Tableau to decline it
+                running_jobs = self._find_running_jobs(site_targets) if already_in_queue_as_warning else {}
+                with self._watched_for_abort(in_flight_jobs):
+                    for target in site_targets:
+                        self._check_not_aborted()
+                        key = self._state_key(target)
+                        record = checkpoint.resumable.get(key) if checkpoint else None
+                        resumed_job = self._resumed_job(target, record)
+                        if resumed_job:
+                            executed_jobs[key] = target.job_id
+                            if self.job_completions:
+                                self.job_completions.expect(target.job_id, target.luid, checkpoint.started_at)
+                            if int(resumed_job.finish_code) < 0:
+                                in_flight_jobs[key] = target.job_id
+                            else:
+                                finished_jobs[key] = resumed_job
+                            continue
+                        skip_reason = self._skip_reason(target, previous_changes, min_refresh_interval)
+                        breaker_reason = None if skip_reason else self._breaker_reason(target)
+                        if breaker_reason:
+                            target.outcome = RefreshTarget.Outcome.Skipped
+                            logging.warning(
+                                f'Skipping extract for {target.kind} "{target.name}" with LUID "{target.luid}": '
+                                f"{breaker_reason}"
+                            )
+                            continue
+                        if skip_reason:
+                            target.outcome = RefreshTarget.Outcome.Skipped
+                            logging.info(
+                                f'Skipping extract for {target.kind} "{target.name}" with LUID "{target.luid}": '
+                                f"{skip_reason}"
+                            )
+                            continue
+                        running_job = running_jobs.get(id(target))
+                        if running_job:
+                            target.job_id = running_job.id
+                            target.outcome = RefreshTarget.Outcome.Attached
+                            if checkpoint:
+                                checkpoint.record(key, target)
+                            executed_jobs[key] = target.job_id
+                            in_flight_jobs[key] = target.job_id
+                            if self.job_completions:
+                                self.job_completions.expect(
+                                    target.job_id, target.luid, running_job.created_at or datetime.now(UTC)
+                                )
+                            continue
+                        if max_concurrent_refreshes:
+                            self._wait_for_free_slot(
+                                in_flight_jobs,
+                                finished_jobs,
+                                max_concurrent_refreshes,
+                                max_durations,
+                                triggering_started_at,
+                            )
+                        triggers_attempted += 1
+                        triggered_at = datetime.now(UTC)
+                        try:
+                            self._trigger(target, already_in_queue_as_warning, continue_on_error, poll_mode)
+                        finally:
+                            if checkpoint:
+                                checkpoint.record(key, target)
+                        if target.job_id:
+                            executed_jobs[key] = target.job_id
+                            in_flight_jobs[key] = target.job_id
+                            if self.job_completions:
+                                self.job_completions.expect(target.job_id, target.luid, triggered_at)
+
+                skipped = sum(1 for t in site_targets if t.outcome == RefreshTarget.Outcome.Skipped)
+                if skipped:
+                    logging.info(
+                        f"{skipped} of {len(site_targets)} extracts did not need a refresh and were not triggered."
+                    )
+                attached = sum(1 for t in site_targets if t.outcome == RefreshTarget.Outcome.Attached)
+                if attached:
+                    logging.info(
+                        f"{attached} of {len(site_targets)} refreshes were already queued or running in Tableau and "
+                        f"were not triggered again{'; their jobs are polled instead' if poll_mode else ''}."
+                    )
+                already_queued_skipped = sum(
+                    1 for t in site_targets if t.outcome == RefreshTarget.Outcome.AlreadyQueued
+                )
+                if already_queued_skipped:
+                    logging.info(
+                        f"{already_queued_skipped} of {triggers_attempted} refreshes were already queued or running "
+                        f"in Tableau and were skipped; no duplicate was triggered for them."
+                    )
+
+                # poll job statuses
+                if poll_mode:
+                    logging.info("Polling extract refresh statuses.")
+                    self._wait_for_finish(executed_jobs, finished_jobs, max_durations, started_at=triggering_started_at)
+                elif finished_jobs:
+                    # Without poll mode the run does not fail on a refresh outcome, but the admission window
+                    # did see these finish, so failures are not left out of the log.
+                    for name, job in finished_jobs.items():
+                        if int(job.finish_code) > 0:
+                            logging.warning(
+                                f"Extract refresh job for '{self._job_label(name)}' failed "
+                                f"(finish_code={job.finish_code})."
+                            )
+            finally:
+                for target in site_targets:
+                    target.job = finished_jobs.get(self._state_key(target)) if target.job_id else None
+
+    def _skip_reason(self, target, previous_changes, min_refresh_interval):
+        """Return why ``target`` does not need a refresh in this run, or ``None`` when it is to be triggered."""
+        if previous_changes is not None and not self._input_tables_changed(target, previous_changes):
+            return f"none of its input tables {list(target.input_table_changes)} changed since the previous run."
+        if self._is_recently_refreshed(target, min_refresh_interval):
+            return (
+                f"it was last refreshed at {target.last_refreshed_at.isoformat()}, within the minimum refresh "
+                f"interval of {min_refresh_interval} minutes."
+            )
+        return None
+
+    def _breaker_reason(self, target):
+        """Return why the circuit breaker holds ``target`` back, or ``None`` when it is to be triggered.
+
+        A target the breaker lets through as a probe is logged as such.
+        """
+        if not self.circuit_breaker:
+            return None
+        key = self._state_key(target)
+        state = self.circuit_breaker.state(key, target)
+        if state == CircuitBreaker.Closed:
+            return None
+        failures = self.circuit_breaker.failures(key, target)
+        if state == CircuitBreaker.HalfOpen:
+            logging.info(
+                f'The refresh of {target.kind} "{target.name}" failed {failures} times in a row, triggering it as a '
+                f"probe of whether it works again."
+            )
+            return None
+        next_probe_at = self.circuit_breaker.last_attempt_at(key, target) + self.circuit_breaker.probe_interval
+        return (
+            f"its refresh failed {failures} times in a row, so the circuit breaker holds it back until "
+            f"{next_probe_at.isoformat()}, when it is tried again. Fix the extract in Tableau to have it refreshed."
+        )
+
+    def _resumed_job(self, target, record):
+        """Return the job the resumed run triggered for ``target`` if it is still running or succeeded, else ``None``.
+
+        Such a job is taken over: ``target`` gets its ID and the ``triggered`` outcome and is not triggered again.
+        """
+        if not record or not record.get("job_id"):
+            return None
+        try:
+            job = self.server.jobs.get_by_id(record["job_id"])
+        except Exception as ex:
+            logging.warning(
+                f"Failed to get status of job {record['job_id']} for '{target.name}', triggering it again: {ex}"
+            )
+            return None
+        if int(job.finish_code) > 0:
+            logging.info(
+                f'Extract refresh job {record["job_id"]} triggered for {target.kind} "{target.name}" by the resumed '
+                f"run did not succeed (finish_code={job.finish_code}), triggering it again."
+            )
+            return None
+        target.job_id = record["job_id"]
+        target.outcome = RefreshTarget.Outcome.Triggered
+        logging.info(
+            f'Extract refresh job {target.job_id} triggered for {target.kind} "{target.name}" by the resumed run '
+            f"{'is still running' if int(job.finish_code) < 0 else 'finished successfully'}, not triggering it again."
+        )
+        return job
+
+    def _find_running_jobs(self, targets) -> dict:
+        """Return the extract refresh job queued or running in Tableau for each of ``targets`` that has one.
+
+        The site's unfinished extract refresh jobs are listed once per status, as Tableau filters jobs by status
+        with ``eq`` only. A listing names the refreshed item only by its name, so a job whose name matches a target
+        is then fetched on its own to compare its LUID, and is returned, by ``id()`` of its target, only when it
+        matches and has not finished in the meantime.
+        """
+        listed_jobs = dict()
         try:
-            sign_in_ctx = self.server.auth.sign_in(self.auth)
+            for status in RUNNING_JOB_STATUSES:
+                options = tsc.RequestOptions()
+                options.filter.add(
+                    tsc.Filter(tsc.RequestOptions.Field.Status, tsc.RequestOptions.Operator.Equals, status)
+                )
+                options.filter.add(
+                    tsc.Filter(
+                        tsc.RequestOptions.Field.JobType,
+                        tsc.RequestOptions.Operator.In,
+                        ["refresh_extracts", "increment_extracts"],
+                    )
+                )
+                # a job starting between the two listings is listed by both
+                for listed_job in fetch_all_pages(self.server.jobs, options):
+                    listed_jobs[listed_job.id] = listed_job
+        except Exception as ex:
+            logging.error(f"Failed to list the queued and running refresh jobs, triggering every target: {ex}")
+            return {}
+        listed_by_name = dict()
+        for listed_job in listed_jobs.values():
+            listed_by_name.setdefault((listed_job.title or "").casefold(), []).append(listed_job)
+
+        running_jobs = dict()
+        for target in targets:
+            for listed_job in listed_by_name.get(target.name.casefold(), []):
+                try:
+                    job = self.server.jobs.get_by_id(listed_job.id)
+                except Exception as ex:
+                    logging.warning(f"Failed to get status of job {listed_job.id} for '{target.name}': {ex}")
+                    continue
+                luid = job.datasource_id if target.kind == RefreshTarget.Kind.Datasource else job.workbook_id
+                if luid == target.luid and int(job.finish_code) < 0:
+                    running_jobs[id(target)] = job
+                    break
+        return running_jobs
+
+    def _sign_in(self):
+        if self.batch_session:
+            return contextlib.nullcontext()
+        try:
+            return self.server.auth.sign_in(self.auth)
         except tsc.FailedSignInError as ex:
             raise UserException(f"Tableau authentication failed: {ex}") from ex
 
-        with sign_in_ctx:
-            executed_jobs = dict()
+    @sync_action("list_datasources")
+    def list_datasources(self):
+        return self._list_refresh_targets(RefreshTarget.Kind.Datasource)
+
+    @sync_action("list_workbooks")
+    def list_workbooks(self):
+        return self._list_refresh_targets(RefreshTarget.Kind.Workbook)
+
+    def _list_refresh_targets(self, kind):
+        return [
+            SelectElement(
+                value=entry["luid"],
+                label=(
+                    f"{entry['name']} (project: {entry['project']}, tags: {', '.join(entry['tags']) or '-'}, "
+                    f"refresh: {', '.join(sorted(TASK_TYPE_TITLES.get(t.lower(), t) for t in entry['task_types']))})"
+                ),
+            )
+            for entry in self._get_target_catalogue()
+            if entry["kind"] == kind
+        ]
+
+    def _get_target_catalogue(self):
+        """List every datasource and workbook that has an extract refresh task, with the task types it offers.
+
+        Built from one scan of the site's tasks plus one listing per kind, all at the largest page size, so the
+        cost grows with the number of pages rather than with the number of targets. The result is cached for
+        ``CATALOGUE_CACHE_TTL_SECONDS`` per server, site and account.
+        """
+        cache = FileCache(CATALOGUE_CACHE_DIR, CATALOGUE_CACHE_TTL_SECONDS)
+        cache_key = "|".join(
+            [
+                self.cfg_params[KEY_ENDPOINT],
+                self.cfg_params.get(KEY_SITE_ID) or "",
+                self.cfg_params.get(KEY_TOKEN_NAME) or self.cfg_params.get(KEY_USER_NAME) or "",
+            ]
+        )
+        catalogue = cache.get(cache_key)
+        if catalogue is not None:
+            logging.debug("Using the cached target catalogue.")
+            return catalogue
+
+        with self._sign_in():
+            task_types = dict()
+            for task in fetch_all_pages(TaskCustom(self.server)):
+                if task.target is not None:
+                    task_types.setdefault((task.target.type, task.target.id), set()).add(task.task_type)
+
+            catalogue = []
+            for kind, endpoint in (
+                (RefreshTarget.Kind.Datasource, "datasources"),
+                (RefreshTarget.Kind.Workbook, "workbooks"),
+            ):
+                if not any(target_kind == kind for target_kind, _ in task_types):
+                    continue
+                for item in fetch_all_pages(getattr(self.server, endpoint)):
+                    if (kind, item.id) not in task_types:
+                        continue
+                    catalogue.append(
+                        {
+                            "kind": kind,
+                            "luid": item.id,
+                            "name": item.name,
+                            "project": item.project_name,
+                            "tags": sorted(item.tags or []),
+                            "task_types": sorted(task_types[(kind, item.id)]),
+                        }
+                    )
+        catalogue.sort(key=lambda entry: (entry["kind"], entry["name"].lower()))
+        cache.set(cache_key, catalogue)
+        return catalogue
+
+    @sync_action("dry_run")
+    def dry_run(self):
+        """Report what a run of this configuration would trigger, without triggering anything.
+
+        The input tables are not part of a sync action, so whether they changed is only evaluated by a run with
+        ``dry_run`` set.
+        """
+        min_refresh_interval = self._non_negative_int(
+            self.cfg_params, KEY_MIN_REFRESH_INTERVAL, "Minimum refresh interval"
+        )
+        plans = self._plan(None, None, min_refresh_interval)
+        return ValidationResult("\n".join(self._plan_lines(plans)), MessageType.SUCCESS)
+
+    def _plan(self, table_changes, previous_changes, min_refresh_interval):
+        """Resolve and validate the targets of every configured site as a run would, without triggering them.
+
+        Returns one plan per site, see _plan_site.
+        """
+        site_components = self._site_components()
+        with ThreadPoolExecutor(max_workers=min(len(site_components), MAX_CONCURRENT_SITES)) as executor:
+            return list(
+                executor.map(
+                    lambda site_component: site_component._plan_site(
+                        table_changes, previous_changes, min_refresh_interval
+                    ),
+                    [site_component for _, site_component in site_components],
+                )
+            )
+
+    def _plan_site(self, table_changes, previous_changes, min_refresh_interval):
+        """Return the trigger plan of this component's site.
+
+        The plan holds every resolved target with the reason it would be skipped (``None`` when it would be
+        triggered), the number of requests resolving took and the seconds spent per phase.
+        """
+        self.phase_timings = dict()
+        request_count = 0
+
+        def count_request(response, *args, **kwargs):
+            nonlocal request_count
+            request_count += 1
+
+        response_hooks = self.server.session.hooks["response"]
+        response_hooks.append(count_request)
+        try:
+            with self._timed("sign_in"):
+                signed_in = self._sign_in()
+            with signed_in:
+                targets = self._resolve_targets(self.cfg_params, min_refresh_interval, table_changes)
+        finally:
+            response_hooks.remove(count_request)
+        return {
+            "site_id": self.cfg_params.get(KEY_SITE_ID) or "",
+            "targets": [
+                (
+                    target,
+                    self._skip_reason(target, previous_changes, min_refresh_interval) or self._breaker_reason(target),
+                )
+                for target in targets
+            ],
+            "requests": request_count,
+            "timings": self.phase_timings,
+        }
+
+    def _plan_lines(self, plans):
+        """Describe the site ``plans`` (see _plan) as lines of text, for the log and the dry run sync action."""
+        lines = []
+        if self.connect_seconds is not None:
+            lines.append(f"Connecting to the server took {self.connect_seconds:.2f}s.")
+        for plan in plans:
+            to_trigger = [target for target, skip_reason in plan["targets"] if not skip_reason]
+            lines.append(
+                f"Trigger plan for site '{plan['site_id']}': {len(to_trigger)} of {len(plan['targets'])} targets "
+                f"would be triggered."
+            )
+            for target, skip_reason in plan["targets"]:
+                if target.kind == RefreshTarget.Kind.Datasource:
+                    action = f"{target.item.task_type} task {target.item.id}"
+                else:
+                    action = "workbook refresh"
+                verdict = f"skip, {skip_reason}" if skip_reason else f"trigger {action}"
+                lines.append(f'- {target.kind} "{target.name}" (LUID: {target.luid}): {verdict}')
+            # every trigger is one POST; in poll mode each job is then asked about at least once
+            polling = ""
+            if self.cfg_params.get(KEY_POLL_MODE):
+                polling = f" and at least {len(to_trigger)} job status requests"
+            lines.append(
+                f"Requests: {plan['requests']} made resolving the targets; a run would add {len(to_trigger)} "
+                f"trigger requests{polling}."
+            )
+            lines.append(
+                "Timings: "
+                + (", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in plan["timings"].items()) or "-")
+            )
+        return lines
 
-            data_sources = params[KEY_DATASOURCES]
-            if data_sources:
-                # tasks
-                # filter only datasource refresh tasks
-                logging.info("Validating extract names...")
+    @contextlib.contextmanager
+    def _timed(self, phase):
+        """Add the seconds the block takes to ``phase`` in ``phase_timings``, when a dry run collects them."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.phase_timings is not None:
+                self.phase_timings[phase] = self.phase_timings.get(phase, 0) + time.monotonic() - started
 
+    def _resolve_targets(self, params, min_refresh_interval, table_changes):
+        """Look up the configured datasources, selectors and workbooks and return what is to be refreshed, in order.
+
+        Everything listed on the way goes into a new ``catalogue``, which every lookup goes through.
+        """
+        targets = []
+        self.catalogue = TargetCatalogue()
+
+        data_sources = params.get(KEY_DATASOURCES)
+        selectors = params.get(KEY_DATASOURCE_SELECTORS)
+        workbooks = params.get(KEY_WORKBOOKS, False)
+        if params.get(KEY_METADATA_API) and (data_sources or workbooks):
+            with self._timed("metadata_lookup"):
+                self._list_from_metadata(data_sources, workbooks)
+        # one scan of the site's tasks serves both the configured datasources and the selectors
+        with self._timed("task_scan"):
+            self.catalogue.set_tasks(self.get_all_datasource_refresh_tasks() if data_sources or selectors else [])
+        if data_sources:
+            # tasks
+            # filter only datasource refresh tasks
+            logging.info("Validating extract names...")
+
+            with self._timed("datasource_lookup"):
                 all_ds, validation_errors = self._get_all_ds_by_filter("datasources", data_sources)
-                logging.debug(f"Recognized datasets: {all_ds}")
-
-                if validation_errors:
-                    raise UserException("\n".join(validation_errors))
-                ds_to_refresh = self.validate_dataset_names(all_ds, data_sources)
-
-                tasks = self.get_all_datasource_refresh_tasks()
-                # get all datasources for tasks
-                logging.info("Retrieving extract tasks and validating extract types...")
-                ds_tasks = self.get_all_ds_for_tasks(tasks, all_ds)
-                logging.debug(f"Found datasource tasks: {ds_tasks}")
-                self.validate_dataset_types(ds_tasks, ds_to_refresh)
-
-                for ds in data_sources:
-                    triggers_attempted += 1
-                    task = ds_tasks[ds[KEY_DS_NAME]][ds[KEY_DS_TYPE].lower()]
-                    logging.info(f'Triggering extract for: "{ds[KEY_DS_NAME]}" with LUID: "{task.target.id}""')
-                    try:
-                        job_id = self._run_task(task)
-                        executed_jobs[ds[KEY_DS_NAME]] = job_id
-                    except Exception as ex:
-                        if already_in_queue_as_warning and self._is_refresh_already_queued(ex):
-                            already_queued_skipped += 1
-                            logging.warning(self._already_queued_message(ex, "datasource", ds[KEY_DS_NAME], poll_mode))
-                        elif continue_on_error:
-                            logging.warning(f"Failed to trigger extract for dataset: {ds[KEY_DS_NAME]}. {ex}")
-                        else:
-                            user_error = self._as_refresh_refused_user_exception(ex, "datasource", ds[KEY_DS_NAME])
-                            if user_error:
-                                raise user_error from ex
-                            raise ex
-
-            workbooks = params.get(KEY_WORKBOOKS, False)
-            if workbooks:
-                all_wb, validation_errors = self._get_all_ds_by_filter("workbooks", workbooks)
-                for wb in all_wb:
-                    triggers_attempted += 1
-                    logging.info(f'Triggering extract for: "{wb.name}" with LUID: "{wb.id}""')
-                    try:
-                        job = self.server.workbooks.refresh(wb)
-                        executed_jobs[wb.name] = job.id
-                    except Exception as ex:
-                        if already_in_queue_as_warning and self._is_refresh_already_queued(ex):
-                            already_queued_skipped += 1
-                            logging.warning(self._already_queued_message(ex, "workbook", wb.name, poll_mode))
-                        elif continue_on_error:
-                            logging.warning(f"Failed to trigger extract for workbook: {wb.name}. {ex}")
-                        else:
-                            user_error = self._as_refresh_refused_user_exception(ex, "workbook", wb.name)
-                            if user_error:
-                                raise user_error from ex
-                            raise ex
-
-            if already_queued_skipped:
-                logging.info(
-                    f"{already_queued_skipped} of {triggers_attempted} refreshes were already queued or running "
-                    f"in Tableau and were skipped; no duplicate was triggered for them."
+            logging.debug(f"Recognized datasets: {all_ds}")
+
+            if validation_errors:
+                raise UserException("\n".join(validation_errors))
+            with self._timed("validate_names"):
+                self.validate_dataset_names(all_ds, data_sources)
+
+            logging.info("Validating extract types...")
+            with self._timed("validate_types"):
+                try:
+                    self.validate_dataset_types(all_ds, data_sources)
+                except UserException:
+                    if self.task_snapshots is None:
+                        raise
+                    # a task replaced since the snapshot was taken can hide behind an unchanged task count
+                    logging.info(
+                        "A configured extract refresh task is not in the task snapshot, rescanning the task list."
+                    )
+                    self.catalogue.set_tasks(self.get_all_datasource_refresh_tasks(use_snapshot=False))
+                    self.validate_dataset_types(all_ds, data_sources)
+
+            # every configured datasource matched exactly one item, or the validation above failed
+            for ds, ds_item in zip(data_sources, all_ds):
+                task = self.catalogue.task(ds_item.id, ds[KEY_DS_TYPE])
+                target = RefreshTarget(RefreshTarget.Kind.Datasource, ds[KEY_DS_NAME], task.target.id, task)
+                target.last_refreshed_at = task.last_run_at
+                target.max_duration = self._non_negative_int(ds, KEY_MAX_DURATION, "Max duration")
+                if ds.get(KEY_INPUT_TABLES) and table_changes is not None:
+                    target.input_table_changes = self._select_input_table_changes(target, ds, table_changes)
+                targets.append(target)
+
+        if selectors:
+            # a datasource both configured and selected is refreshed once, as configured
+            configured_tasks = {target.item.id for target in targets}
+            with self._timed("selectors"):
+                selected = self._resolve_selected_datasources(selectors)
+            for target in selected:
+                if target.item.id not in configured_tasks:
+                    configured_tasks.add(target.item.id)
+                    targets.append(target)
+
+        if workbooks:
+            with self._timed("workbook_lookup"):
+                # each entry keeps the workbooks it selected, so their settings come from that entry alone
+                wb_matches, _ = self._get_items_by_entry("workbooks", workbooks)
+            all_wb = [wb for _, matched in wb_matches for wb in matched]
+            # a workbook's extracts refresh through its own tasks, scanned only when their last run matters and the
+            # Metadata API did not tell it
+            wb_last_runs = {}
+            if min_refresh_interval and not all(isinstance(wb, MetadataItem) for wb in all_wb):
+                with self._timed("task_scan"):
+                    wb_last_runs = self.get_last_workbook_refreshes()
+            for wb_entry, matched in wb_matches:
+                for wb in matched:
+                    target = RefreshTarget(RefreshTarget.Kind.Workbook, wb.name, wb.id, wb)
+                    target.last_refreshed_at = (
+                        wb.last_refreshed_at if isinstance(wb, MetadataItem) else wb_last_runs.get(wb.id)
+                    )
+                    target.max_duration = self._non_negative_int(wb_entry, KEY_MAX_DURATION, "Max duration")
+                    if wb_entry.get(KEY_INPUT_TABLES) and table_changes is not None:
+                        target.input_table_changes = self._select_input_table_changes(target, wb_entry, table_changes)
+                    targets.append(target)
+
+        return self._deduplicated(targets)
+
+    def _list_from_metadata(self, data_sources, workbooks):
+        """List the configured datasources and workbooks into the catalogue with one Metadata API query.
+
+        Where the Metadata API is disabled or fails nothing is listed, and the REST lookups that follow find every
+        target. They also look up the names the Metadata API does not know, e.g. of content it has not indexed yet.
+        """
+
+        def names(entries):
+            return [entry[KEY_NAME] for entry in entries or [] if entry.get(KEY_NAME)]
+
+        try:
+            all_ds, all_wb = MetadataResolver(self.server).resolve(names(data_sources), names(workbooks))
+        except MetadataUnavailableError as ex:
+            logging.warning(f"The Metadata API is not available, the targets are looked up over REST: {ex}")
+            return
+        logging.info(f"The Metadata API found {len(all_ds)} datasources and {len(all_wb)} workbooks.")
+        self.catalogue.add_items(RefreshTarget.Kind.Datasource, all_ds)
+        self.catalogue.add_items(RefreshTarget.Kind.Workbook, all_wb)
+
+    @staticmethod
+    def _deduplicated(targets):
+        """Collapse the targets configured more than once into the first of them, so each is triggered once.
+
+        A datasource target is identified by its task (a full and an incremental refresh are two targets), a
+        workbook by its LUID. The collapsed target is triggered when any of its entries would be: input tables are
+        combined, and so are max durations, the longest (or none, when one entry has none) applying.
+        """
+        unique = dict()
+        for target in targets:
+            first = unique.setdefault(Component._state_key(target), target)
+            if first is target:
+                continue
+            logging.info(f'The {target.kind} "{target.name}" is configured more than once, it is refreshed once.')
+            if not first.input_table_changes or not target.input_table_changes:
+                first.input_table_changes = None
+            else:
+                first.input_table_changes = {**first.input_table_changes, **target.input_table_changes}
+            if first.max_duration and target.max_duration:
+                first.max_duration = max(first.max_duration, target.max_duration)
+            else:
+                first.max_duration = 0
+        return list(unique.values())
+
+    def _resolve_selected_datasources(self, selectors):
+        """Expand ``datasource_selectors`` into datasource targets, one per matched datasource with the selected task.
+
+        Each selector is a single datasource listing filtered server-side by project name and tag, joined in memory
+        against the catalogue's tasks, so resolving it costs a request per page rather than per datasource. A project
+        of the tree whose name holds a comma takes a listing of its own.
+        """
+        projects = None
+        targets = []
+        for selector in selectors:
+            project = selector.get(KEY_PROJECT)
+            self._validate_required(project, "Project")
+            task_type = selector.get(KEY_DS_TYPE) or "RefreshExtractTask"
+            max_duration = self._non_negative_int(selector, KEY_MAX_DURATION, "Max duration")
+            project_ids = None
+            project_filters = [
+                tsc.Filter(tsc.RequestOptions.Field.ProjectName, tsc.RequestOptions.Operator.Equals, project)
+            ]
+            if selector.get(KEY_INCLUDE_SUBPROJECTS):
+                if projects is None:
+                    projects = fetch_all_pages(self.server.projects)
+                project_ids = self._project_tree_ids(projects, project)
+                if not project_ids:
+                    raise UserException(f"Project '{project}' of the datasource selector {selector} does not exist.")
+                # the names narrow the listing server-side; the IDs drop same-named projects outside the tree
+                project_names = sorted({p.name for p in projects if p.id in project_ids})
+                # a comma would split the name in an "in" filter, such a project is listed on its own
+                listed_together = [name for name in project_names if "," not in name]
+                project_filters = []
+                if listed_together:
+                    project_filters.append(
+                        tsc.Filter(
+                            tsc.RequestOptions.Field.ProjectName, tsc.RequestOptions.Operator.In, listed_together
+                        )
+                    )
+                project_filters.extend(
+                    tsc.Filter(tsc.RequestOptions.Field.ProjectName, tsc.RequestOptions.Operator.Equals, name)
+                    for name in project_names
+                    if "," in name
                 )
 
-            # poll job statuses
-            if poll_mode:
-                logging.info("Polling extract refresh statuses.")
-                self._wait_for_finish(executed_jobs)
+            listed_datasources = []
+            for project_filter in project_filters:
+                req_option = tsc.RequestOptions()
+                req_option.filter.add(project_filter)
+                if selector.get(KEY_TAG):
+                    req_option.filter.add(
+                        tsc.Filter(tsc.RequestOptions.Field.Tags, tsc.RequestOptions.Operator.Equals, selector[KEY_TAG])
+                    )
+                listed_datasources.extend(fetch_all_pages(self.server.datasources, req_option))
+
+            matched = []
+            for ds in listed_datasources:
+                if project_ids is not None and ds.project_id not in project_ids:
+                    continue
+                task = self.catalogue.task(ds.id, task_type)
+                if task:
+                    target = RefreshTarget(RefreshTarget.Kind.Datasource, ds.name, ds.id, task)
+                    target.last_refreshed_at = task.last_run_at
+                    target.max_duration = max_duration
+                    matched.append(target)
+            if not matched:
+                raise UserException(
+                    f"The datasource selector {selector} matched no datasource with a {task_type} task. "
+                    f"Check the project and tag, or create the extract refresh of that type first."
+                )
+            logging.info(
+                f"The datasource selector {selector} matched {len(matched)} datasources: "
+                + ", ".join(f'"{target.name}" (LUID: {target.luid})' for target in matched)
+            )
+            targets.extend(matched)
+        return targets
 
-        logging.info("Trigger finished successfully!")
+    @staticmethod
+    def _project_tree_ids(projects, name) -> set:
+        """Return the IDs of every project called ``name`` and of all projects nested in them."""
+        children = dict()
+        for project in projects:
+            children.setdefault(project.parent_id, []).append(project.id)
+        tree_ids = set()
+        pending = [project.id for project in projects if project.name == name]
+        while pending:
+            project_id = pending.pop()
+            if project_id not in tree_ids:
+                tree_ids.add(project_id)
+                pending.extend(children.get(project_id, []))
+        return tree_ids
+
+    def _export_run_metrics(self, targets):
+        """Write the run's metrics to the metrics output file and/or push them, as configured."""
+        self.run_metrics.stop()
+        self.run_metrics.observe_targets(targets)
+        if self.cfg_params.get(KEY_METRICS_FILE):
+            os.makedirs(self.files_out_path, exist_ok=True)
+            self.run_metrics.write(os.path.join(self.files_out_path, METRICS_FILE_NAME))
+        if self.cfg_params.get(KEY_METRICS_PUSH_URL):
+            self.run_metrics.push(self.cfg_params[KEY_METRICS_PUSH_URL])
+
+    def _write_run_results(self, targets, run_started_at):
+        """Write one row per target, with its outcome and (when polled) how its refresh job ended, to Storage."""
+        table = self.create_out_table_definition(
+            RUN_RESULTS_TABLE_NAME,
+            schema=RUN_RESULTS_COLUMNS,
+            has_header=True,
+            incremental=True,
+            # a datasource configured with its full and its incremental task has a row for each
+            primary_key=["run_id", "kind", "luid", "task_id"],
+            write_always=True,
+        )
+        run_id = os.getenv("KBC_RUNID") or run_started_at.isoformat()
+        with open(table.full_path, "w", newline="") as out_file:
+            writer = csv.DictWriter(out_file, fieldnames=RUN_RESULTS_COLUMNS)
+            writer.writeheader()
+            for target in targets:
+                task = target.item if target.kind == RefreshTarget.Kind.Datasource else None
+                job = target.job
+                writer.writerow(
+                    {
+                        "run_id": run_id,
+                        "run_started_at": run_started_at.isoformat(),
+                        "site_id": target.site_id,
+                        "kind": target.kind,
+                        "name": target.name,
+                        "luid": target.luid,
+                        "task_type": task.task_type if task else "",
+                        "task_id": task.id if task else "",
+                        "job_id": target.job_id or "",
+                        "outcome": target.outcome or "",
+                        "trigger_latency_seconds": self._format_seconds(target.trigger_latency),
+                        "finish_code": job.finish_code if job else "",
+                        "queued_seconds": self._format_seconds(self._seconds_between(job, "created_at", "started_at")),
+                        "run_seconds": self._format_seconds(self._seconds_between(job, "started_at", "completed_at")),
+                        "completed_at": job.completed_at.isoformat() if job and job.completed_at else "",
+                    }
+                )
+        self.write_manifest(table)
+        logging.info(f"Results of {len(targets)} targets written to the {RUN_RESULTS_TABLE_NAME} table.")
+
+    @staticmethod
+    def _seconds_between(job, start_attr, end_attr):
+        start, end = (getattr(job, start_attr, None), getattr(job, end_attr, None)) if job else (None, None)
+        return (end - start).total_seconds() if start and end else None
+
+    @staticmethod
+    def _format_seconds(seconds):
+        return "" if seconds is None else f"{seconds:.3f}"
+
+    @staticmethod
+    def _non_negative_int(params, key, label) -> int:
+        """Return the optional whole-number parameter ``key``, ``0`` when it is not set."""
+        value = params.get(key) or 0
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = -1
+        if value < 0:
+            raise UserException(f"{label} must be a positive whole number, or empty, got: {params.get(key)}")
+        return value
+
+    def _get_input_table_changes(self) -> dict:
+        """Return the ``last_change_date`` of every input mapping table, by Storage table ID and by file name."""
+        changes = dict()
+        for table in self.get_input_tables_definitions():
+            changes[table.id] = table.last_change_date
+            changes[table.name] = table.last_change_date
+        return changes
+
+    @staticmethod
+    def _select_input_table_changes(target, entry, table_changes) -> dict:
+        missing = [table for table in entry[KEY_INPUT_TABLES] if table not in table_changes]
+        if missing:
+            raise UserException(
+                f'Input tables {missing} configured for {target.kind} "{target.name}" are not in the input '
+                f"mapping of this configuration. Add them to the input mapping or correct the table IDs."
+            )
+        return {table: table_changes[table] for table in entry[KEY_INPUT_TABLES]}
+
+    @staticmethod
+    def _state_key(target) -> str:
+        """Identify ``target`` within and across runs: a datasource by its task, a workbook by its LUID.
+
+        A datasource with a full and an incremental refresh task is two targets, which must not share a key.
+        """
+        if target.kind == RefreshTarget.Kind.Datasource:
+            return f"{target.kind}:{target.item.id}"
+        return f"{target.kind}:{target.luid}"
+
+    @staticmethod
+    def _job_labels(targets) -> dict:
+        """Name the job of each of ``targets`` in messages, by its target key (see _state_key).
+
+        A name more than one target has (selectors can match it in several projects, a datasource can have several
+        refresh tasks) gets the target's LUID, and for a datasource its task type, added.
+        """
+        name_counts = Counter(target.name for target in targets)
+        labels = dict()
+        for target in targets:
+            label = target.name
+            if name_counts[target.name] > 1:
+                if target.kind == RefreshTarget.Kind.Datasource:
+                    label = f"{target.name} ({target.luid}, {target.item.task_type})"
+                else:
+                    label = f"{target.name} ({target.luid})"
+            labels[Component._state_key(target)] = label
+        return labels
+
+    def _job_label(self, key) -> str:
+        return (self.job_labels or {}).get(key, key)
+
+    def _input_tables_changed(self, target, previous_changes) -> bool:
+        """Did any input table ``target`` is mapped to change since the previous run triggered it?
+
+        A target without mapped input tables, or one no previous run has triggered, always counts as changed.
+        """
+        if not target.input_table_changes:
+            return True
+        previous = previous_changes.get(self._state_key(target))
+        if not previous:
+            return True
+        for table, last_change_date in target.input_table_changes.items():
+            if not previous.get(table) or not last_change_date:
+                return True
+            if datetime.fromisoformat(last_change_date) > datetime.fromisoformat(previous[table]):
+                return True
+        return False
+
+    @staticmethod
+    def _is_recently_refreshed(target, min_refresh_interval) -> bool:
+        """Did ``target``'s extract refresh less than ``min_refresh_interval`` minutes ago?
+
+        A target Tableau reports no previous refresh for is never considered fresh.
+        """
+        if not min_refresh_interval or target.last_refreshed_at is None:
+            return False
+        age = datetime.now(UTC) - target.last_refreshed_at
+        return age.total_seconds() < min_refresh_interval * 60
+
+    def _trigger(self, target, already_in_queue_as_warning, continue_on_error, poll_mode):
+        """Trigger the refresh of ``target``, recording its job id and outcome on it.
+
+        A trigger Tableau declines is either tolerated (logged, with the outcome recorded) or re-raised,
+        depending on ``already_in_queue_as_warning`` and ``continue_on_error``.
+        """
+        logging.info(f'Triggering extract for: "{target.name}" with LUID: "{target.luid}""')
+        started = time.monotonic()
+        try:
+            if target.kind == RefreshTarget.Kind.Datasource:
+                target.job_id = self._run_task(target.item)
+            else:
+                target.job_id = self.server.workbooks.refresh(target.item).id
+            target.outcome = RefreshTarget.Outcome.Triggered
+        except Exception as ex:
+            if isinstance(ex, tsc.ServerResponseError):
+                target.error_code = str(ex.code)
+            if already_in_queue_as_warning and self._is_refresh_already_queued(ex):
+                target.outcome = RefreshTarget.Outcome.AlreadyQueued
+                logging.warning(self._already_queued_message(ex, target.kind, target.name, poll_mode))
+            elif continue_on_error:
+                target.outcome = RefreshTarget.Outcome.Failed
+                logging.warning(f"Failed to trigger extract for {target.kind}: {target.name}. {ex}")
+            else:
+                target.outcome = RefreshTarget.Outcome.Failed
+                user_error = self._as_refresh_refused_user_exception(ex, target.kind, target.name)
+                if user_error:
+                    raise user_error from ex
+                raise ex
+        finally:
+            target.trigger_latency = time.monotonic() - started
+
+    def _validate_image_policy(self, cfg_params) -> None:
+        """Raise a ``UserException`` if ``cfg_params`` use what the image parameters forbid.
+
+        Checked on the configuration, and again on the parameters of every service run, which a request can change.
+        """
+        # If 'luid_required' is set to true, the component will validate that the LUID and Name
+        # is present for all datasources and workbooks
+        luid_required = self.image_params.get(KEY_LUID_REQUIRED, False)
+        if luid_required:
+            for ds in cfg_params.get(KEY_DATASOURCES) or []:
+                self._validate_required(ds.get(KEY_NAME), "Name")
+                self._validate_required(ds.get(KEY_LUID), "LUID")
+            for wb in cfg_params.get(KEY_WORKBOOKS) or []:
+                self._validate_required(wb.get(KEY_NAME), "Name")
+                self._validate_required(wb.get(KEY_LUID), "LUID")
+            for site in cfg_params.get(KEY_SITES) or []:
+                for entry in (site.get(KEY_DATASOURCES) or []) + (site.get(KEY_WORKBOOKS) or []):
+                    self._validate_required(entry.get(KEY_NAME), "Name")
+                    self._validate_required(entry.get(KEY_LUID), "LUID")
+
+        # If 'poll_mode_disabled' is set to true, the component will not poll the job statuses
+        poll_mode_disabled = self.image_params.get(KEY_POLL_MODE_DISABLED, False)
+        if poll_mode_disabled:
+            if cfg_params.get(KEY_POLL_MODE):
+                raise UserException("Poll must be set to false.")
+            # the admission window learns that a slot is free by polling the jobs it triggered
+            if cfg_params.get(KEY_MAX_CONCURRENT_REFRESHES):
+                raise UserException("Max concurrent refreshes must not be set.")
 
     def _validate_required(self, value: str, field_name: str) -> None:
         if not value or value == "":
@@ -357,42 +1571,72 @@ class Component(ComponentBase):
         job_id = root["tsResponse"]["job"]["@id"]
         return job_id
 
-    def get_all_datasource_refresh_tasks(self):
+    def get_all_datasource_refresh_tasks(self, use_snapshot=True):
         # filter only datasource refresh tasks
-        tasks = list(tsc.Pager(TaskCustom(self.server)))
+        return self.get_all_refresh_tasks("datasource", use_snapshot)
+
+    def get_all_refresh_tasks(self, target_type, use_snapshot=True):
+        tasks = self._get_site_tasks(use_snapshot)
         logging.debug(f"Found tasks: {tasks}")
-        return [task for task in tasks if task.target is not None and task.target.type == "datasource"]
+        return [task for task in tasks if task.target is not None and task.target.type == target_type]
+
+    def _get_site_tasks(self, use_snapshot=True):
+        """Return every extract refresh task of the site, from the task snapshot when ``cache_task_list`` is on.
+
+        The snapshot is checked with one request for a small first page: its total count and tasks must match what
+        the snapshot holds. Otherwise, or without a snapshot, the whole list is scanned and a new snapshot taken. A
+        first page holding every task of the site is used as it is.
+        """
+        endpoint = TaskCustom(self.server)
+        if self.task_snapshots is None:
+            return fetch_all_pages(endpoint)
+
+        site_key = f"{self.cfg_params.get(KEY_ENDPOINT)}|{self.cfg_params.get(KEY_SITE_ID) or ''}"
+        now = datetime.now(UTC)
+        page, pagination = endpoint.get(tsc.RequestOptions(pagesize=TASK_SNAPSHOT_SPOT_CHECK_SIZE))
+        total = pagination.total_available
+        # a short page is the last one, whatever the total says; a server that reports no total and returns more than
+        # the page size has ignored the paging and returned every task
+        if (
+            len(page) < TASK_SNAPSHOT_SPOT_CHECK_SIZE
+            or (total is None and len(page) > TASK_SNAPSHOT_SPOT_CHECK_SIZE)
+            or (total is not None and total <= len(page))
+        ):
+            tasks = page
+        else:
+            snapshot = TaskSnapshot.from_state(self.task_snapshots.get(site_key)) if use_snapshot else None
+            if snapshot and snapshot.matches(total, page, now, TASK_SNAPSHOT_MAX_AGE):
+                logging.info(
+                    f"The task list is unchanged since {snapshot.taken_at.isoformat()}, "
+                    f"using the snapshot of its {snapshot.total} tasks."
+                )
+                return snapshot.tasks
+            tasks = fetch_all_pages(endpoint)
+        self.task_snapshots[site_key] = TaskSnapshot(tasks, total, now).to_state()
+        return tasks
+
+    def get_last_workbook_refreshes(self):
+        """Return the latest ``last_run_at`` of any extract refresh task per workbook LUID."""
+        last_runs = dict()
+        for task in self.get_all_refresh_tasks("workbook"):
+            if task.last_run_at and (task.target.id not in last_runs or task.last_run_at > last_runs[task.target.id]):
+                last_runs[task.target.id] = task.last_run_at
+        return last_runs
 
     def validate_dataset_names(self, all_ds, datasources):
-        conf_ds_names = dict()
-        for ds in datasources:
-            conf_ds_names[ds["name"]] = ds["type"]
-        ds_names = [ds.name for ds in all_ds]
-        inv_names = [nm for nm in conf_ds_names if nm not in ds_names]
+        # compared as the catalogue matches names, case-insensitively
+        ds_names = {ds.name.casefold() for ds in all_ds}
+        inv_names = [ds[KEY_DS_NAME] for ds in datasources if ds[KEY_DS_NAME].casefold() not in ds_names]
         if inv_names:
             raise UserException(f"Some datasets do not exist: {inv_names}")
-        return conf_ds_names
-
-    def get_all_ds_for_tasks(self, tasks, all_ds):
-        ds_tasks = dict()
-        ds_ids = dict()
-        for ds in all_ds:
-            ds_ids[ds.id] = ds.name
-
-        for t in tasks:
-            if t.target.id not in ds_ids:
-                continue
-
-            ds = self.server.datasources.get_by_id(t.target.id)
-            # normalize increment task
-            ds_tasks[ds.name] = ds_tasks.get(ds.name, dict())
-            ds_tasks[ds.name][t.task_type.lower()] = t
-
-        return ds_tasks
 
-    def validate_dataset_types(self, ds_tasks, param):
-
-        inv_ds = [{ds: param[ds]} for ds in param if not ds_tasks.get(ds, {}).get(param[ds].lower())]
+    def validate_dataset_types(self, all_ds, datasources):
+        """Check that each configured datasource has a task of its type; ``all_ds`` holds their items, in order."""
+        inv_ds = [
+            {ds[KEY_DS_NAME]: ds[KEY_DS_TYPE]}
+            for ds, ds_item in zip(datasources, all_ds)
+            if not self.catalogue.task(ds_item.id, ds[KEY_DS_TYPE])
+        ]
 
         if inv_ds:
             raise UserException(
@@ -400,35 +1644,216 @@ class Component(ComponentBase):
                 f"Please create the extract refresh of that type first."
             )
 
-    def _wait_for_finish(self, executed_jobs):
-        remaining_jobs = executed_jobs.copy()
-        failed_jobs = dict()
-        while remaining_jobs:
-            for ds_name in list(remaining_jobs):
-                try:
-                    job = self.server.jobs.get_by_id(executed_jobs[ds_name])
-                except Exception as ex:
-                    logging.warning(f"Failed to get job status for '{ds_name}': {ex}")
-                    continue
-                if int(job.finish_code) >= 0:
-                    remaining_jobs.pop(ds_name, {})
-
-                    if int(job.finish_code) > 0:  # job failed
-                        failed_jobs[ds_name] = job
-            time.sleep(60)  # preventing too many requests error
+    def _wait_for_free_slot(
+        self, in_flight_jobs, finished_jobs, max_concurrent_refreshes, max_durations=None, started_at=None
+    ):
+        """Block until fewer than ``max_concurrent_refreshes`` of this run's jobs are queued or running.
 
+        Jobs seen finishing are moved from ``in_flight_jobs`` to ``finished_jobs``, so the admission window
+        and the final poll share what is already known instead of asking Tableau about a job twice. In poll mode
+        with ``fail_fast``, a failed job stops the run here, before the next target is triggered. Waiting ends with
+        a ``UserException`` once ``poll_timeout`` minutes have passed since ``started_at`` or a job has run longer
+        than its ``max_durations`` entry, as polling does (see _stop_overdue).
+        """
+        if len(in_flight_jobs) < max_concurrent_refreshes:
+            return
+        logging.info(
+            f"{len(in_flight_jobs)} refreshes triggered by this run are queued or running (limit "
+            f"{max_concurrent_refreshes}), waiting for one to finish before triggering the next."
+        )
+        # without poll mode a failed refresh does not fail the run, so there is nothing to fail fast on
+        fail_fast = self.cfg_params.get(KEY_POLL_MODE) and self.cfg_params.get(KEY_FAIL_FAST, False)
+        poll_timeout = self._non_negative_int(self.cfg_params, KEY_POLL_TIMEOUT, "Poll timeout")
+        max_durations = max_durations or {}
+        started_at = started_at or datetime.now(UTC)
+        last_seen_jobs = dict()
+        while True:
+            self._check_not_aborted()
+            self._poll_jobs(in_flight_jobs, finished_jobs, last_seen_jobs)
+            if fail_fast:
+                self._stop_on_failure(finished_jobs, in_flight_jobs)
+            if len(in_flight_jobs) < max_concurrent_refreshes:
+                return
+            if poll_timeout or max_durations:
+                self._stop_overdue(in_flight_jobs, last_seen_jobs, started_at, poll_timeout, max_durations)
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def _check_not_aborted(self):
+        """Raise ``RunAborted`` once the run was terminated; the signal interrupts the main thread only."""
+        if self.abort_guard:
+            self.abort_guard.check()
+
+    def _watched_for_abort(self, jobs):
+        """Context in which the unfinished ``jobs`` are cancelled if the run is terminated (see AbortGuard)."""
+        if not self.abort_guard:
+            return contextlib.nullcontext()
+        return self.abort_guard.watching(self.server, jobs, self.job_labels)
+
+    def _poll_jobs(self, remaining_jobs, finished_jobs, last_seen_jobs=None, names=None):
+        """Ask Tableau once about every job in ``remaining_jobs``; move the finished ones to ``finished_jobs``.
+
+        Only the jobs of ``names`` are asked about, when given. Every job Tableau returned is also kept in
+        ``last_seen_jobs``, when given.
+        """
+        for ds_name in list(remaining_jobs if names is None else names):
+            try:
+                job = self.server.jobs.get_by_id(remaining_jobs[ds_name])
+            except Exception as ex:
+                logging.warning(f"Failed to get job status for '{self._job_label(ds_name)}': {ex}")
+                continue
+            if last_seen_jobs is not None:
+                last_seen_jobs[ds_name] = job
+            if self.job_events:
+                self.job_events.observe(self._job_label(ds_name), job)
+            if int(job.finish_code) >= 0:
+                remaining_jobs.pop(ds_name, {})
+                finished_jobs[ds_name] = job
+
+    def _wait_for_finish(self, executed_jobs, finished_jobs=None, max_durations=None, started_at=None):
+        """Poll until every job in ``executed_jobs`` has finished, collecting them in ``finished_jobs``.
+
+        Jobs already in ``finished_jobs`` are not polled again. Raises a ``UserException`` listing every job that
+        did not finish successfully; with ``fail_fast`` as soon as the first one is seen (see _stop_on_failure).
+        Polling also ends with a ``UserException`` once ``poll_timeout`` minutes have passed since ``started_at``
+        (the first trigger; the start of polling when not given) or a job has run longer than its ``max_durations``
+        entry in minutes (see _stop_overdue).
+
+        With ``job_completions``, a pass asks Tableau only about the jobs a refresh webhook confirmed, and about
+        every job once in ``WEBHOOK_FALLBACK_POLL_SECONDS``, in case a webhook never arrives.
+        """
+        fail_fast = self.cfg_params.get(KEY_FAIL_FAST, False)
+        poll_timeout = self._non_negative_int(self.cfg_params, KEY_POLL_TIMEOUT, "Poll timeout")
+        max_durations = max_durations or {}
+        poll_started_at = started_at or datetime.now(UTC)
+        last_seen_jobs = dict()
+        finished_jobs = {} if finished_jobs is None else finished_jobs
+        remaining_jobs = {name: job_id for name, job_id in executed_jobs.items() if name not in finished_jobs}
+        last_full_poll = None
+        with self._watched_for_abort(remaining_jobs):
+            while remaining_jobs:
+                self._check_not_aborted()
+                if fail_fast:
+                    self._stop_on_failure(finished_jobs, remaining_jobs)
+                names = None
+                if (
+                    self.job_completions
+                    and last_full_poll is not None
+                    and time.monotonic() - last_full_poll < WEBHOOK_FALLBACK_POLL_SECONDS
+                ):
+                    confirmed = self.job_completions.confirmed(remaining_jobs.values())
+                    names = [name for name, job_id in remaining_jobs.items() if job_id in confirmed]
+                else:
+                    last_full_poll = time.monotonic()
+                self._poll_jobs(remaining_jobs, finished_jobs, last_seen_jobs, names)
+                if self.job_completions:
+                    # an event for an earlier refresh of the same target confirmed a job still running
+                    for name in names or []:
+                        if name in remaining_jobs:
+                            self.job_completions.recheck_later(remaining_jobs[name], datetime.now(UTC))
+                if fail_fast and remaining_jobs:
+                    self._stop_on_failure(finished_jobs, remaining_jobs)
+                if remaining_jobs and (poll_timeout or max_durations):
+                    self._stop_overdue(remaining_jobs, last_seen_jobs, poll_started_at, poll_timeout, max_durations)
+                # preventing too many requests error
+                time.sleep(WEBHOOK_CHECK_INTERVAL_SECONDS if self.job_completions else POLL_INTERVAL_SECONDS)
+
+        failed_jobs = {name: job for name, job in finished_jobs.items() if int(job.finish_code) > 0}
         if failed_jobs:
             failed_names = ", ".join(
-                f"'{name}' (finish_code={job.finish_code})" for name, job in failed_jobs.items()
+                f"'{self._job_label(name)}' (finish_code={job.finish_code})" for name, job in failed_jobs.items()
             )
             raise UserException(f"Some extract refresh jobs did not finish successfully: {failed_names}")
 
+    def _stop_overdue(self, remaining_jobs, last_seen_jobs, poll_started_at, poll_timeout, max_durations):
+        """Raise a ``UserException`` naming the jobs past ``poll_timeout`` or their ``max_durations`` entry.
+
+        A job's duration counts from its creation in Tableau, or from the start of polling when that is not known.
+        With ``cancel_overdue_jobs`` the overdue jobs are cancelled first; otherwise they continue in Tableau.
+        """
+        now = datetime.now(UTC)
+        timed_out = poll_timeout and now - poll_started_at >= timedelta(minutes=poll_timeout)
+        overdue = dict()
+        for name, job_id in remaining_jobs.items():
+            job = last_seen_jobs.get(name)
+            created_at = getattr(job, "created_at", None)
+            started_at = created_at if isinstance(created_at, datetime) else poll_started_at
+            running_for = now - started_at
+            if timed_out or (name in max_durations and running_for >= timedelta(minutes=max_durations[name])):
+                state = JobEventLog.state_of(job) if job else "unknown"
+                overdue[name] = (
+                    f"'{self._job_label(name)}' (job {job_id}, {state}, "
+                    f"for {running_for.total_seconds() / 60:.0f} min)"
+                )
+        if not overdue:
+            return
+
+        reason = (
+            f"Polling timed out after {poll_timeout} minutes"
+            if timed_out
+            else "Some extract refresh jobs ran longer than their max duration"
+        )
+        if self.cfg_params.get(KEY_CANCEL_OVERDUE_JOBS):
+            self._cancel_jobs({name: remaining_jobs[name] for name in overdue})
+            raise UserException(f"{reason}. These jobs were cancelled: {', '.join(overdue.values())}")
+        raise UserException(f"{reason}. These jobs continue in Tableau: {', '.join(overdue.values())}")
+
+    def _stop_on_failure(self, finished_jobs, remaining_jobs):
+        """Raise a ``UserException`` if a job in ``finished_jobs`` failed while ``remaining_jobs`` are still running.
+
+        With ``cancel_on_failure`` the jobs still running are cancelled first, freeing their backgrounder slots.
+        """
+        failed_jobs = {name: job for name, job in finished_jobs.items() if int(job.finish_code) > 0}
+        if not failed_jobs:
+            return
+        failed_names = ", ".join(
+            f"'{self._job_label(name)}' (finish_code={job.finish_code})" for name, job in failed_jobs.items()
+        )
+        if not remaining_jobs:
+            # the admission window saw the failure with no other job in flight
+            raise UserException(f"Some extract refresh jobs did not finish successfully: {failed_names}")
+        running_names = ", ".join(f"'{self._job_label(name)}'" for name in remaining_jobs)
+        if self.cfg_params.get(KEY_CANCEL_ON_FAILURE):
+            self._cancel_jobs(remaining_jobs)
+            raise UserException(
+                f"Some extract refresh jobs did not finish successfully: {failed_names}. "
+                f"The jobs still running were cancelled: {running_names}"
+            )
+        raise UserException(
+            f"Some extract refresh jobs did not finish successfully: {failed_names}. "
+            f"Not waiting for the jobs still running, which continue in Tableau: {running_names}"
+        )
+
+    def _cancel_jobs(self, jobs):
+        """Ask Tableau to cancel every job in ``jobs``; one that cannot be cancelled is logged and left running."""
+        for name, job_id in jobs.items():
+            try:
+                self.server.jobs.cancel(job_id)
+            except Exception as ex:
+                logging.warning(f"Failed to cancel extract refresh job {job_id} for '{self._job_label(name)}': {ex}")
+                continue
+            logging.info(f"Cancelled extract refresh job {job_id} for '{self._job_label(name)}'.")
+
     def _get_all_ds_by_filter(self, kind, data_sources):
-        all_ds = list()
+        """Return the items of ``kind`` the entries ``data_sources`` select, in order, and the entries' errors."""
+        entry_items, validation_errors = self._get_items_by_entry(kind, data_sources)
+        return [item for _, items in entry_items for item in items], validation_errors
+
+    def _get_items_by_entry(self, kind, data_sources):
+        """Return ``(entry, items)`` for each of the entries ``data_sources``, in order, and the entries' errors.
+
+        The items of all configured names are listed into the catalogue at once, and each entry looked up there.
+        """
+        kind_singular = kind.rstrip("s")  # "datasources" -> "datasource", "workbooks" -> "workbook"
+        self._list_into_catalogue(kind, [ds_filter[KEY_NAME] for ds_filter in data_sources if ds_filter.get(KEY_NAME)])
+        entry_items = list()
         validation_errors = list()
         for ds_filter in data_sources:
             # if luid specified get the source
-            if ds_filter.get(KEY_LUID):
+            res = self.catalogue.item(kind_singular, ds_filter.get(KEY_LUID)) if ds_filter.get(KEY_LUID) else None
+            if res:
+                ds = [res]
+            elif ds_filter.get(KEY_LUID):
+                # not listed under the configured name: fetched to tell a wrong LUID from a wrong name
                 try:
                     res = getattr(self.server, kind).get_by_id(ds_filter[KEY_LUID])
                 except tsc.ServerResponseError as ex:
@@ -439,7 +1864,6 @@ class Component(ComponentBase):
                     # message analogous to the not-found case _validate_ds_result already
                     # handles a few lines below, instead of a generic crash.
                     if str(ex.code).startswith("404"):
-                        kind_singular = kind.rstrip("s")  # "datasources" -> "datasource", "workbooks" -> "workbook"
                         raise UserException(
                             f"There is no result for specified LUID, the {kind_singular} entry does not "
                             f"exist: {ds_filter[KEY_LUID]}"
@@ -448,13 +1872,34 @@ class Component(ComponentBase):
                 ds = [res] if res else []
 
             else:
-                ds = self._get_all_datasources_by_filter(kind, ds_filter[KEY_NAME], ds_filter.get(KEY_TAG))
-            all_ds.extend(ds)
+                ds = self.catalogue.find(kind_singular, ds_filter[KEY_NAME], ds_filter.get(KEY_TAG))
+            entry_items.append((ds_filter, ds))
             err = self._validate_ds_result(ds_filter, ds)
             if err:
                 validation_errors.append(err)
 
-        return all_ds, validation_errors
+        return entry_items, validation_errors
+
+    def _list_into_catalogue(self, kind, names):
+        """List every item of ``kind`` called one of ``names`` into the catalogue, with a request per chunk of names."""
+        kind_singular = kind.rstrip("s")
+        # a comma would split the name in an "in" filter, such a name is listed on its own; a name listed already
+        # (from the Metadata API) is not listed again
+        names = sorted({name for name in names if not self.catalogue.find(kind_singular, name)})
+        listed_together = [name for name in names if "," not in name]
+        for start in range(0, len(listed_together), NAME_FILTER_CHUNK_SIZE):
+            req_option = tsc.RequestOptions()
+            req_option.filter.add(
+                tsc.Filter(
+                    tsc.RequestOptions.Field.Name,
+                    tsc.RequestOptions.Operator.In,
+                    listed_together[start : start + NAME_FILTER_CHUNK_SIZE],
+                )
+            )
+            self.catalogue.add_items(kind_singular, fetch_all_pages(getattr(self.server, kind), req_option))
+        for name in names:
+            if "," in name:
+                self.catalogue.add_items(kind_singular, self._get_all_datasources_by_filter(kind, name, None))
 
     def _str_ds(self, ds_arr):
         str = "["
@@ -490,14 +1935,171 @@ class Component(ComponentBase):
         if tag:
             req_option.filter.add(tsc.Filter(tsc.RequestOptions.Field.Tags, tsc.RequestOptions.Operator.Equals, tag))
 
-        datasource_items = list(tsc.Pager(getattr(self.server, kind), req_option))
+        datasource_items = fetch_all_pages(getattr(self.server, kind), req_option)
         return datasource_items
 
 
+def run_batch(paths) -> int:
+    """Run several configurations in this process, one after another; return the exit code of the worst one.
+
+    Each of ``paths`` is a configuration file or the data folder holding it. Configurations on the same server,
+    site and account share one connection, one sign-in and their site's task list, which a later configuration takes
+    over after one small request (see _get_site_tasks). Each still runs with its own state and output, its log
+    forms a section of its own, and its outcome is summarized at the end. Nothing else is shared: a configuration
+    resolves its own targets and polls its own jobs, and the next one starts when it has finished.
+    """
+    servers = dict()
+    sessions = dict()
+    task_snapshots = dict()
+    outcomes = []
+    try:
+        for path in paths:
+            logging.info(f"===== Configuration {path} =====")
+            try:
+                comp = Component(os.path.dirname(path) if os.path.isfile(path) else path, servers)
+                session_key = comp._session_key()
+                if session_key not in sessions:
+                    sessions[session_key] = comp._sign_in()
+                comp.batch_session = sessions[session_key]
+                if comp._can_use_task_snapshot(comp.cfg_params):
+                    comp.task_snapshots = task_snapshots.setdefault(session_key, {})
+                comp.execute_action()
+            except (UserException, tsc.FailedSignInError) as exc:
+                logging.exception(exc)
+                outcomes.append((path, 1, str(exc)))
+            except Exception as exc:
+                logging.exception(exc)
+                outcomes.append((path, 2, str(exc)))
+            else:
+                outcomes.append((path, 0, ""))
+    finally:
+        for session in sessions.values():
+            with contextlib.suppress(Exception):
+                session.__exit__(None, None, None)
+
+    logging.info("===== Batch summary =====")
+    for path, exit_code, error in outcomes:
+        if exit_code:
+            logging.error(f"Configuration {path} failed: {error}")
+        else:
+            logging.info(f"Configuration {path} finished successfully.")
+    return max((exit_code for _, exit_code, _ in outcomes), default=0)
+
+
+def trigger_service(comp) -> TriggerService:
+    """Return a trigger service (see TriggerService) running the configuration of ``comp``, with warm caches.
+
+    The connection and sign-in of ``comp`` (signed in to on the first request, and again after a run failed on an
+    expired sign-in) and the site's task list (see _get_site_tasks) are kept between runs, so a run takes little more
+    than its triggers. The list of targets is cached as for the list sync actions.
+
+    The state is read from the data folder by the first run only and then kept in memory: each run starts from the
+    state the previous one wrote, as consecutive jobs of the platform would. Every write still goes to the data folder.
+    """
+    task_snapshots = dict()
+    sign_in_lock = threading.Lock()
+    state_lock = threading.Lock()
+    # holds "state" once the first run has read it
+    kept_state = dict()
+
+    def get_state_file():
+        with state_lock:
+            if "state" not in kept_state:
+                kept_state["state"] = comp.get_state_file()
+            return copy.deepcopy(kept_state["state"])
+
+    def write_state_file(state):
+        with state_lock:
+            kept_state["state"] = copy.deepcopy(state)
+        comp.write_state_file(state)
+    # the list of targets is built for one request at a time
+    list_lock = threading.Lock()
+
+    def signed_in_copy():
+        with sign_in_lock:
+            if comp.batch_session is None:
+                comp.batch_session = comp._sign_in()
+        return copy.copy(comp)
+
+    def run(parameters, targets):
+        # signal handlers can only be installed on the main thread, which the service keeps for itself
+        cfg_params = {**comp.cfg_params, **parameters, KEY_CANCEL_ON_ABORT: False}
+        # a request must not switch on what the image forbids
+        comp._validate_image_policy(cfg_params)
+        run_comp = signed_in_copy()
+        run_comp.cfg_params = cfg_params
+        run_comp.run_targets = targets
+        run_comp.get_state_file = get_state_file
+        run_comp.write_state_file = write_state_file
+        if run_comp._can_use_task_snapshot(run_comp.cfg_params):
+            run_comp.task_snapshots = task_snapshots
+        try:
+            run_comp.run()
+        except tsc.FailedSignInError:
+            with sign_in_lock:
+                comp.batch_session = None
+            raise
+
+    def list_targets():
+        with list_lock:
+            return signed_in_copy()._get_target_catalogue()
+
+    return TriggerService(run, list_targets)
+
+
+def serve_arguments(args) -> tuple:
+    """Return the ``(path, port)`` of the arguments following ``--serve``; raise a ``UserException`` on wrong ones."""
+    if len(args) not in (1, 2) or not args[0]:
+        raise UserException(f"Usage: {SERVE_USAGE}")
+    if len(args) == 1:
+        return args[0], SERVICE_PORT
+    try:
+        port = int(args[1])
+    except ValueError:
+        port = -1
+    if not 0 < port < 65536:
+        raise UserException(f"The port must be a whole number from 1 to 65535, got: {args[1]}. Usage: {SERVE_USAGE}")
+    return args[0], port
+
+
+def serve(path, port) -> int:
+    """Serve the trigger API for the configuration at ``path`` on ``port`` until terminated; return 0.
+
+    ``path`` is a configuration file or the data folder holding it. On SIGTERM or SIGINT the service stops taking
+    requests, finishes the runs it queued and signs out.
+    """
+    comp = Component(os.path.dirname(path) if os.path.isfile(path) else path)
+    service = trigger_service(comp)
+    service.listen(port)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logging.info("Stopping the trigger service once the queued runs finish.")
+    finally:
+        service.close()
+        if comp.batch_session is not None:
+            with contextlib.suppress(Exception):
+                comp.batch_session.__exit__(None, None, None)
+    return 0
+
+
 """
         Main entrypoint
 """
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--batch"]:
+        if not sys.argv[2:]:
+            logging.error(f"Usage: {BATCH_USAGE}")
+            exit(1)
+        exit(run_batch(sys.argv[2:]))
+    if sys.argv[1:2] == ["--serve"]:
+        try:
+            serve_path, serve_port = serve_arguments(sys.argv[2:])
+        except UserException as exc:
+            logging.error(exc)
+            exit(1)
+        exit(serve(serve_path, serve_port))
     try:
         comp = Component()
         # this triggers the run method by default and is controlled by the configuration.action parameter
@@ -0,0 +1,38 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class FileCache:
+    """JSON values kept on disk for ``ttl`` seconds, so repeated short-lived processes can share a result.
+
+    Keys are hashed into file names, so they may contain anything (endpoints, site IDs, user names). A value that
+    cannot be read back is treated as missing rather than failing the caller.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            return None
+        return entry.get("value")
+
+    def set(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        # written aside and moved into place, so a concurrent reader never sees a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp_file:
+            json.dump({"stored_at": time.time(), "value": value}, tmp_file)
+        os.replace(tmp_path, self._path(key))
@@ -0,0 +1,130 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class JobCompletions:
+    """Refresh jobs Tableau's webhooks report as ended, so polling asks only about those.
+
+    Tableau sends a ``DatasourceRefreshSucceeded``/``Failed`` or ``WorkbookRefreshSucceeded``/``Failed`` webhook
+    when an extract refresh ends, naming the LUID of the refreshed target. A job expected with ``expect`` counts as
+    confirmed once an event for its target created after it was triggered has arrived. Events are received by a
+    local HTTP listener (``listen``), or fetched from ``relay_url``, which receives the webhooks and answers a GET
+    with them as a JSON list. The listener binds to localhost unless told otherwise; anyone able to reach it can send
+    an event, so a confirmation is only a hint to ask Tableau about the job.
+    """
+
+    EVENT_TYPES = frozenset(
+        {
+            "DatasourceRefreshSucceeded",
+            "DatasourceRefreshFailed",
+            "WorkbookRefreshSucceeded",
+            "WorkbookRefreshFailed",
+        }
+    )
+    # tolerated difference between Tableau's clock, which dates the events, and this one
+    CLOCK_SKEW = timedelta(minutes=1)
+    RELAY_TIMEOUT_SECONDS = 30
+
+    def __init__(self, relay_url=None):
+        self.relay_url = relay_url
+        self._last_event_at = dict()
+        self._expected = dict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def listen(self, port, host="127.0.0.1") -> int:
+        """Receive webhooks on ``port`` (any free one for ``0``) in a background thread; return the port."""
+        completions = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                try:
+                    completions.add_event(json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0))))
+                except ValueError as ex:
+                    logging.debug(f"Webhook listener: rejected a payload: {ex}")
+                    self.send_response(400)
+                else:
+                    self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logging.debug(f"Webhook listener: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Listening for refresh webhooks on port {self._server.server_address[1]}.")
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def add_event(self, payload) -> bool:
+        """Record a webhook ``payload``; return whether it is a refresh event this can use.
+
+        Raises ``ValueError`` for a payload that is not a webhook, or a refresh event without a LUID or without a
+        ``created_at`` timestamp with a timezone, which could not be compared with the trigger times.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("The payload is not a JSON object.")
+        if payload.get("event_type") not in self.EVENT_TYPES:
+            return False
+        luid = payload.get("resource_luid")
+        if not luid or not isinstance(luid, str):
+            raise ValueError("The refresh event has no resource_luid.")
+        try:
+            created_at = datetime.fromisoformat(payload["created_at"])
+        except (KeyError, TypeError, ValueError) as ex:
+            raise ValueError(f"The refresh event has no valid created_at: {payload.get('created_at')!r}.") from ex
+        if created_at.tzinfo is None:
+            raise ValueError(f"The created_at of the refresh event has no timezone: {payload['created_at']!r}.")
+        with self._lock:
+            if luid not in self._last_event_at or created_at > self._last_event_at[luid]:
+                self._last_event_at[luid] = created_at
+        logging.debug(f"Received {payload['event_type']} webhook for {luid} created at {created_at.isoformat()}.")
+        return True
+
+    def expect(self, job_id, luid, since):
+        """Confirm ``job_id`` once an event for the target ``luid`` created after ``since`` arrives."""
+        with self._lock:
+            self._expected[job_id] = (luid, since)
+
+    def recheck_later(self, job_id, now):
+        """Let only events newer than ``now`` confirm ``job_id``: Tableau reported it still running."""
+        with self._lock:
+            if job_id in self._expected:
+                self._expected[job_id] = (self._expected[job_id][0], now)
+
+    def confirmed(self, job_ids) -> set:
+        """Return those of ``job_ids`` an event has confirmed, fetching the relay's events first when set."""
+        if self.relay_url:
+            self._fetch_relay()
+        confirmed = set()
+        with self._lock:
+            for job_id in job_ids:
+                luid, since = self._expected.get(job_id, (None, None))
+                last_event_at = self._last_event_at.get(luid)
+                if last_event_at and last_event_at >= since - self.CLOCK_SKEW:
+                    confirmed.add(job_id)
+        return confirmed
+
+    def _fetch_relay(self):
+        try:
+            response = requests.get(self.relay_url, timeout=self.RELAY_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            events = response.json()
+        except (requests.RequestException, ValueError) as ex:
+            logging.warning(f"Failed to fetch refresh webhooks from the relay, relying on polling: {ex}")
+            return
+        for event in events if isinstance(events, list) else []:
+            try:
+                self.add_event(event)
+            except ValueError as ex:
+                logging.warning(f"Ignoring an invalid refresh webhook from the relay: {ex}")
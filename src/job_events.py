@@ -0,0 +1,72 @@
+import json
+import logging
+import threading
+from datetime import UTC, datetime
+
+
+class JobEventLog:
+    """Reports every change of a polled refresh job's state as it is seen.
+
+    Each change is logged and, when ``path`` is set, appended to it as one JSON object per line, so a long batch of
+    refreshes can be followed while it runs. Jobs are told apart by the key the run tracks them under. Sites poll
+    concurrently, so changes are recorded under a lock.
+    """
+
+    class State:
+        Queued = "queued"
+        InProgress = "in-progress"
+        Success = "success"
+        Failed = "failed"
+        Cancelled = "cancelled"
+
+    FINISH_CODE_STATES = {0: State.Success, 1: State.Failed, 2: State.Cancelled}
+
+    def __init__(self, path=None):
+        self.path = path
+        self._states = dict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def state_of(cls, job):
+        finish_code = int(job.finish_code)
+        if finish_code < 0:
+            return cls.State.InProgress if job.started_at else cls.State.Queued
+        return cls.FINISH_CODE_STATES.get(finish_code, cls.State.Failed)
+
+    def observe(self, key, job):
+        """Record ``job``'s current state; report it if it differs from the one last seen for ``key``."""
+        state = self.state_of(job)
+        with self._lock:
+            previous_state = self._states.get(key)
+            if state == previous_state:
+                return
+            self._states[key] = state
+            event = {
+                "time": datetime.now(UTC).isoformat(),
+                "name": key,
+                "job_id": job.id,
+                "previous_state": previous_state,
+                "state": state,
+                "elapsed_seconds": self._elapsed_seconds(job),
+                "finish_code": int(job.finish_code),
+                "notes": list(job.notes or []) if state in (self.State.Failed, self.State.Cancelled) else [],
+            }
+            if self.path:
+                with open(self.path, "a") as events_file:
+                    events_file.write(json.dumps(event) + "\n")
+
+        elapsed = f" after {event['elapsed_seconds']:.0f}s" if event["elapsed_seconds"] is not None else ""
+        notes = f": {'; '.join(event['notes'])}" if event["notes"] else ""
+        message = f"Extract refresh job {job.id} for '{key}' is {state}{elapsed}{notes}"
+        if state in (self.State.Failed, self.State.Cancelled):
+            logging.warning(message, extra={"job_event": event})
+        else:
+            logging.info(message, extra={"job_event": event})
+
+    @staticmethod
+    def _elapsed_seconds(job):
+        created_at = getattr(job, "created_at", None)
+        if not isinstance(created_at, datetime):
+            return None
+        end = job.completed_at if isinstance(job.completed_at, datetime) else datetime.now(UTC)
+        return round((end - created_at).total_seconds(), 3)
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime
+
+import requests
+from tableauserverclient.server.endpoint.exceptions import TableauError
+from tableauserverclient.server.exceptions import EndpointUnavailableError
+
+DATASOURCE_FIELDS = "luid name projectName tags { name }"
+WORKBOOK_FIELDS = (
+    "luid name projectName tags { name } "
+    "embeddedDatasources { hasExtracts extractLastRefreshTime extractLastIncrementalUpdateTime }"
+)
+
+
+class MetadataUnavailableError(Exception):
+    """The Metadata API did not answer: it is disabled on the server, the server is too old, or the query failed."""
+
+
+class MetadataItem:
+    """A datasource or workbook as the Metadata API describes it, standing in for the REST item of the same LUID.
+
+    ``last_refreshed_at`` is, for a workbook, the latest full or incremental refresh of its embedded extracts, if any.
+    """
+
+    def __init__(self, luid, name, project_name, tags, last_refreshed_at=None):
+        self.id = luid
+        self.name = name
+        self.project_name = project_name
+        self.tags = set(tags)
+        self.last_refreshed_at = last_refreshed_at
+
+    def __repr__(self):
+        return f"<MetadataItem {self.name!r} luid({self.id}) project({self.project_name})>"
+
+
+class MetadataResolver:
+    """Looks datasources and workbooks up by name with a single Metadata API (GraphQL) query.
+
+    The query asks for the published datasources and the workbooks called one of the given names at once, with their
+    LUIDs, projects and tags, and for each workbook the extract refresh times of its embedded datasources. Items the
+    Metadata API has not indexed yet (it has no LUID for them) are left out, for the caller to look up over REST.
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    def resolve(self, datasource_names, workbook_names) -> tuple:
+        """Return the ``MetadataItem`` of every datasource and of every workbook called one of the given names."""
+        fields = []
+        if datasource_names:
+            fields.append(f"publishedDatasources{self._name_filter(datasource_names)} {{ {DATASOURCE_FIELDS} }}")
+        if workbook_names:
+            fields.append(f"workbooks{self._name_filter(workbook_names)} {{ {WORKBOOK_FIELDS} }}")
+        if not fields:
+            return [], []
+
+        try:
+            result = self.server.metadata.query(f"query refreshTargets {{ {' '.join(fields)} }}")
+        except (TableauError, EndpointUnavailableError, requests.RequestException, ValueError) as ex:
+            raise MetadataUnavailableError(str(ex) or type(ex).__name__) from ex
+        if result.get("errors") or not isinstance(result.get("data"), dict):
+            messages = [error.get("message", str(error)) for error in result.get("errors") or []]
+            raise MetadataUnavailableError("; ".join(messages) or "The response holds no data.")
+
+        data = result["data"]
+        datasources = [self._item(node) for node in data.get("publishedDatasources") or [] if node.get("luid")]
+        workbooks = [
+            self._item(node, self._last_refresh(node.get("embeddedDatasources") or []))
+            for node in data.get("workbooks") or []
+            if node.get("luid")
+        ]
+        return datasources, workbooks
+
+    @staticmethod
+    def _name_filter(names) -> str:
+        # a JSON string is a valid GraphQL string literal
+        return f"(filter: {{nameWithin: {json.dumps(sorted(set(names)), ensure_ascii=False)}}})"
+
+    @staticmethod
+    def _item(node, last_refreshed_at=None) -> MetadataItem:
+        tags = [tag["name"] for tag in node.get("tags") or []]
+        return MetadataItem(node["luid"], node["name"], node.get("projectName"), tags, last_refreshed_at)
+
+    @staticmethod
+    def _last_refresh(embedded_datasources):
+        refreshes = [
+            datetime.fromisoformat(timestamp)
+            for datasource in embedded_datasources
+            if datasource.get("hasExtracts")
+            for field in ("extractLastRefreshTime", "extractLastIncrementalUpdateTime")
+            if (timestamp := datasource.get(field))
+        ]
+        return max(refreshes) if refreshes else None
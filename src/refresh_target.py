@@ -0,0 +1,42 @@
+class RefreshTarget:
+    """One extract refresh the run triggers.
+
+    A datasource target carries the extract refresh ``TaskItem`` that is run; a workbook target carries the
+    ``WorkbookItem`` whose embedded extracts are refreshed. ``last_refreshed_at`` is when Tableau last ran
+    a refresh of it, if known; ``input_table_changes`` maps the input tables its trigger depends on to their
+    ``last_change_date``; ``site_id`` is the Tableau site it lives on. ``max_duration`` is how many minutes its
+    refresh may take before polling gives up on it, if limited. ``job_id``, ``outcome`` and
+    ``trigger_latency`` (seconds the trigger request took) are filled in when the target is triggered, with
+    ``error_code`` (Tableau's code for the error) when the trigger failed; ``job`` (the finished ``JobItem``) once
+    polling saw its refresh job finish.
+    """
+
+    class Kind:
+        Datasource = "datasource"
+        Workbook = "workbook"
+
+    class Outcome:
+        Triggered = "triggered"
+        AlreadyQueued = "already-queued"
+        # not triggered: the refresh already queued or running in Tableau was taken over
+        Attached = "attached"
+        Failed = "failed"
+        Skipped = "skipped"
+
+    def __init__(self, kind, name, luid, item):
+        self.kind = kind
+        self.name = name
+        self.luid = luid
+        self.item = item
+        self.site_id = ""
+        self.max_duration = None
+        self.last_refreshed_at = None
+        self.input_table_changes = None
+        self.job_id = None
+        self.trigger_latency = None
+        self.error_code = None
+        self.outcome = None
+        self.job = None
+
+    def __repr__(self):
+        return "<RefreshTarget {kind} {name!r} luid({luid}) job({job_id}) outcome({outcome})>".format(**self.__dict__)
@@ -0,0 +1,40 @@
+import threading
+from datetime import datetime, timedelta
+
+
+class RunCheckpoint:
+    """The jobs a run triggered, kept in the state file and rewritten after every trigger.
+
+    A run started within ``resume_window`` minutes of the run that saved the checkpoint resumes it: ``resumable``
+    then holds that run's record per target key. The window is measured from the first run of a chain of
+    retries, so a target that keeps failing is not resumed forever. Sites are processed concurrently, so
+    records are written under a lock.
+    """
+
+    STATE_KEY = "checkpoint"
+
+    def __init__(self, state, write_state, started_at, resume_window):
+        self._state = state
+        self._write_state = write_state
+        self._lock = threading.Lock()
+        self.resumable = dict()
+
+        previous = state.get(self.STATE_KEY) or {}
+        if previous.get("started_at") and resume_window:
+            previous_start = datetime.fromisoformat(previous["started_at"])
+            if started_at - previous_start < timedelta(minutes=resume_window):
+                self.resumable = previous.get("targets") or {}
+                started_at = previous_start
+        self.started_at = started_at
+        state[self.STATE_KEY] = {"started_at": started_at.isoformat(), "targets": dict(self.resumable)}
+
+    def record(self, key, target):
+        """Save ``target``'s job and outcome under ``key`` and write the state file."""
+        with self._lock:
+            self._state[self.STATE_KEY]["targets"][key] = {"job_id": target.job_id, "outcome": target.outcome}
+            self._write_state(self._state)
+
+    def clear(self):
+        """Drop the checkpoint once the run finished, so the next run starts afresh."""
+        with self._lock:
+            self._state.pop(self.STATE_KEY, None)
@@ -0,0 +1,166 @@
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from refresh_target import RefreshTarget
+
+
+class RunMetrics:
+    """Metrics of one run in the OpenMetrics text format, for dashboards next to other pipeline stages.
+
+    REST calls are counted by method and endpoint as the responses arrive on every session handed to ``watch``; the
+    trigger and refresh metrics are taken from the run's targets by ``observe_targets`` once the run ends. IDs and the
+    API version in request paths are replaced by placeholders, so an endpoint is a single series however many
+    targets are refreshed.
+    """
+
+    PREFIX = "tableau_refresh"
+    TRIGGER_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    REFRESH_DURATION_BUCKETS = (30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+    PUSH_TIMEOUT_SECONDS = 30
+
+    _API_VERSION = re.compile(r"^/api/[\d.]+/")
+    _ID_SEGMENT = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)")
+
+    def __init__(self):
+        self.rest_calls = Counter()
+        self.triggers_attempted = 0
+        self.already_queued_skipped = 0
+        self.trigger_failures = Counter()
+        self.trigger_latencies = []
+        self.refresh_durations = []
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def watch(self, session):
+        """Count every response ``session`` (a ``requests.Session``) receives until ``stop``."""
+        session.hooks["response"].append(self._count_rest_call)
+        self._sessions.append(session)
+
+    def stop(self):
+        """Stop counting REST calls; a batch run reuses the sessions for its next configuration."""
+        for session in self._sessions:
+            session.hooks["response"].remove(self._count_rest_call)
+        self._sessions.clear()
+
+    def _count_rest_call(self, response, *args, **kwargs):
+        path = self._API_VERSION.sub("/api/{version}/", urlsplit(response.request.url).path)
+        endpoint = self._ID_SEGMENT.sub("/{id}", path)
+        with self._lock:
+            self.rest_calls[(response.request.method, endpoint)] += 1
+
+    def observe_targets(self, targets):
+        for target in targets:
+            if target.trigger_latency is None:
+                continue  # not triggered by this run: skipped, or taken over from a resumed run
+            self.triggers_attempted += 1
+            self.trigger_latencies.append(target.trigger_latency)
+            if target.outcome == RefreshTarget.Outcome.AlreadyQueued:
+                self.already_queued_skipped += 1
+            elif target.outcome == RefreshTarget.Outcome.Failed:
+                self.trigger_failures[self._code_family(target.error_code)] += 1
+            job = target.job
+            if job and isinstance(job.started_at, datetime) and isinstance(job.completed_at, datetime):
+                self.refresh_durations.append((job.completed_at - job.started_at).total_seconds())
+
+    @staticmethod
+    def _code_family(error_code) -> str:
+        """Return the HTTP status family (e.g. ``4xx``) of a Tableau error code such as ``403069``."""
+        if not error_code:
+            return "none"
+        # Tableau's error codes start with the HTTP status they come with
+        return f"{error_code[0]}xx" if error_code[0].isdigit() else "other"
+
+    def render(self) -> str:
+        lines = []
+        self._counter(
+            lines, "trigger_attempts", "Extract refreshes the run tried to trigger.", {(): self.triggers_attempted}
+        )
+        self._counter(
+            lines,
+            "already_queued_skipped",
+            "Triggers Tableau declined because a refresh of the target was already queued or running.",
+            {(): self.already_queued_skipped},
+        )
+        self._counter(
+            lines,
+            "trigger_failures",
+            "Triggers that failed, by the HTTP status family of Tableau's error code.",
+            {(("code_family", family),): count for family, count in sorted(self.trigger_failures.items())},
+        )
+        self._counter(
+            lines,
+            "rest_calls",
+            "REST API calls made, by method and endpoint.",
+            {
+                (("method", method), ("endpoint", endpoint)): count
+                for (method, endpoint), count in sorted(self.rest_calls.items())
+            },
+        )
+        self._histogram(
+            lines,
+            "trigger_latency_seconds",
+            "Time a trigger request took.",
+            self.TRIGGER_LATENCY_BUCKETS,
+            self.trigger_latencies,
+        )
+        self._histogram(
+            lines,
+            "duration_seconds",
+            "Time a refresh job ran in Tableau, for the jobs seen to finish.",
+            self.REFRESH_DURATION_BUCKETS,
+            self.refresh_durations,
+        )
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        with open(path, "w") as metrics_file:
+            metrics_file.write(self.render())
+
+    def push(self, url):
+        """Send the metrics to a pushgateway-compatible ``url``; a failed push is logged and otherwise ignored."""
+        try:
+            response = requests.put(
+                url,
+                data=self.render().encode("utf-8"),
+                headers={"Content-Type": "application/openmetrics-text; version=1.0.0; charset=utf-8"},
+                timeout=self.PUSH_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            logging.warning(f"Failed to push the run metrics to {url}: {ex}")
+
+    def _counter(self, lines, name, help_text, samples):
+        """Add counter ``name`` with ``samples``, a dictionary of label (name, value) pairs -> count."""
+        name = f"{self.PREFIX}_{name}"
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"# HELP {name} {help_text}")
+        for labels, value in samples.items():
+            lines.append(f"{name}_total{self._labels(labels)} {value}")
+
+    def _histogram(self, lines, name, help_text, buckets, values):
+        name = f"{self.PREFIX}_{name}"
+        lines.append(f"# TYPE {name} histogram")
+        lines.append(f"# HELP {name} {help_text}")
+        for bound in buckets:
+            count = sum(1 for value in values if value <= bound)
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {len(values)}')
+        lines.append(f"{name}_count {len(values)}")
+        lines.append(f"{name}_sum {sum(values)}")
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        pairs = []
+        for key, value in labels:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
@@ -0,0 +1,89 @@
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+PSTATS_FILE_NAME = "profile.pstats"
+ALLOCATIONS_FILE_NAME = "profile_allocations.txt"
+COLLAPSED_STACKS_FILE_NAME = "profile.collapsed"
+
+
+class RunProfile:
+    """A CPU and allocation profile of a run, to tell network waits from parsing and model construction.
+
+    Between ``start`` and ``stop``, cProfile profiles the thread that started it, tracemalloc traces allocations
+    and the stacks of all threads are sampled every ``sample_interval`` seconds, so the threads that sign in to
+    sites and poll jobs show up too. ``write`` saves the cProfile stats (for ``pstats`` or snakeviz), the
+    ``top_n`` source lines that allocated the most memory still held at ``stop`` and the sampled stacks in the
+    collapsed format of flame graph tools, one stack per line with the thread name as its root.
+    """
+
+    def __init__(self, top_n=30, sample_interval=0.01):
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.started = False
+        self._profiler = cProfile.Profile()
+        self._snapshot = None
+        self._stacks = Counter()
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self.started = True
+        tracemalloc.start()
+        self._sampler = threading.Thread(target=self._sample, name="run-profile-sampler", daemon=True)
+        self._sampler.start()
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+        self._stopped.set()
+        self._sampler.join()
+        self._snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def write(self, directory):
+        """Write the profile files to ``directory``; return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        pstats_path = os.path.join(directory, PSTATS_FILE_NAME)
+        self._profiler.dump_stats(pstats_path)
+
+        allocations_path = os.path.join(directory, ALLOCATIONS_FILE_NAME)
+        statistics = [
+            stat
+            for stat in self._snapshot.statistics("lineno")
+            if stat.traceback[0].filename not in (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+        ]
+        with open(allocations_path, "w") as allocations_file:
+            allocations_file.write(
+                f"Top {self.top_n} of {len(statistics)} allocation sites by memory still held when the run ended; "
+                f"{sum(stat.size for stat in statistics) / 1024:.1f} KiB in total.\n"
+            )
+            for stat in statistics[: self.top_n]:
+                frame = stat.traceback[0]
+                allocations_file.write(
+                    f"{frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks\n"
+                )
+
+        collapsed_path = os.path.join(directory, COLLAPSED_STACKS_FILE_NAME)
+        with open(collapsed_path, "w") as collapsed_file:
+            for stack, count in self._stacks.most_common():
+                collapsed_file.write(f"{stack} {count}\n")
+        return [pstats_path, allocations_path, collapsed_path]
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.sample_interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
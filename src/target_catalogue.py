@@ -0,0 +1,43 @@
+class TargetCatalogue:
+    """The datasources, workbooks and extract refresh tasks of a site a run has listed, indexed for lookup.
+
+    Items are found by kind and LUID, or by kind and name with an optional tag and project; tasks by the LUID of
+    their target and their task type. Every lookup is a dictionary access, however many targets are configured.
+    Names and tags are compared case-insensitively, as the server-side filters the items were listed with compare
+    them.
+    """
+
+    def __init__(self):
+        self._items = dict()
+        # (kind, name, tag, project) -> items; a tag or project of None matches any
+        self._items_by_name = dict()
+        self._tasks = dict()
+
+    def add_items(self, kind, items):
+        for item in items:
+            if (kind, item.id) in self._items:
+                continue
+            self._items[(kind, item.id)] = item
+            for tag in [None, *(item.tags or [])]:
+                for project in (None, item.project_name):
+                    self._items_by_name.setdefault(self._name_key(kind, item.name, tag, project), []).append(item)
+
+    def item(self, kind, luid):
+        return self._items.get((kind, luid))
+
+    def find(self, kind, name, tag=None, project=None) -> list:
+        """Return every listed item of ``kind`` called ``name`` that has ``tag`` and is in ``project``, when given."""
+        return list(self._items_by_name.get(self._name_key(kind, name, tag, project), []))
+
+    def set_tasks(self, tasks):
+        """Index ``tasks`` by their target, replacing the tasks indexed before."""
+        self._tasks = {
+            (task.target.id, task.task_type.lower()): task for task in tasks if task.target is not None
+        }
+
+    def task(self, luid, task_type):
+        return self._tasks.get((luid, task_type.lower()))
+
+    @staticmethod
+    def _name_key(kind, name, tag, project):
+        return kind, name.casefold(), tag.casefold() if tag else None, project or None
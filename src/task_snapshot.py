@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from tableauserverclient import Target
+
+from tableau_custom.custom_daos import TaskItem
+
+
+class TaskSnapshot:
+    """A site's extract refresh tasks as seen by a previous run, kept in the state file.
+
+    Only what a run needs to find and trigger a target's task is stored. ``last_run_at`` is kept as seen when the
+    snapshot was taken, so it is stale in a later run. A snapshot is trusted while the site reports the same number of
+    tasks, a small first page lists the same tasks as the snapshot starts with, and it is younger than ``max_age``.
+    """
+
+    def __init__(self, tasks, total, taken_at):
+        self.tasks = tasks
+        self.total = total
+        self.taken_at = taken_at
+
+    def matches(self, total, page, now, max_age) -> bool:
+        # an unknown total cannot tell a deleted task from an added one
+        if total is None or total != self.total or now - self.taken_at > max_age:
+            return False
+        if len(page) > len(self.tasks):
+            return False
+        # the site lists its tasks in a stable order, so a task deleted or added ahead of the page's end moves the ids
+        for known_task, task in zip(self.tasks, page):
+            if known_task.id != task.id or known_task.task_type != task.task_type:
+                return False
+            if (known_task.target and known_task.target.id) != (task.target and task.target.id):
+                return False
+        return True
+
+    def to_state(self) -> dict:
+        return {
+            "total": self.total,
+            "taken_at": self.taken_at.isoformat(),
+            "tasks": [
+                {
+                    "id": task.id,
+                    "task_type": task.task_type,
+                    "priority": task.priority,
+                    "consecutive_failed_count": task.consecutive_failed_count,
+                    "schedule_id": task.schedule_id,
+                    "last_run_at": task.last_run_at.isoformat() if task.last_run_at else None,
+                    "target_id": task.target.id if task.target else None,
+                    "target_type": task.target.type if task.target else None,
+                }
+                for task in self.tasks
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, snapshot):
+        """Return the snapshot stored as ``snapshot``, or ``None`` when there is none or it cannot be read."""
+        try:
+            tasks = [
+                TaskItem(
+                    task["id"],
+                    task["task_type"],
+                    task["priority"],
+                    task["consecutive_failed_count"],
+                    task["schedule_id"],
+                    last_run_at=datetime.fromisoformat(task["last_run_at"]) if task["last_run_at"] else None,
+                    target=Target(task["target_id"], task["target_type"]) if task["target_id"] else None,
+                )
+                for task in snapshot["tasks"]
+            ]
+            return cls(tasks, snapshot["total"], datetime.fromisoformat(snapshot["taken_at"]))
+        except (KeyError, TypeError, ValueError):
+            return None
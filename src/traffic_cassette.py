@@ -0,0 +1,115 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+# response headers kept in a cassette; the others (cookies among them) are dropped
+KEPT_HEADERS = ("Content-Type",)
+# the session token Tableau returns on sign-in, and its refresh counterpart on some versions
+SECRET_ATTRIBUTES = re.compile(r'\b(token|refreshToken)="[^"]*"')
+REDACTED = "REDACTED"
+
+
+class ReplayMissError(requests.RequestException):
+    """The cassette holds no exchange for a request the replayed run made."""
+
+
+class TrafficRecorder:
+    """Records the REST exchanges of a run into a cassette a ``TrafficReplay`` serves them from.
+
+    Sessions made by ``session_factory`` (passed to ``tsc.Server``) record every response they receive, in the
+    order received, with the seconds it took. Only what a replay needs is kept: the method and the path with its
+    query of the request, and the status, content type and body of the response. The endpoint's host, all request
+    headers and bodies (the sign-in credentials among them), cookies and the session tokens in sign-in responses
+    are left out or replaced by ``REDACTED``.
+    """
+
+    def __init__(self):
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def session_factory(self) -> requests.Session:
+        session = requests.Session()
+        session.hooks["response"].append(self._record)
+        return session
+
+    def _record(self, response, *args, **kwargs):
+        exchange = {
+            "method": response.request.method,
+            "path": response.request.path_url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            "body": SECRET_ATTRIBUTES.sub(rf'\1="{REDACTED}"', response.text),
+            "elapsed": round(response.elapsed.total_seconds(), 3),
+        }
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def save(self, path):
+        with self._lock:
+            exchanges = list(self.exchanges)
+        with open(path, "w") as cassette_file:
+            json.dump({"exchanges": exchanges}, cassette_file, indent=1)
+        logging.info(f"Recorded {len(exchanges)} REST exchanges to {path}.")
+
+
+class TrafficReplay:
+    """Serves the exchanges of a cassette a ``TrafficRecorder`` wrote, instead of a Tableau server.
+
+    Sessions made by ``session_factory`` send no request over the network. A request gets the next recorded
+    response to the same method and path in recording order, which keeps the replay deterministic while sites,
+    pages and jobs are requested concurrently; once those are used up, the last of them is served again, so a run
+    polling a job more often than the recorded one sees it stay in its final state. Each response is delayed by
+    the seconds it took when recorded times ``latency_scale``: ``1`` replays the original latency, ``0`` none.
+    """
+
+    def __init__(self, path, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        with open(path) as cassette_file:
+            exchanges = json.load(cassette_file)["exchanges"]
+        self._exchanges = dict()
+        for exchange in exchanges:
+            self._exchanges.setdefault((exchange["method"], exchange["path"]), deque()).append(exchange)
+        self._lock = threading.Lock()
+
+    def session_factory(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _ReplayAdapter(self)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def next_exchange(self, method, path) -> dict:
+        with self._lock:
+            exchanges = self._exchanges.get((method, path))
+            if not exchanges:
+                raise ReplayMissError(f"The cassette holds no response to {method} {path}.")
+            return exchanges.popleft() if len(exchanges) > 1 else exchanges[0]
+
+
+class _ReplayAdapter(BaseAdapter):
+    def __init__(self, replay):
+        super().__init__()
+        self.replay = replay
+
+    def send(self, request, **kwargs):
+        exchange = self.replay.next_exchange(request.method, request.path_url)
+        if self.replay.latency_scale:
+            time.sleep(exchange["elapsed"] * self.replay.latency_scale)
+        response = requests.Response()
+        response.status_code = exchange["status"]
+        response.headers = CaseInsensitiveDict(exchange["headers"])
+        response._content = exchange["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,174 @@
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServiceRun:
+    """One run the service was asked for; ``targets`` fills in while it runs."""
+
+    def __init__(self, parameters):
+        self.id = str(uuid.uuid4())
+        self.parameters = parameters
+        self.status = "queued"
+        self.error = None
+        self.requested_at = datetime.now(UTC)
+        self.started_at = None
+        self.finished_at = None
+        self.targets = []
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "parameters": self.parameters,
+            "requested_at": self.requested_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "targets": [
+                {
+                    "site_id": target.site_id,
+                    "kind": target.kind,
+                    "name": target.name,
+                    "luid": target.luid,
+                    "outcome": target.outcome,
+                    "job_id": target.job_id,
+                    "finish_code": int(target.job.finish_code) if target.job else None,
+                }
+                for target in list(self.targets)
+            ],
+        }
+
+
+class TriggerService:
+    """A small local HTTP API that runs a configuration on request, in a process that stays up between runs.
+
+    - ``POST /runs`` queues a run and answers ``202`` with it. A JSON object in the body replaces the configuration's
+      ``RUN_PARAMETERS`` for that run only (e.g. to refresh some of the datasources); any other key is refused.
+    - ``GET /runs`` lists the runs, newest first, and ``GET /runs/<id>`` reports one: its status (``queued``,
+      ``running``, ``succeeded`` or ``failed``), error and targets with their outcomes and jobs.
+    - ``GET /targets`` lists the datasources and workbooks that can be refreshed.
+
+    ``runner(parameters, targets)`` performs a run, appending its targets to ``targets`` as they are resolved, and
+    raises when it fails; ``lister()`` returns the refreshable targets as JSON-serializable objects. Runs are
+    executed one after another, so they never overlap; the last ``MAX_RUNS_KEPT`` are kept for status requests.
+    """
+
+    RUN_PARAMETERS = frozenset(
+        {"datasources", "workbooks", "datasource_selectors", "sites", "poll_mode", "max_concurrent_refreshes"}
+    )
+    MAX_RUNS_KEPT = 100
+
+    def __init__(self, runner, lister):
+        self.runner = runner
+        self.lister = lister
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-run")
+        self._server = None
+
+    def listen(self, port, host="127.0.0.1") -> int:
+        """Serve the API on ``port`` (any free one for ``0``) in a background thread; return the port."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                run = service.run(self.path[len("/runs/"):]) if self.path.startswith("/runs/") else None
+                if self.path == "/targets":
+                    try:
+                        self._answer(200, service.lister())
+                    except Exception as ex:
+                        logging.warning(f"Failed to list the targets: {ex}")
+                        self._answer(502, {"error": str(ex)})
+                elif self.path == "/runs":
+                    self._answer(200, service.runs())
+                elif run:
+                    self._answer(200, run)
+                else:
+                    self._answer(404, {"error": f"Not found: {self.path}"})
+
+            def do_POST(self):
+                if self.path != "/runs":
+                    self._answer(404, {"error": f"Not found: {self.path}"})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    parameters = json.loads(body) if body.strip() else {}
+                    self._answer(202, service.start_run(parameters))
+                except ValueError as ex:
+                    self._answer(400, {"error": str(ex)})
+
+            def _answer(self, status, payload):
+                try:
+                    body = json.dumps(payload).encode("utf-8")
+                except Exception as ex:
+                    status, body = 500, json.dumps({"error": str(ex)}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Trigger service: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Trigger service listening on {host}:{self._server.server_address[1]}.")
+        return self._server.server_address[1]
+
+    def close(self):
+        """Stop serving and wait for the queued runs to finish."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._executor.shutdown(wait=True)
+
+    def start_run(self, parameters) -> dict:
+        """Queue a run with ``parameters`` replacing those of the configuration; raise ``ValueError`` if invalid."""
+        if not isinstance(parameters, dict):
+            raise ValueError("The body must be a JSON object of parameters.")
+        unknown = sorted(set(parameters) - self.RUN_PARAMETERS)
+        if unknown:
+            raise ValueError(
+                f"These parameters cannot be set for a run: {', '.join(unknown)}. "
+                f"Allowed are: {', '.join(sorted(self.RUN_PARAMETERS))}."
+            )
+        run = ServiceRun(parameters)
+        with self._lock:
+            self._runs[run.id] = run
+            while len(self._runs) > self.MAX_RUNS_KEPT:
+                self._runs.popitem(last=False)
+        self._executor.submit(self._execute, run)
+        return run.to_dict()
+
+    def run(self, run_id):
+        with self._lock:
+            run = self._runs.get(run_id)
+        return run.to_dict() if run else None
+
+    def runs(self) -> list:
+        with self._lock:
+            runs = list(self._runs.values())
+        return [run.to_dict() for run in reversed(runs)]
+
+    def _execute(self, run):
+        run.status = "running"
+        run.started_at = datetime.now(UTC)
+        logging.info(f"===== Service run {run.id} =====")
+        try:
+            self.runner(run.parameters, run.targets)
+        except Exception as ex:
+            logging.exception(ex)
+            run.error = str(ex)
+            run.status = "failed"
+        else:
+            run.status = "succeeded"
+        finally:
+            run.finished_at = datetime.now(UTC)
@@ -0,0 +1,48 @@
+import signal
+import unittest
+from unittest import mock
+
+from abort_guard import AbortGuard, RunAborted
+
+
+class TestAbortGuard(unittest.TestCase):
+    def setUp(self):
+        self.guard = AbortGuard(grace_period=1)
+        self.server = mock.Mock()
+
+    def test_watched_jobs_are_cancelled_on_termination(self):
+        jobs = {"wb1": "job-1", "wb2": "job-2"}
+        with self.guard.watching(self.server, jobs), self.assertLogs(level="WARNING"):
+            with self.assertRaises(RunAborted) as ctx:
+                self.guard._handle(signal.SIGTERM, None)
+
+        self.assertEqual(sorted(c.args[0] for c in self.server.jobs.cancel.call_args_list), ["job-1", "job-2"])
+        self.assertIn("terminated (SIGTERM). Cancelled 2 of 2", str(ctx.exception))
+
+    def test_failed_cancel_is_reported(self):
+        self.server.jobs.cancel.side_effect = [None, Exception("403")]
+        with self.guard.watching(self.server, {"wb1": "job-1"}), self.guard.watching(self.server, {"wb2": "job-2"}):
+            with self.assertLogs(level="WARNING"), self.assertRaises(RunAborted) as ctx:
+                self.guard._handle(signal.SIGINT, None)
+
+        self.assertIn("Cancelled 1 of 2", str(ctx.exception))
+        self.assertIn("continue in Tableau: 'wb2' (job-2)", str(ctx.exception))
+
+    def test_jobs_no_longer_watched_are_left_alone(self):
+        with self.guard.watching(self.server, {"wb1": "job-1"}):
+            pass
+
+        with self.assertRaises(RunAborted):
+            self.guard._handle(signal.SIGTERM, None)
+        self.server.jobs.cancel.assert_not_called()
+
+    def test_install_restores_previous_handlers(self):
+        previous = signal.getsignal(signal.SIGTERM)
+        self.guard.install()
+        self.assertEqual(signal.getsignal(signal.SIGTERM), self.guard._handle)
+        self.guard.uninstall()
+        self.assertEqual(signal.getsignal(signal.SIGTERM), previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+from unittest import mock
+
+from circuit_breaker import CircuitBreaker
+from refresh_target import RefreshTarget
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=UTC)
+
+
+def _target(kind=RefreshTarget.Kind.Datasource, consecutive_failed_count=0, last_refreshed_at=None):
+    target = RefreshTarget(kind, "Sales", "luid", mock.Mock(consecutive_failed_count=consecutive_failed_count))
+    target.last_refreshed_at = last_refreshed_at
+    return target
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def _breaker(self, history=None):
+        self.state = {CircuitBreaker.STATE_KEY: history} if history is not None else {}
+        return CircuitBreaker(self.state, threshold=3, probe_interval=timedelta(hours=1), now=NOW)
+
+    def test_failures_are_the_larger_of_tableau_and_history(self):
+        breaker = self._breaker({"datasource:luid": {"failures": 4, "last_attempt_at": NOW.isoformat()}})
+
+        self.assertEqual(breaker.failures("datasource:luid", _target(consecutive_failed_count=2)), 4)
+        self.assertEqual(breaker.failures("datasource:luid", _target(consecutive_failed_count=7)), 7)
+        # Tableau does not count the failures of a workbook's tasks on the workbook
+        self.assertEqual(breaker.failures("workbook:luid", _target(RefreshTarget.Kind.Workbook, 7)), 0)
+
+    def test_state_follows_the_threshold_and_the_probe_interval(self):
+        breaker = self._breaker()
+
+        self.assertEqual(breaker.state("datasource:luid", _target(consecutive_failed_count=2)), CircuitBreaker.Closed)
+        recent = _target(consecutive_failed_count=3, last_refreshed_at=NOW - timedelta(minutes=30))
+        self.assertEqual(breaker.state("datasource:luid", recent), CircuitBreaker.Open)
+        old = _target(consecutive_failed_count=3, last_refreshed_at=NOW - timedelta(hours=2))
+        self.assertEqual(breaker.state("datasource:luid", old), CircuitBreaker.HalfOpen)
+        self.assertEqual(breaker.state("datasource:luid", _target(consecutive_failed_count=3)), CircuitBreaker.HalfOpen)
+
+    def test_own_last_attempt_keeps_the_breaker_open(self):
+        history = {"datasource:luid": {"failures": 3, "last_attempt_at": (NOW - timedelta(minutes=5)).isoformat()}}
+        breaker = self._breaker(history)
+
+        target = _target(last_refreshed_at=NOW - timedelta(days=2))
+        self.assertEqual(breaker.state("datasource:luid", target), CircuitBreaker.Open)
+        self.assertEqual(breaker.last_attempt_at("datasource:luid", target), NOW - timedelta(minutes=5))
+
+    def test_record_counts_failures_and_clears_them_on_success(self):
+        breaker = self._breaker()
+        target = _target(consecutive_failed_count=2)
+        target.outcome = RefreshTarget.Outcome.Failed
+
+        breaker.record("datasource:luid", target)
+
+        history = self.state[CircuitBreaker.STATE_KEY]
+        self.assertEqual(history, {"datasource:luid": {"failures": 3, "last_attempt_at": NOW.isoformat()}})
+        target.outcome = RefreshTarget.Outcome.Triggered
+        target.job = mock.Mock(finish_code="0")
+        breaker.record("datasource:luid", target)
+        self.assertEqual(self.state[CircuitBreaker.STATE_KEY], {})
+
+    def test_skipped_targets_are_not_recorded(self):
+        breaker = self._breaker()
+        target = _target()
+        target.outcome = RefreshTarget.Outcome.Skipped
+
+        breaker.record("datasource:luid", target)
+
+        self.assertEqual(self.state[CircuitBreaker.STATE_KEY], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,15 @@
+import copy
+import csv
+import json
 import os
 import runpy
+import signal
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from datetime import UTC, datetime
 from unittest import mock
 
 import requests
@@ -10,15 +19,41 @@ from keboola.component import ComponentBase, UserException
 
 import component
 from component import Component
+from target_catalogue import TargetCatalogue
+from traffic_cassette import TrafficRecorder
 
 COMPONENT_FILE = component.__file__
 
 
+def _datasource_task(**attrs):
+    """Build the ``FullRefresh`` extract refresh task ``ds-task`` of the datasource with LUID ``ds-luid``."""
+    return mock.Mock(**{"id": "ds-task", "task_type": "FullRefresh", "target": mock.Mock(id="ds-luid"), **attrs})
+
+
 def _failed_sign_in_error(detail="Login failed"):
     """Build a realistic ``FailedSignInError`` as tableauserverclient raises it on an HTTP 401."""
     return tsc.FailedSignInError("401002", "Unauthorized Access", detail)
 
 
+def _look_up_per_entry(comp):
+    """Make ``comp._get_items_by_entry`` hand each entry the items its mocked ``_get_all_ds_by_filter`` returns.
+
+    An item goes to the entry with its LUID, else the entry with its name, else the first entry.
+    """
+
+    def get_items_by_entry(kind, entries):
+        items, validation_errors = comp._get_all_ds_by_filter(kind, entries)
+        entry_items = [(entry, []) for entry in entries]
+        for item in items:
+            owner = next((pair for pair in entry_items if pair[0].get("luid") == item.id), None) or next(
+                (pair for pair in entry_items if pair[0].get("name") == item.name), entry_items[0]
+            )
+            owner[1].append(item)
+        return entry_items, validation_errors
+
+    comp._get_items_by_entry = mock.Mock(side_effect=get_items_by_entry)
+
+
 class TestComponent(unittest.TestCase):
     # set global time to 2010-10-10 - affects functions like datetime.now()
     @freeze_time("2010-10-10")
@@ -77,6 +112,189 @@ class TestEntrypointExitCodes(unittest.TestCase):
         exit_code = self._run_entrypoint_raising(ValueError("unexpected internal error"))
         self.assertEqual(exit_code, 2)
 
+    def test_wrong_batch_or_service_arguments_exit_1(self):
+        for argv in (["--serve"], ["--serve", "data", "http"], ["--serve", "data", "8080", "extra"], ["--batch"]):
+            with self.subTest(argv=argv), mock.patch.object(sys, "argv", [COMPONENT_FILE, *argv]):
+                with self.assertLogs(level="ERROR") as logs, self.assertRaises(SystemExit) as ctx:
+                    runpy.run_path(COMPONENT_FILE, run_name="__main__")
+
+                self.assertEqual(ctx.exception.code, 1)
+                self.assertIn("Usage: python src/component.py", "\n".join(logs.output))
+
+    def test_service_arguments(self):
+        self.assertEqual(component.serve_arguments(["data"]), ("data", component.SERVICE_PORT))
+        self.assertEqual(component.serve_arguments(["data", "9000"]), ("data", 9000))
+        with self.assertRaisesRegex(UserException, "got: 0"):
+            component.serve_arguments(["data", "0"])
+
+
+class TestBatchRunner(unittest.TestCase):
+    """``run_batch`` runs several configurations in one process, sharing connections and sign-ins where it can."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.servers = []
+
+        def connect(endpoint, use_server_version, api_version, session_factory=None):
+            server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+            self.servers.append(server)
+            return server, mock.Mock()
+
+        connect_patcher = mock.patch.object(Component, "_connect_to_server", side_effect=connect)
+        connect_patcher.start()
+        self.addCleanup(connect_patcher.stop)
+        # every configuration sets up logging again, which would drop the handler assertLogs installs
+        logger_patcher = mock.patch.object(Component, "set_default_logger")
+        logger_patcher.start()
+        self.addCleanup(logger_patcher.stop)
+        self.runs = []
+        run_patcher = mock.patch.object(Component, "run", autospec=True, side_effect=self._run)
+        run_patcher.start()
+        self.addCleanup(run_patcher.stop)
+
+    def _run(self, comp):
+        self.runs.append(comp)
+        if comp.cfg_params.get("fail"):
+            raise UserException(comp.cfg_params["fail"])
+
+    def _config(self, name, **params):
+        data_dir = os.path.join(self.tmp.name, name)
+        os.makedirs(data_dir)
+        parameters = {
+            "authentication_type": "Personal Access Token",
+            "token_name": "pat",
+            "#token_secret": "secret",
+            "endpoint": "https://tableau.example",
+            "datasources": [],
+            **params,
+        }
+        with open(os.path.join(data_dir, "config.json"), "w") as config_file:
+            json.dump({"parameters": parameters, "image_parameters": {}}, config_file)
+        return os.path.join(data_dir, "config.json")
+
+    def test_configurations_on_the_same_site_share_connection_and_sign_in(self):
+        paths = [
+            self._config("a"),
+            self._config("b", min_refresh_interval=30),
+            self._config("c", site_id="other"),
+            self._config("d", circuit_breaker_threshold=3),
+        ]
+
+        exit_code = component.run_batch(paths)
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(self.servers), 2)
+        first, second, third, fourth = self.runs
+        self.assertIs(first.server, second.server)
+        self.assertIsNot(first.server, third.server)
+        first.server.auth.sign_in.assert_called_once()
+        first.server.auth.sign_in.return_value.__exit__.assert_called_once()
+        self.assertIsNotNone(first.task_snapshots)
+        self.assertIsNone(second.task_snapshots)  # the minimum refresh interval needs the current task list
+        self.assertIsNone(fourth.task_snapshots)  # so does the circuit breaker
+        self.assertIsNot(first.task_snapshots, third.task_snapshots)
+
+    def test_each_configuration_gets_its_own_outcome(self):
+        paths = [self._config("a", fail="Some datasets do not exist: ['ds1']"), os.path.join(self.tmp.name, "b")]
+        self._config("b")
+
+        with self.assertLogs(level="INFO") as logs:
+            exit_code = component.run_batch(paths)
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(len(self.runs), 2)
+        output = "\n".join(logs.output)
+        self.assertIn(f"Configuration {paths[0]} failed: Some datasets do not exist: ['ds1']", output)
+        self.assertIn(f"Configuration {paths[1]} finished successfully.", output)
+
+
+class TestTriggerServiceRuns(unittest.TestCase):
+    """``trigger_service`` runs the configuration for each API request, signed in once, through a local client."""
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.data_folder_path = self.data_dir.name
+        comp.cfg_params = {"datasources": [], "workbooks": [{"name": "wb1"}], "cancel_on_abort": True}
+        comp.image_params = {}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # the stub Tableau; MagicMock: sign_in() is used as a context manager
+        comp.server.workbooks.refresh.side_effect = [mock.Mock(id="job-1"), mock.Mock(id="job-2")]
+        workbooks = {}
+        for name in ("wb1", "wb2"):
+            workbooks[name] = mock.Mock(id=f"{name}-luid")
+            workbooks[name].name = name  # must be set post-construction: Mock(name=...) sets the repr
+        comp._get_all_ds_by_filter = mock.Mock(
+            side_effect=lambda kind, entries: ([workbooks[entry["name"]] for entry in entries], [])
+        )
+        _look_up_per_entry(comp)
+        self.comp = comp
+        self.service = component.trigger_service(comp)
+        self.url = f"http://127.0.0.1:{self.service.listen(0)}"
+        self.addCleanup(self.service.close)
+
+    def _finished_run(self, **parameters):
+        run = requests.post(f"{self.url}/runs", json=parameters, timeout=5).json()
+        for _ in range(500):
+            if run["status"] in ("succeeded", "failed"):
+                return run
+            time.sleep(0.01)
+            run = requests.get(f"{self.url}/runs/{run['id']}", timeout=5).json()
+        self.fail(f"The run did not finish: {run}")
+
+    def test_runs_share_one_sign_in(self):
+        first = self._finished_run()
+        second = self._finished_run(workbooks=[{"name": "wb2"}])
+
+        self.assertEqual(first["status"], "succeeded")
+        self.assertEqual([(t["name"], t["job_id"]) for t in first["targets"]], [("wb1", "job-1")])
+        self.assertEqual([(t["name"], t["job_id"]) for t in second["targets"]], [("wb2", "job-2")])
+        self.comp.server.auth.sign_in.assert_called_once()
+        self.assertEqual(self.comp.cfg_params["workbooks"], [{"name": "wb1"}])  # the overrides are per run
+
+    def test_run_parameters_cannot_lift_the_image_policy(self):
+        self.comp.image_params = {"luid_required": True, "poll_mode_disabled": True}
+        self.comp.cfg_params["workbooks"] = [{"name": "wb1", "luid": "wb1-luid"}]
+        for parameters, error in (
+            ({"poll_mode": 1}, "Poll must be set to false."),
+            ({"max_concurrent_refreshes": 2}, "Max concurrent refreshes must not be set."),
+            ({"datasources": [{"name": "ds1", "type": "FullRefresh"}]}, "LUID is required."),
+            ({"sites": [{"site_id": "other", "workbooks": [{"name": "wb2"}]}]}, "LUID is required."),
+        ):
+            with self.subTest(parameters=parameters):
+                with self.assertLogs(level="ERROR"):
+                    run = self._finished_run(**parameters)
+
+                self.assertEqual((run["status"], run["error"]), ("failed", error))
+        self.comp.server.workbooks.refresh.assert_not_called()
+        self.comp.server.auth.sign_in.assert_not_called()
+
+    def test_state_carries_over_between_runs(self):
+        self.comp.cfg_params.update(circuit_breaker_threshold=3, continue_on_error=True)
+        self.comp.get_state_file = mock.Mock(return_value={})
+        self.comp.write_state_file = mock.Mock()
+        refused = tsc.ServerResponseError("403", "Forbidden", "Not allowed.")
+        self.comp.server.workbooks.refresh.side_effect = [refused, refused]
+
+        self._finished_run()
+        self._finished_run()
+
+        self.comp.get_state_file.assert_called_once()
+        self.assertEqual(self.comp.write_state_file.call_count, 2)
+        history = self.comp.write_state_file.call_args.args[0]["circuit_breaker"]
+        self.assertEqual(history["workbook:wb1-luid"]["failures"], 2)
+
+    def test_run_failing_on_an_expired_sign_in_signs_in_again(self):
+        self.comp.server.workbooks.refresh.side_effect = [_failed_sign_in_error(), mock.Mock(id="job-2")]
+
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(self._finished_run()["status"], "failed")
+        self.assertEqual(self._finished_run()["status"], "succeeded")
+
+        self.assertEqual(self.comp.server.auth.sign_in.call_count, 2)
+
 
 class TestSignInErrorConversion(unittest.TestCase):
     """``run()`` converts an initial sign-in ``FailedSignInError`` into a ``UserException``.
@@ -112,6 +330,11 @@ class TestGetAllDsByFilterLuidNotFound(unittest.TestCase):
     def _component(self):
         comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
         comp.server = mock.Mock()
+        comp.catalogue = TargetCatalogue()
+        # the LUID is not listed under the configured name, so it is looked up on its own
+        patcher = mock.patch.object(component, "fetch_all_pages", return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
         return comp
 
     def test_luid_not_found_raises_user_exception(self):
@@ -149,6 +372,167 @@ class TestGetAllDsByFilterLuidNotFound(unittest.TestCase):
         self.assertEqual(validation_errors, [])
 
 
+class TestCatalogueLookup(unittest.TestCase):
+    """Configured datasources are listed by name in one request and then looked up in the catalogue."""
+
+    @staticmethod
+    def _item(luid, name, project="Sales", tags=()):
+        item = mock.Mock(id=luid, project_name=project, tags=set(tags))
+        item.name = name  # must be set post-construction: Mock(name=...) sets the repr
+        return item
+
+    def _component(self, items, tasks=()):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.server = mock.Mock()
+        comp.catalogue = TargetCatalogue()
+        comp.catalogue.set_tasks(tasks)
+        patcher = mock.patch.object(component, "fetch_all_pages", return_value=items)
+        self.listing = patcher.start()
+        self.addCleanup(patcher.stop)
+        return comp
+
+    def test_all_names_are_listed_with_one_request(self):
+        comp = self._component(
+            [
+                self._item("ds-1", "Orders", tags={"prod"}),
+                self._item("ds-2", "Orders", project="Finance", tags={"dev"}),
+                self._item("ds-3", "Items"),
+            ]
+        )
+
+        all_ds, validation_errors = comp._get_all_ds_by_filter(
+            "datasources", [{"name": "Orders", "tag": "PROD"}, {"name": "Items"}, {"name": "Orders", "luid": "ds-2"}]
+        )
+
+        self.assertEqual([ds.id for ds in all_ds], ["ds-1", "ds-3", "ds-2"])
+        self.assertEqual(validation_errors, [])
+        self.listing.assert_called_once()
+        (options,) = self.listing.call_args.args[1:]
+        self.assertEqual([str(f) for f in options.filter], ["name:in:[Items,Orders]"])
+        comp.server.datasources.get_by_id.assert_not_called()
+
+    def test_ambiguous_name_is_reported(self):
+        comp = self._component([self._item("ds-1", "Orders"), self._item("ds-2", "Orders", project="Finance")])
+
+        all_ds, validation_errors = comp._get_all_ds_by_filter("datasources", [{"name": "Orders"}])
+
+        self.assertEqual(len(validation_errors), 1)
+        self.assertIn("There is more results for given filter", validation_errors[0])
+
+    def test_workbooks_take_the_settings_of_the_entry_that_selected_them(self):
+        comp = self._component(
+            [
+                self._item("wb-1", "Orders", tags={"prod"}),
+                self._item("wb-2", "Orders", project="Finance", tags={"dev"}),
+                self._item("wb-3", "Items"),
+            ]
+        )
+        workbooks = [
+            {"name": "Orders", "tag": "prod", "max_duration": 10},
+            {"name": "Orders", "tag": "dev", "max_duration": 20},
+            {"name": "ITEMS", "max_duration": 30},
+        ]
+
+        targets = comp._resolve_targets({"workbooks": workbooks}, None, None)
+
+        self.assertEqual([(t.luid, t.max_duration) for t in targets], [("wb-1", 10), ("wb-2", 20), ("wb-3", 30)])
+
+    def test_same_named_datasources_get_their_own_tasks(self):
+        tasks = [
+            mock.Mock(id="t-1", task_type="RefreshExtractTask", target=mock.Mock(id="ds-1")),
+            mock.Mock(id="t-2", task_type="IncrementExtractTask", target=mock.Mock(id="ds-2")),
+        ]
+        comp = self._component([], tasks)
+        all_ds = [self._item("ds-1", "Orders"), self._item("ds-2", "Orders", project="Finance")]
+        datasources = [
+            {"name": "Orders", "luid": "ds-1", "type": "RefreshExtractTask"},
+            {"name": "Orders", "luid": "ds-2", "type": "IncrementExtractTask"},
+        ]
+
+        comp.validate_dataset_types(all_ds, datasources)
+
+        datasources[1]["type"] = "RefreshExtractTask"
+        with self.assertRaises(UserException) as ctx:
+            comp.validate_dataset_types(all_ds, datasources)
+        self.assertIn("{'Orders': 'RefreshExtractTask'}", str(ctx.exception))
+
+
+class TestMetadataLookup(unittest.TestCase):
+    """``metadata_api`` looks the targets up with one Metadata API query, falling back to REST listings."""
+
+    METADATA = {
+        "data": {
+            "publishedDatasources": [{"luid": "ds-luid", "name": "ds1", "projectName": "Sales", "tags": []}],
+            "workbooks": [
+                {
+                    "luid": "wb-luid",
+                    "name": "wb1",
+                    "projectName": "Sales",
+                    "tags": [],
+                    "embeddedDatasources": [{"hasExtracts": True, "extractLastRefreshTime": "2024-05-01T11:50:00Z"}],
+                }
+            ],
+        }
+    }
+
+    def _component(self, listed=()):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.server = mock.Mock()
+        comp.server.metadata.query.return_value = self.METADATA
+        comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[_datasource_task(last_run_at=None)])
+        comp.get_last_workbook_refreshes = mock.Mock(return_value={})
+        patcher = mock.patch.object(component, "fetch_all_pages", return_value=list(listed))
+        self.listing = patcher.start()
+        self.addCleanup(patcher.stop)
+        return comp
+
+    @staticmethod
+    def _params(**params):
+        return {
+            "metadata_api": True,
+            "datasources": [{"name": "ds1", "type": "FullRefresh"}],
+            "workbooks": [{"name": "wb1"}],
+            **params,
+        }
+
+    def test_targets_are_resolved_without_rest_listings(self):
+        comp = self._component()
+
+        targets = comp._resolve_targets(self._params(), 30, None)
+
+        comp.server.metadata.query.assert_called_once()
+        self.listing.assert_not_called()
+        comp.get_last_workbook_refreshes.assert_not_called()
+        self.assertEqual([(t.kind, t.luid) for t in targets], [("datasource", "ds-luid"), ("workbook", "wb-luid")])
+        self.assertEqual(targets[1].last_refreshed_at, datetime(2024, 5, 1, 11, 50, tzinfo=UTC))
+
+    def test_names_unknown_to_the_metadata_api_are_listed_over_rest(self):
+        workbook = mock.Mock(id="new-luid", project_name="Sales", tags=set())
+        workbook.name = "new"  # must be set post-construction: Mock(name=...) sets the repr
+        comp = self._component([workbook])
+
+        targets = comp._resolve_targets(self._params(workbooks=[{"name": "wb1"}, {"name": "new"}]), 30, None)
+
+        self.listing.assert_called_once()
+        (options,) = self.listing.call_args.args[1:]
+        self.assertEqual([str(f) for f in options.filter], ["name:in:[new]"])
+        comp.get_last_workbook_refreshes.assert_called_once()
+        self.assertEqual([target.luid for target in targets], ["ds-luid", "wb-luid", "new-luid"])
+
+    def test_disabled_metadata_api_falls_back_to_rest(self):
+        datasource = mock.Mock(id="ds-luid", project_name="Sales", tags=set())
+        datasource.name = "ds1"
+        comp = self._component([datasource])
+        comp.server.metadata.query.side_effect = tsc.ServerResponseError("404003", "Not Found", "Metadata API disabled")
+
+        with self.assertLogs(level="WARNING") as logs:
+            targets = comp._resolve_targets(self._params(workbooks=[]), None, None)
+
+        self.assertIn("The Metadata API is not available", "\n".join(logs.output))
+        self.listing.assert_called_once()
+        self.assertEqual([target.luid for target in targets], ["ds-luid"])
+
+
 class TestRefreshRefusedConversion(unittest.TestCase):
     """A Tableau 403 on the refresh trigger becomes a ``UserException`` instead of an internal error.
 
@@ -176,9 +560,10 @@ class TestRefreshRefusedConversion(unittest.TestCase):
         return comp
 
     def _with_one_workbook(self, comp):
-        workbook = mock.Mock()
+        workbook = mock.Mock(id="wb1-luid")
         workbook.name = "wb1"  # must be set post-construction: Mock(name=...) sets the repr
         comp._get_all_ds_by_filter = mock.Mock(return_value=([workbook], []))
+        _look_up_per_entry(comp)
         return workbook
 
     def test_workbook_refresh_refused_raises_user_exception(self):
@@ -194,12 +579,11 @@ class TestRefreshRefusedConversion(unittest.TestCase):
 
     def test_datasource_refresh_refused_raises_user_exception(self):
         comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}])
-        task = mock.Mock()
-        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock()], []))
-        comp.validate_dataset_names = mock.Mock(return_value={"ds1": "FullRefresh"})
+        task = _datasource_task()
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock(id="ds-luid")], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
         comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[task])
-        comp.get_all_ds_for_tasks = mock.Mock(return_value={"ds1": {"fullrefresh": task}})
-        comp.validate_dataset_types = mock.Mock()
         comp._run_task = mock.Mock(side_effect=self._refresh_refused("datasource"))
 
         with self.assertRaises(UserException) as ctx:
@@ -233,7 +617,7 @@ class TestRefreshRefusedConversion(unittest.TestCase):
         comp._wait_for_finish = mock.Mock()
 
         comp.run()
-        comp._wait_for_finish.assert_called_once_with({"wb1": "job-1"})
+        comp._wait_for_finish.assert_called_once_with({"workbook:wb1-luid": "job-1"}, {}, {}, started_at=mock.ANY)
 
 
 class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
@@ -268,6 +652,7 @@ class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
         comp.cfg_params = {"datasources": [], "workbooks": [], "already_in_queue_as_warning": True, **cfg}
         comp.auth = mock.Mock()
         comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp.server.jobs.get.return_value = ([], mock.Mock(total_available=0))  # no refresh is running yet
         comp._wait_for_finish = mock.Mock()
         return comp
 
@@ -275,20 +660,20 @@ class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
     def _with_workbooks(comp, *names):
         workbooks = []
         for name in names:
-            workbook = mock.Mock()
+            workbook = mock.Mock(id=f"{name}-luid")
             workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
             workbooks.append(workbook)
         comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
         return workbooks
 
     @staticmethod
     def _with_one_datasource(comp, side_effect):
-        task = mock.Mock()
-        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock()], []))
-        comp.validate_dataset_names = mock.Mock(return_value={"ds1": "FullRefresh"})
+        task = _datasource_task()
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock(id="ds-luid")], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
         comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[task])
-        comp.get_all_ds_for_tasks = mock.Mock(return_value={"ds1": {"fullrefresh": task}})
-        comp.validate_dataset_types = mock.Mock()
         comp._run_task = mock.Mock(side_effect=side_effect)
 
     def test_datasource_already_queued_warns_instead_of_failing(self):
@@ -326,7 +711,7 @@ class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
             comp.run()
 
         self.assertEqual(comp.server.workbooks.refresh.call_count, 2)
-        comp._wait_for_finish.assert_called_once_with({"wb2": "job-2"})
+        comp._wait_for_finish.assert_called_once_with({"workbook:wb2-luid": "job-2"}, {}, {}, started_at=mock.ANY)
 
     def test_already_queued_refresh_is_not_polled(self):
         # A 409 carries no job id, so there is nothing to poll: the run must not invent one, and
@@ -338,7 +723,7 @@ class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
         with self.assertLogs(level="WARNING") as logs:
             comp.run()
 
-        comp._wait_for_finish.assert_called_once_with({})
+        comp._wait_for_finish.assert_called_once_with({}, {}, {}, started_at=mock.ANY)
         # In poll mode the warning says so, so the user is not left assuming the run waited for it.
         self.assertIn("does not wait", "\n".join(logs.output))
 
@@ -440,6 +825,85 @@ class TestRefreshAlreadyQueuedWarning(unittest.TestCase):
         with self.assertRaises(tsc.ServerResponseError):
             comp.run()
 
+    def test_running_refresh_is_polled_instead_of_triggered(self):
+        comp = self._component(workbooks=[{"name": "wb1"}, {"name": "wb2"}], poll_mode=1)
+        self._with_workbooks(comp, "wb1", "wb2")
+        listed = [mock.Mock(id="job-running", title="WB1"), mock.Mock(id="job-other", title="Orders")]
+        comp.server.jobs.get.return_value = (listed, mock.Mock(total_available=2))
+        comp.server.jobs.get_by_id.return_value = mock.Mock(
+            id="job-running", workbook_id="wb1-luid", finish_code=-1, created_at=None
+        )
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-2")
+
+        comp.run()
+
+        comp.server.jobs.get_by_id.assert_called_once_with("job-running")  # only the job of a configured name
+        comp.server.workbooks.refresh.assert_called_once()
+        self.assertEqual(comp.server.workbooks.refresh.call_args.args[0].name, "wb2")
+        self.assertEqual(
+            comp._wait_for_finish.call_args.args[0], {"workbook:wb1-luid": "job-running", "workbook:wb2-luid": "job-2"}
+        )
+
+    def test_running_jobs_are_listed_by_status_with_eq(self):
+        comp = self._component(workbooks=[{"name": "wb1"}], poll_mode=1)
+        self._with_workbooks(comp, "wb1")
+        # the job was pending at the first listing and in progress at the second
+        running = mock.Mock(id="job-running", title="wb1")
+        comp.server.jobs.get.return_value = ([running], mock.Mock(total_available=1))
+        comp.server.jobs.get_by_id.return_value = mock.Mock(
+            id="job-running", workbook_id="wb1-luid", finish_code=-1, created_at=None
+        )
+
+        comp.run()
+
+        filters = [
+            sorted(str(f) for f in call.args[0].filter) for call in comp.server.jobs.get.call_args_list
+        ]
+        self.assertEqual(
+            filters,
+            [
+                ["jobType:in:[refresh_extracts,increment_extracts]", "status:eq:Pending"],
+                ["jobType:in:[refresh_extracts,increment_extracts]", "status:eq:InProgress"],
+            ],
+        )
+        comp.server.jobs.get_by_id.assert_called_once_with("job-running")
+        comp.server.workbooks.refresh.assert_not_called()
+
+    def test_failed_job_listing_is_an_error_and_triggers_every_target(self):
+        comp = self._component(workbooks=[{"name": "wb1"}])
+        self._with_workbooks(comp, "wb1")
+        comp.server.jobs.get.side_effect = tsc.ServerResponseError("400065", "Bad Request", "Invalid filter.")
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        with self.assertLogs(level="ERROR") as logs:
+            comp.run()
+
+        self.assertIn("Failed to list the queued and running refresh jobs", "\n".join(logs.output))
+        comp.server.workbooks.refresh.assert_called_once()
+
+    def test_running_refresh_of_another_item_with_the_name_is_not_taken_over(self):
+        comp = self._component(workbooks=[{"name": "wb1"}])
+        self._with_workbooks(comp, "wb1")
+        comp.server.jobs.get.return_value = ([mock.Mock(id="job-running", title="wb1")], mock.Mock(total_available=1))
+        comp.server.jobs.get_by_id.return_value = mock.Mock(workbook_id="elsewhere-luid", finish_code=-1)
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        comp.run()
+
+        comp.server.workbooks.refresh.assert_called_once()
+
+    def test_workbook_configured_twice_is_triggered_once(self):
+        comp = self._component(workbooks=[{"name": "wb1"}, {"name": "wb1"}])
+        workbook = self._with_workbooks(comp, "wb1")[0]
+        comp._get_all_ds_by_filter.return_value = ([workbook, workbook], [])
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        comp.server.workbooks.refresh.assert_called_once()
+        self.assertIn('The workbook "wb1" is configured more than once', "\n".join(logs.output))
+
 
 class TestAlreadyQueuedWithoutOptIn(unittest.TestCase):
     """Without ``already_in_queue_as_warning``, an already-queued refresh still fails the job.
@@ -465,9 +929,10 @@ class TestAlreadyQueuedWithoutOptIn(unittest.TestCase):
         return comp
 
     def _with_one_workbook(self, comp):
-        workbook = mock.Mock()
+        workbook = mock.Mock(id="wb1-luid")
         workbook.name = "wb1"  # must be set post-construction: Mock(name=...) sets the repr
         comp._get_all_ds_by_filter = mock.Mock(return_value=([workbook], []))
+        _look_up_per_entry(comp)
         return workbook
 
     def test_workbook_already_queued_fails_the_job_by_default(self):
@@ -484,12 +949,11 @@ class TestAlreadyQueuedWithoutOptIn(unittest.TestCase):
 
     def test_datasource_already_queued_fails_the_job_by_default(self):
         comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}])
-        task = mock.Mock()
-        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock()], []))
-        comp.validate_dataset_names = mock.Mock(return_value={"ds1": "FullRefresh"})
+        task = _datasource_task()
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock(id="ds-luid")], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
         comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[task])
-        comp.get_all_ds_for_tasks = mock.Mock(return_value={"ds1": {"fullrefresh": task}})
-        comp.validate_dataset_types = mock.Mock()
         comp._run_task = mock.Mock(side_effect=self._already_queued("ds1"))
 
         with self.assertRaises(UserException) as ctx:
@@ -517,6 +981,1500 @@ class TestAlreadyQueuedWithoutOptIn(unittest.TestCase):
             comp.run()  # must not raise
 
 
+class TestMaxConcurrentRefreshes(unittest.TestCase):
+    """``max_concurrent_refreshes`` keeps at most N of the run's own refreshes queued or running.
+
+    The next target is triggered as soon as polling shows one of the in-flight jobs finished, instead of
+    queueing every target at once and flooding the site's backgrounder.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(component.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, *names, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"datasources": [], "workbooks": [{"name": n} for n in names], **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        workbooks = []
+        for name in names:
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+        comp.server.workbooks.refresh.side_effect = [mock.Mock(id=f"job-{n}") for n in names]
+        return comp
+
+    def test_next_target_waits_for_a_free_slot(self):
+        comp = self._component("wb1", "wb2", "wb3", max_concurrent_refreshes=2)
+        events = []
+
+        def refresh(workbook):
+            events.append(("refresh", workbook.name))
+            return mock.Mock(id=f"job-{workbook.name}")
+
+        comp.server.workbooks.refresh.side_effect = refresh
+        # job-wb1 is still running on the first pass and finished on the second
+        statuses = {"job-wb1": [-1, 0], "job-wb2": [-1, -1]}
+
+        def get_by_id(job_id):
+            events.append(("poll", job_id))
+            return mock.Mock(finish_code=statuses[job_id].pop(0))
+
+        comp.server.jobs.get_by_id.side_effect = get_by_id
+
+        comp.run()
+
+        self.assertEqual(
+            events,
+            [
+                ("refresh", "wb1"),
+                ("refresh", "wb2"),
+                ("poll", "job-wb1"),
+                ("poll", "job-wb2"),
+                ("poll", "job-wb1"),
+                ("poll", "job-wb2"),
+                ("refresh", "wb3"),
+            ],
+        )
+        self.sleep.assert_called_once_with(component.POLL_INTERVAL_SECONDS)
+
+    def test_no_limit_triggers_everything_without_polling(self):
+        comp = self._component("wb1", "wb2", "wb3")
+
+        comp.run()
+
+        self.assertEqual(comp.server.workbooks.refresh.call_count, 3)
+        comp.server.jobs.get_by_id.assert_not_called()
+
+    def test_poll_mode_does_not_poll_jobs_the_window_saw_finish(self):
+        comp = self._component("wb1", "wb2", max_concurrent_refreshes=1, poll_mode=1)
+        comp._wait_for_finish = mock.Mock()
+        finished = mock.Mock(finish_code=0)
+        comp.server.jobs.get_by_id.return_value = finished
+
+        comp.run()
+
+        comp._wait_for_finish.assert_called_once_with(
+            {"workbook:wb1-luid": "job-wb1", "workbook:wb2-luid": "job-wb2"},
+            {"workbook:wb1-luid": finished},
+            {},
+            started_at=mock.ANY,
+        )
+
+    def test_failure_seen_by_the_window_fails_the_poll(self):
+        comp = Component.__new__(Component)
+        comp.cfg_params = {}
+        comp.server = mock.Mock()
+        comp.server.jobs.get_by_id.return_value = mock.Mock(finish_code=0)
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"}, {"wb1": mock.Mock(finish_code=1)})
+
+        self.assertIn("'wb1' (finish_code=1)", str(ctx.exception))
+        comp.server.jobs.get_by_id.assert_called_once_with("job-2")
+
+    def test_fail_fast_stops_triggering_once_the_window_sees_a_failure(self):
+        comp = self._component(
+            "wb1", "wb2", "wb3", "wb4", max_concurrent_refreshes=2, poll_mode=1, fail_fast=True, cancel_on_failure=True
+        )
+        statuses = {"job-wb1": 1, "job-wb2": -1}
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(
+            id=job_id, finish_code=statuses[job_id], notes=[], created_at=None
+        )
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+
+        # the slot job-wb1 freed is not used: wb3 and wb4 are not triggered
+        self.assertEqual(comp.server.workbooks.refresh.call_count, 2)
+        self.assertIn("'wb1' (finish_code=1)", str(ctx.exception))
+        self.assertIn("The jobs still running were cancelled: 'wb2'", str(ctx.exception))
+        comp.server.jobs.cancel.assert_called_once_with("job-wb2")
+
+    def test_invalid_limit_raises_user_exception(self):
+        comp = self._component("wb1", max_concurrent_refreshes="many")
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+        self.assertIn("Max concurrent refreshes", str(ctx.exception))
+
+
+class TestPollDeadlines(unittest.TestCase):
+    """``poll_timeout`` and per-target ``max_duration`` end polling with a ``UserException`` naming overdue jobs."""
+
+    def setUp(self):
+        freezer = freeze_time("2024-05-01 12:00:00")
+        self.clock = freezer.start()
+        self.addCleanup(freezer.stop)
+        patcher = mock.patch.object(component.time, "sleep", side_effect=lambda seconds: self.clock.tick(seconds))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = cfg
+        comp.server = mock.Mock()
+        created_at = datetime(2024, 5, 1, 11, 50, tzinfo=UTC)
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(
+            finish_code=-1, started_at=created_at, created_at=created_at
+        )
+        return comp
+
+    def test_poll_timeout_names_every_job_still_running(self):
+        comp = self._component(poll_timeout=3)
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"})
+
+        message = str(ctx.exception)
+        self.assertIn("Polling timed out after 3 minutes", message)
+        self.assertIn("'wb1' (job job-1, in-progress, for 13 min)", message)
+        self.assertIn("'wb2' (job job-2, in-progress, for 13 min)", message)
+        comp.server.jobs.cancel.assert_not_called()
+
+    def test_max_duration_counts_from_job_creation(self):
+        comp = self._component(cancel_overdue_jobs=True)
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"}, {}, {"wb1": 15})
+
+        self.assertIn("ran longer than their max duration. These jobs were cancelled: 'wb1'", str(ctx.exception))
+        self.assertNotIn("wb2", str(ctx.exception))
+        comp.server.jobs.cancel.assert_called_once_with("job-1")
+        self.assertEqual(comp.server.jobs.get_by_id.call_count, 12)  # 6 passes: 10 min old, then 1 min per pass
+
+    def test_deadlines_hold_while_waiting_for_a_free_slot(self):
+        for cfg, reason in (
+            ({"poll_timeout": 5}, "Polling timed out after 5 minutes"),
+            ({"workbooks": [{"name": "wb1", "max_duration": 15}]}, "ran longer than their max duration"),
+        ):
+            with self.subTest(reason=reason):
+                comp = self._component(**{"datasources": [], "workbooks": [{"name": "wb1"}, {"name": "wb2"}], **cfg})
+                comp.auth = mock.Mock()
+                comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+                comp.cfg_params["max_concurrent_refreshes"] = 1
+                workbooks = []
+                for name in ("wb1", "wb2"):
+                    workbook = mock.Mock(id=f"{name}-luid")
+                    workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+                    workbooks.append(workbook)
+                comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+                _look_up_per_entry(comp)
+                comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+                # job-1 never leaves the queue, so wb2 never gets a slot
+                created_at = datetime(2024, 5, 1, 11, 50, tzinfo=UTC)
+                comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(
+                    id=job_id, finish_code=-1, started_at=None, created_at=created_at, notes=[]
+                )
+
+                with self.assertRaises(UserException) as ctx:
+                    comp.run()
+
+                self.assertIn(reason, str(ctx.exception))
+                self.assertIn("'wb1' (job job-1, queued", str(ctx.exception))
+                comp.server.workbooks.refresh.assert_called_once()
+
+    def test_poll_timeout_counts_the_wait_for_a_free_slot_too(self):
+        comp = self._component(datasources=[], workbooks=[{"name": "wb1"}, {"name": "wb2"}])
+        comp.cfg_params.update(poll_mode=1, poll_timeout=5, max_concurrent_refreshes=1)
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        workbooks = []
+        for name in ("wb1", "wb2"):
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+        comp.server.workbooks.refresh.side_effect = lambda workbook: mock.Mock(id=f"job-{workbook.name}")
+        # job-wb1 takes four minutes to free its slot, job-wb2 never finishes
+        statuses = {"job-wb1": [-1, -1, -1, -1, 0]}
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(
+            id=job_id,
+            finish_code=statuses[job_id].pop(0) if statuses.get(job_id) else -1,
+            started_at=None,
+            created_at=None,
+            notes=[],
+        )
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+
+        self.assertIn("Polling timed out after 5 minutes", str(ctx.exception))
+        self.assertIn("'wb2'", str(ctx.exception))
+        # five minutes after the first trigger, not five after the final poll started
+        self.assertEqual(datetime.now(UTC), datetime(2024, 5, 1, 12, 5, tzinfo=UTC))
+
+    def test_invalid_poll_timeout_fails_before_triggering(self):
+        comp = Component.__new__(Component)
+        comp.cfg_params = {"datasources": [], "poll_timeout": "soon"}
+        comp.server = mock.MagicMock()
+
+        with self.assertRaises(UserException):
+            comp.run()
+        comp.server.auth.sign_in.assert_not_called()
+
+
+class TestWebhookCompletion(unittest.TestCase):
+    """With refresh webhooks, polling asks only about confirmed jobs and about every job once in a long while."""
+
+    def setUp(self):
+        freezer = freeze_time("2024-05-01 12:00:00")
+        self.clock = freezer.start()
+        self.addCleanup(freezer.stop)
+        patcher = mock.patch.object(component.time, "sleep", side_effect=self._sleep)
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.webhook_sent = False
+
+    def _sleep(self, seconds):
+        if not self.webhook_sent:
+            self.webhook_sent = True
+            self.comp.job_completions.add_event(
+                {
+                    "event_type": "WorkbookRefreshSucceeded",
+                    "resource_luid": "wb1-luid",
+                    "created_at": "2024-05-01T12:00:05Z",
+                }
+            )
+        self.clock.tick(seconds)
+
+    def _component(self):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {}
+        comp.server = mock.Mock()
+        comp.job_completions = component.JobCompletions()
+        comp.job_completions.expect("job-1", "wb1-luid", datetime(2024, 5, 1, 12, 0, tzinfo=UTC))
+        comp.job_completions.expect("job-2", "wb2-luid", datetime(2024, 5, 1, 12, 0, tzinfo=UTC))
+
+        def get_by_id(job_id):
+            if job_id == "job-1":
+                finished = self.webhook_sent
+            else:
+                finished = datetime.now(UTC) >= datetime(2024, 5, 1, 12, 5, tzinfo=UTC)
+            return mock.Mock(id=job_id, finish_code=0 if finished else -1, started_at=None)
+
+        comp.server.jobs.get_by_id.side_effect = get_by_id
+        self.comp = comp
+        return comp
+
+    def test_confirmed_jobs_are_polled_and_the_rest_only_as_a_fallback(self):
+        comp = self._component()
+
+        finished_jobs = {}
+        comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"}, finished_jobs)
+
+        polled = [c.args[0] for c in comp.server.jobs.get_by_id.call_args_list]
+        # a full pass, the confirmed job once, then nothing until the fallback pass after ten minutes
+        self.assertEqual(polled, ["job-1", "job-2", "job-1", "job-2"])
+        self.assertEqual(set(finished_jobs), {"wb1", "wb2"})
+        self.sleep.assert_called_with(component.WEBHOOK_CHECK_INTERVAL_SECONDS)
+
+
+class TestFailFast(unittest.TestCase):
+    """With ``fail_fast`` polling stops at the first failed job instead of waiting for all of them."""
+
+    def setUp(self):
+        patcher = mock.patch.object(component.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"fail_fast": True, **cfg}
+        comp.server = mock.Mock()
+        finish_codes = {"job-1": [1], "job-2": [-1, -1, 0]}
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(finish_code=finish_codes[job_id].pop(0))
+        return comp
+
+    def test_first_failure_ends_polling(self):
+        comp = self._component()
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"})
+
+        self.assertIn("'wb1' (finish_code=1)", str(ctx.exception))
+        self.assertIn("continue in Tableau: 'wb2'", str(ctx.exception))
+        self.assertEqual(comp.server.jobs.get_by_id.call_count, 2)
+        self.sleep.assert_not_called()
+        comp.server.jobs.cancel.assert_not_called()
+
+    def test_jobs_still_running_are_cancelled(self):
+        comp = self._component(cancel_on_failure=True)
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"})
+
+        comp.server.jobs.cancel.assert_called_once_with("job-2")
+        self.assertIn("were cancelled: 'wb2'", str(ctx.exception))
+
+    def test_failure_seen_by_the_window_fails_before_polling(self):
+        comp = self._component()
+
+        with self.assertRaises(UserException):
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"}, {"wb1": mock.Mock(finish_code=1)})
+
+        comp.server.jobs.get_by_id.assert_not_called()
+
+    def test_without_fail_fast_every_job_is_waited_for(self):
+        comp = self._component(fail_fast=False)
+
+        with self.assertRaises(UserException) as ctx:
+            comp._wait_for_finish({"wb1": "job-1", "wb2": "job-2"})
+
+        self.assertEqual(comp.server.jobs.get_by_id.call_count, 4)
+        self.assertNotIn("wb2", str(ctx.exception))
+
+
+class TestDatasourceWithTwoTasks(unittest.TestCase):
+    """A datasource configured with both its full and its incremental refresh task is two targets with two jobs."""
+
+    def setUp(self):
+        patcher = mock.patch.object(component.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "datasources": [
+                {"name": "ds1", "type": "RefreshExtractTask"},
+                {"name": "ds1", "type": "IncrementExtractTask"},
+            ],
+            "workbooks": [],
+            **cfg,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        datasource = mock.Mock(id="ds-luid")
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([datasource, datasource], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
+        comp.get_all_datasource_refresh_tasks = mock.Mock(
+            return_value=[
+                _datasource_task(id="task-full", task_type="RefreshExtractTask", last_run_at=None),
+                _datasource_task(id="task-incr", task_type="IncrementExtractTask", last_run_at=None),
+            ]
+        )
+        comp._run_task = mock.Mock(side_effect=lambda task: f"job-{task.id}")
+        return comp
+
+    def test_both_jobs_are_polled_and_recorded(self):
+        comp = self._component(poll_mode=1, run_results_table=True)
+        finish_codes = {"job-task-full": 1, "job-task-incr": 0}
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(
+            id=job_id, finish_code=finish_codes[job_id], notes=[], started_at=None, created_at=None
+        )
+        targets = []
+        comp._write_run_results = lambda run_targets, _: targets.extend(run_targets)
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+
+        self.assertEqual(
+            sorted(c.args[0] for c in comp.server.jobs.get_by_id.call_args_list), ["job-task-full", "job-task-incr"]
+        )
+        self.assertEqual(
+            [(t.item.id, t.job_id, int(t.job.finish_code)) for t in targets],
+            [("task-full", "job-task-full", 1), ("task-incr", "job-task-incr", 0)],
+        )
+        self.assertIn("'ds1 (ds-luid, RefreshExtractTask)' (finish_code=1)", str(ctx.exception))
+
+
+@freeze_time("2024-05-01 12:00:00")
+class TestMinRefreshInterval(unittest.TestCase):
+    """``min_refresh_interval`` skips targets whose extract Tableau refreshed within the last N minutes."""
+
+    def _component(self, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"datasources": [], "workbooks": [], **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        return comp
+
+    @staticmethod
+    def _with_one_datasource(comp, last_run_at):
+        task = _datasource_task(last_run_at=last_run_at)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock(id="ds-luid")], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
+        comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[task])
+        comp._run_task = mock.Mock(return_value="job-1")
+
+    def test_recently_refreshed_datasource_is_skipped(self):
+        comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}], min_refresh_interval=30)
+        self._with_one_datasource(comp, datetime(2024, 5, 1, 11, 50, tzinfo=UTC))
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        comp._run_task.assert_not_called()
+        output = "\n".join(logs.output)
+        self.assertIn('Skipping extract for datasource "ds1"', output)
+        self.assertIn("within the minimum refresh interval of 30 minutes", output)
+        self.assertIn("1 of 1 extracts did not need a refresh", output)
+
+    def test_stale_datasource_is_triggered(self):
+        comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}], min_refresh_interval=30)
+        self._with_one_datasource(comp, datetime(2024, 5, 1, 11, 0, tzinfo=UTC))
+
+        comp.run()
+
+        comp._run_task.assert_called_once()
+
+    def test_never_refreshed_datasource_is_triggered(self):
+        comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}], min_refresh_interval=30)
+        self._with_one_datasource(comp, None)
+
+        comp.run()
+
+        comp._run_task.assert_called_once()
+
+    def test_option_off_ignores_last_run(self):
+        comp = self._component(datasources=[{"name": "ds1", "type": "FullRefresh"}])
+        self._with_one_datasource(comp, datetime(2024, 5, 1, 11, 59, tzinfo=UTC))
+
+        comp.run()
+
+        comp._run_task.assert_called_once()
+
+    def test_recently_refreshed_workbook_is_skipped(self):
+        comp = self._component(workbooks=[{"name": "wb1"}], min_refresh_interval=30)
+        workbook = mock.Mock(id="wb-luid")
+        workbook.name = "wb1"  # must be set post-construction: Mock(name=...) sets the repr
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([workbook], []))
+        _look_up_per_entry(comp)
+        comp.get_last_workbook_refreshes = mock.Mock(return_value={"wb-luid": datetime(2024, 5, 1, 11, 45, tzinfo=UTC)})
+
+        comp.run()
+
+        comp.server.workbooks.refresh.assert_not_called()
+
+    def test_last_workbook_refresh_is_the_latest_task_run(self):
+        comp = self._component()
+        older = mock.Mock(last_run_at=datetime(2024, 5, 1, 8, 0, tzinfo=UTC), target=mock.Mock(id="wb-luid"))
+        newer = mock.Mock(last_run_at=datetime(2024, 5, 1, 10, 0, tzinfo=UTC), target=mock.Mock(id="wb-luid"))
+        never = mock.Mock(last_run_at=None, target=mock.Mock(id="other-luid"))
+        comp.get_all_refresh_tasks = mock.Mock(return_value=[newer, never, older])
+
+        self.assertEqual(comp.get_last_workbook_refreshes(), {"wb-luid": newer.last_run_at})
+        comp.get_all_refresh_tasks.assert_called_once_with("workbook")
+
+
+@freeze_time("2024-05-01 12:00:00")
+class TestCircuitBreaker(unittest.TestCase):
+    """``circuit_breaker_threshold`` holds back the targets that keep failing, probing them every interval."""
+
+    def setUp(self):
+        patcher = mock.patch.object(component.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, consecutive_failed_count=0, last_run_at=None, state=None, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "datasources": [{"name": "ds1", "type": "FullRefresh"}],
+            "workbooks": [],
+            "circuit_breaker_threshold": 3,
+            **cfg,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp.get_state_file = mock.Mock(return_value=state if state is not None else {})
+        comp.write_state_file = mock.Mock()
+        task = _datasource_task(consecutive_failed_count=consecutive_failed_count, last_run_at=last_run_at)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([mock.Mock(id="ds-luid")], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
+        comp.get_all_datasource_refresh_tasks = mock.Mock(return_value=[task])
+        comp._run_task = mock.Mock(return_value="job-1")
+        return comp
+
+    def test_target_failing_in_tableau_is_held_back(self):
+        comp = self._component(consecutive_failed_count=30, last_run_at=datetime(2024, 5, 1, 6, 0, tzinfo=UTC))
+
+        with self.assertLogs(level="WARNING") as logs:
+            comp.run()
+
+        comp._run_task.assert_not_called()
+        output = "\n".join(logs.output)
+        self.assertIn('Skipping extract for datasource "ds1"', output)
+        self.assertIn("failed 30 times in a row", output)
+        self.assertIn("until 2024-05-02T06:00:00+00:00", output)
+
+    def test_probe_is_triggered_once_the_interval_passed(self):
+        comp = self._component(
+            consecutive_failed_count=30,
+            last_run_at=datetime(2024, 5, 1, 6, 0, tzinfo=UTC),
+            circuit_breaker_probe_interval=60,
+        )
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        comp._run_task.assert_called_once()
+        self.assertIn("triggering it as a probe", "\n".join(logs.output))
+        history = comp.write_state_file.call_args.args[0]["circuit_breaker"]
+        self.assertEqual(history["datasource:ds-task"], {"failures": 0, "last_attempt_at": "2024-05-01T12:00:00+00:00"})
+
+    def test_failures_seen_in_poll_mode_are_counted_and_success_clears_them(self):
+        history = {"failures": 1, "last_attempt_at": "2024-04-30T12:00:00+00:00"}
+        state = {"circuit_breaker": {"datasource:ds-task": history}}
+        comp = self._component(state=state, poll_mode=1)
+        comp.server.jobs.get_by_id.return_value = mock.Mock(id="job-1", finish_code=1, notes=[], created_at=None)
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        history = comp.write_state_file.call_args.args[0]["circuit_breaker"]
+        self.assertEqual(history["datasource:ds-task"]["failures"], 2)
+
+        comp = self._component(state=state, poll_mode=1)
+        comp.server.jobs.get_by_id.return_value = mock.Mock(id="job-1", finish_code=0, created_at=None)
+        comp.run()
+
+        self.assertEqual(comp.write_state_file.call_args.args[0]["circuit_breaker"], {})
+
+    def test_failed_trigger_is_counted_whether_or_not_the_run_fails(self):
+        state = {"circuit_breaker": {"workbook:wb1-luid": {"failures": 1, "last_attempt_at": "2024-04-30T12:00:00"}}}
+        refused = tsc.ServerResponseError("403", "Forbidden", "Not allowed.")
+        for continue_on_error in (False, True):
+            with self.subTest(continue_on_error=continue_on_error):
+                comp = self._component(
+                    state=json.loads(json.dumps(state)),
+                    datasources=[],
+                    workbooks=[{"name": "wb1"}],
+                    continue_on_error=continue_on_error,
+                )
+                workbook = mock.Mock(id="wb1-luid")
+                workbook.name = "wb1"
+                comp._get_all_ds_by_filter = mock.Mock(return_value=([workbook], []))
+                _look_up_per_entry(comp)
+                comp.server.workbooks.refresh.side_effect = refused
+
+                if continue_on_error:
+                    comp.run()
+                else:
+                    # the state is written before the run fails, whether the platform keeps it or not
+                    with self.assertRaises(UserException):
+                        comp.run()
+
+                history = comp.write_state_file.call_args.args[0]["circuit_breaker"]
+                self.assertEqual(history["workbook:wb1-luid"]["failures"], 2)
+
+    def test_task_list_cache_is_not_used(self):
+        comp = self._component(consecutive_failed_count=30, cache_task_list=True)
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        self.assertIn("The circuit breaker needs the current task list", "\n".join(logs.output))
+        self.assertNotIn("task_snapshots", comp.write_state_file.call_args.args[0])
+
+    def test_option_off_triggers_whatever_failed(self):
+        comp = self._component(consecutive_failed_count=30, circuit_breaker_threshold=None)
+
+        comp.run()
+
+        comp._run_task.assert_called_once()
+        comp.get_state_file.assert_not_called()
+
+
+@freeze_time("2024-05-01 12:00:00")
+class TestDryRun(unittest.TestCase):
+    """``dry_run`` resolves and validates the targets like a run, then reports what it would trigger instead."""
+
+    def _component(self, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "datasources": [{"name": "ds1", "type": "RefreshExtractTask"}],
+            "workbooks": [{"name": "wb1"}],
+            **cfg,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp.server.session.hooks = {"response": []}
+        comp.connect_seconds = 0.25
+
+        def respond(*args):
+            # every listing answers with one response, seen by the session's response hooks
+            for hook in comp.server.session.hooks["response"]:
+                hook(mock.Mock())
+
+        last_run_at = datetime(2024, 5, 1, 11, 50, tzinfo=UTC)
+        task = mock.Mock(id="task-1", task_type="RefreshExtractTask", last_run_at=last_run_at)
+        task.target.id = "ds-luid"
+        workbook = mock.Mock(id="wb-luid")
+        workbook.name = "wb1"  # must be set post-construction: Mock(name=...) sets the repr
+        datasource = mock.Mock(id="ds-luid")
+        comp._get_all_ds_by_filter = mock.Mock(
+            side_effect=lambda kind, entries: respond() or ([workbook] if kind == "workbooks" else [datasource], [])
+        )
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
+        comp.get_all_datasource_refresh_tasks = mock.Mock(side_effect=lambda: respond() or [task])
+        comp.get_last_workbook_refreshes = mock.Mock(return_value={})
+        comp._run_task = mock.Mock(return_value="job-1")
+        return comp
+
+    def test_run_logs_the_plan_without_triggering(self):
+        comp = self._component(dry_run=True, poll_mode=True, min_refresh_interval=30)
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        comp._run_task.assert_not_called()
+        comp.server.workbooks.refresh.assert_not_called()
+        comp.server.jobs.get_by_id.assert_not_called()
+        self.assertEqual(comp.server.session.hooks["response"], [])
+        output = "\n".join(logs.output)
+        self.assertIn("Connecting to the server took 0.25s.", output)
+        self.assertIn("Trigger plan for site '': 1 of 2 targets would be triggered.", output)
+        self.assertIn('- datasource "ds1" (LUID: ds-luid): skip, it was last refreshed at', output)
+        self.assertIn('- workbook "wb1" (LUID: wb-luid): trigger workbook refresh', output)
+        self.assertIn(
+            "Requests: 3 made resolving the targets; a run would add 1 trigger requests and at least 1 job status "
+            "requests.",
+            output,
+        )
+        self.assertIn("Timings: sign_in ", output)
+        for phase in ("task_scan", "datasource_lookup", "validate_names", "validate_types", "workbook_lookup"):
+            self.assertIn(f" {phase} ", output)
+        self.assertIn("Dry run finished, no extract refresh was triggered.", output)
+
+    def test_sync_action_reports_the_plan(self):
+        comp = self._component()
+
+        result = Component.dry_run.__wrapped__(comp)  # the undecorated action: no sync action output handling
+
+        comp._run_task.assert_not_called()
+        self.assertEqual(result.type, component.MessageType.SUCCESS)
+        self.assertIn("2 of 2 targets would be triggered.", result.message)
+        self.assertIn('- datasource "ds1" (LUID: ds-luid): trigger RefreshExtractTask task task-1', result.message)
+        self.assertIn("a run would add 2 trigger requests.", result.message)
+
+    def test_invalid_configuration_fails_the_dry_run(self):
+        comp = self._component(dry_run=True)
+        comp.validate_dataset_names.side_effect = UserException("Some datasets do not exist: ['ds1']")
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        comp.server.workbooks.refresh.assert_not_called()
+
+
+class TestInputTableChanges(unittest.TestCase):
+    """A target mapped to ``input_tables`` is only triggered when one of them changed since the previous run.
+
+    The ``last_change_date`` of each mapped table is read from its input mapping manifest and compared with what
+    the run that last triggered the target stored in the state file.
+    """
+
+    def _component(self, state=None, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"datasources": [], "workbooks": [], **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        orders = mock.Mock(id="in.c-main.orders", last_change_date="2024-05-01T10:00:00+0200")
+        orders.name = "orders.csv"  # must be set post-construction: Mock(name=...) sets the repr
+        comp.get_input_tables_definitions = mock.Mock(return_value=[orders])
+        comp.get_state_file = mock.Mock(return_value=state or {})
+        comp.write_state_file = mock.Mock()
+        workbook = mock.Mock(id="wb-luid")
+        workbook.name = "wb1"
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([workbook], []))
+        _look_up_per_entry(comp)
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+        return comp
+
+    def test_changed_table_triggers_and_is_stored(self):
+        state = {"input_table_changes": {"workbook:wb-luid": {"in.c-main.orders": "2024-04-30T10:00:00+0200"}}}
+        comp = self._component(state=state, workbooks=[{"name": "wb1", "input_tables": ["in.c-main.orders"]}])
+
+        comp.run()
+
+        comp.server.workbooks.refresh.assert_called_once()
+        comp.write_state_file.assert_called_once_with(
+            {"input_table_changes": {"workbook:wb-luid": {"in.c-main.orders": "2024-05-01T10:00:00+0200"}}}
+        )
+
+    def test_unchanged_table_skips_the_target(self):
+        state = {"input_table_changes": {"workbook:wb-luid": {"orders.csv": "2024-05-01T10:00:00+0200"}}}
+        comp = self._component(state=state, workbooks=[{"name": "wb1", "input_tables": ["orders.csv"]}])
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        comp.server.workbooks.refresh.assert_not_called()
+        self.assertIn("none of its input tables ['orders.csv'] changed", "\n".join(logs.output))
+        comp.write_state_file.assert_called_once_with(state)
+
+    def test_first_run_triggers(self):
+        comp = self._component(workbooks=[{"name": "wb1", "input_tables": ["orders.csv"]}])
+
+        comp.run()
+
+        comp.server.workbooks.refresh.assert_called_once()
+
+    def test_table_missing_from_input_mapping_raises_user_exception(self):
+        comp = self._component(workbooks=[{"name": "wb1", "input_tables": ["in.c-main.customers"]}])
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+        self.assertIn("in.c-main.customers", str(ctx.exception))
+        comp.server.workbooks.refresh.assert_not_called()
+
+    def test_failed_trigger_keeps_the_previous_state(self):
+        comp = self._component(workbooks=[{"name": "wb1", "input_tables": ["orders.csv"]}], continue_on_error=True)
+        comp.server.workbooks.refresh.side_effect = tsc.ServerResponseError("500000", "Internal Server Error", "boom")
+
+        comp.run()
+
+        comp.write_state_file.assert_called_once_with({"input_table_changes": {}})
+
+    def test_without_mapping_nothing_is_read_or_written(self):
+        comp = self._component(workbooks=[{"name": "wb1"}])
+
+        comp.run()
+
+        comp.get_input_tables_definitions.assert_not_called()
+        comp.write_state_file.assert_not_called()
+
+
+@freeze_time("2024-05-01 12:00:00")
+class TestResumableRuns(unittest.TestCase):
+    """With ``resume_window``, triggered jobs are checkpointed to the state file as the run goes.
+
+    A run started within the window after a run that did not finish takes over that run's jobs which are still
+    running or succeeded, instead of triggering them again.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(component.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, *names, state=None, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"datasources": [], "workbooks": [{"name": n} for n in names], "resume_window": 60, **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp.get_state_file = mock.Mock(return_value=state or {})
+        self.written_states = []
+        comp.write_state_file = mock.Mock(side_effect=lambda st: self.written_states.append(copy.deepcopy(st)))
+        workbooks = []
+        for name in names:
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+        comp.server.workbooks.refresh.side_effect = lambda wb: mock.Mock(id=f"job-{wb.name}")
+        return comp
+
+    @staticmethod
+    def _checkpoint(started_at, **jobs):
+        return {
+            "checkpoint": {
+                "started_at": started_at,
+                "targets": {
+                    f"workbook:{name}-luid": {"job_id": job_id, "outcome": "triggered"} for name, job_id in jobs.items()
+                },
+            }
+        }
+
+    def test_running_and_successful_jobs_are_taken_over(self):
+        state = self._checkpoint("2024-05-01T11:30:00+00:00", wb1="job-old-1", wb2="job-old-2", wb3="job-old-3")
+        comp = self._component("wb1", "wb2", "wb3", "wb4", state=state, poll_mode=1)
+        finish_codes = {"job-old-1": -1, "job-old-2": 0, "job-old-3": 1}
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(finish_code=finish_codes.get(job_id, 0))
+        comp._wait_for_finish = mock.Mock()
+
+        comp.run()
+
+        refreshed = [c.args[0].name for c in comp.server.workbooks.refresh.call_args_list]
+        self.assertEqual(refreshed, ["wb3", "wb4"])
+        executed_jobs, finished_jobs, _ = comp._wait_for_finish.call_args.args
+        self.assertEqual(
+            executed_jobs,
+            {
+                "workbook:wb1-luid": "job-old-1",
+                "workbook:wb2-luid": "job-old-2",
+                "workbook:wb3-luid": "job-wb3",
+                "workbook:wb4-luid": "job-wb4",
+            },
+        )
+        self.assertEqual(list(finished_jobs), ["workbook:wb2-luid"])
+        self.assertNotIn("checkpoint", self.written_states[-1])  # a finished run leaves nothing to resume
+
+    def test_checkpoint_is_written_after_every_trigger_and_kept_on_failure(self):
+        comp = self._component("wb1", "wb2")
+        comp.server.workbooks.refresh.side_effect = [
+            mock.Mock(id="job-1"),
+            tsc.ServerResponseError("403069", "Forbidden", "Not allowed."),
+        ]
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        self.assertEqual(len(self.written_states), 2)
+        self.assertEqual(
+            self.written_states[-1]["checkpoint"],
+            {
+                "started_at": "2024-05-01T12:00:00+00:00",
+                "targets": {
+                    "workbook:wb1-luid": {"job_id": "job-1", "outcome": "triggered"},
+                    "workbook:wb2-luid": {"job_id": None, "outcome": "failed"},
+                },
+            },
+        )
+
+    def test_checkpoint_outside_the_window_is_not_resumed(self):
+        comp = self._component("wb1", state=self._checkpoint("2024-05-01T10:00:00+00:00", wb1="job-old-1"))
+
+        comp.run()
+
+        comp.server.jobs.get_by_id.assert_not_called()
+        comp.server.workbooks.refresh.assert_called_once()
+
+
+class TestRunResultsTable(unittest.TestCase):
+    """``run_results_table`` writes one row per target with its outcome and job, even when the run fails."""
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        os.makedirs(os.path.join(self.data_dir.name, "out", "tables"))
+        patcher = mock.patch.object(component.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, *names, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.data_folder_path = self.data_dir.name
+        comp.cfg_params = {"datasources": [], "workbooks": [{"name": n} for n in names], **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp.write_manifest = mock.Mock()
+        workbooks = []
+        for name in names:
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+        return comp
+
+    def _rows(self):
+        with open(os.path.join(self.data_dir.name, "out", "tables", "run_results.csv")) as results:
+            return {row["name"]: row for row in csv.DictReader(results)}
+
+    def test_outcome_of_every_target_is_written(self):
+        comp = self._component("wb1", "wb2", run_results_table=True, already_in_queue_as_warning=True, poll_mode=1)
+        already_queued = tsc.ServerResponseError("409093", "Resource Conflict", "Job is already queued.")
+        comp.server.workbooks.refresh.side_effect = [mock.Mock(id="job-1"), already_queued]
+        comp.server.jobs.get_by_id.return_value = mock.Mock(
+            finish_code=0,
+            created_at=datetime(2024, 5, 1, 12, 0, tzinfo=UTC),
+            started_at=datetime(2024, 5, 1, 12, 1, tzinfo=UTC),
+            completed_at=datetime(2024, 5, 1, 12, 4, tzinfo=UTC),
+        )
+
+        with self.assertLogs(level="WARNING"):
+            comp.run()
+
+        rows = self._rows()
+        self.assertEqual(rows["wb1"]["outcome"], "triggered")
+        self.assertEqual(rows["wb1"]["luid"], "wb1-luid")
+        self.assertEqual(rows["wb1"]["job_id"], "job-1")
+        self.assertEqual(rows["wb1"]["finish_code"], "0")
+        self.assertEqual(rows["wb1"]["queued_seconds"], "60.000")
+        self.assertEqual(rows["wb1"]["run_seconds"], "180.000")
+        self.assertNotEqual(rows["wb1"]["trigger_latency_seconds"], "")
+        self.assertEqual(rows["wb2"]["outcome"], "already-queued")
+        self.assertEqual(rows["wb2"]["job_id"], "")
+        comp.write_manifest.assert_called_once()
+
+    def test_both_tasks_of_a_datasource_get_their_own_row(self):
+        comp = self._component(
+            run_results_table=True,
+            datasources=[
+                {"name": "ds1", "type": "RefreshExtractTask"},
+                {"name": "ds1", "type": "IncrementExtractTask"},
+            ],
+        )
+        datasource = mock.Mock(id="ds-luid")
+        comp._get_all_ds_by_filter = mock.Mock(return_value=([datasource, datasource], []))
+        _look_up_per_entry(comp)
+        comp.validate_dataset_names = mock.Mock()
+        comp.get_all_datasource_refresh_tasks = mock.Mock(
+            return_value=[
+                _datasource_task(id="task-full", task_type="RefreshExtractTask", last_run_at=None),
+                _datasource_task(id="task-incr", task_type="IncrementExtractTask", last_run_at=None),
+            ]
+        )
+        comp._run_task = mock.Mock(side_effect=lambda task: f"job-{task.id}")
+
+        comp.run()
+
+        with open(os.path.join(self.data_dir.name, "out", "tables", "run_results.csv")) as results:
+            rows = list(csv.DictReader(results))
+        self.assertEqual(
+            [(row["luid"], row["task_id"], row["task_type"], row["job_id"]) for row in rows],
+            [
+                ("ds-luid", "task-full", "RefreshExtractTask", "job-task-full"),
+                ("ds-luid", "task-incr", "IncrementExtractTask", "job-task-incr"),
+            ],
+        )
+        table = comp.write_manifest.call_args.args[0]
+        self.assertEqual(table.primary_key, ["run_id", "kind", "luid", "task_id"])
+
+    def test_results_are_written_when_the_run_fails(self):
+        comp = self._component("wb1", run_results_table=True)
+        comp.server.workbooks.refresh.side_effect = tsc.ServerResponseError("403069", "Forbidden", "Not allowed.")
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        self.assertEqual(self._rows()["wb1"]["outcome"], "failed")
+
+    def test_metrics_are_written_when_the_run_fails(self):
+        comp = self._component("wb1", metrics_file=True)
+        comp.server.workbooks.refresh.side_effect = tsc.ServerResponseError("403069", "Forbidden", "Not allowed.")
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        with open(os.path.join(self.data_dir.name, "out", "files", "metrics.prom")) as metrics_file:
+            lines = metrics_file.read().splitlines()
+        self.assertIn("tableau_refresh_trigger_attempts_total 1", lines)
+        self.assertIn('tableau_refresh_trigger_failures_total{code_family="4xx"} 1', lines)
+        comp.server.session.hooks["response"].remove.assert_called_once()
+
+    def test_profile_is_written_when_the_run_fails(self):
+        comp = self._component("wb1", profile="run")
+        comp.server.workbooks.refresh.side_effect = tsc.ServerResponseError("403069", "Forbidden", "Not allowed.")
+
+        with self.assertRaises(UserException):
+            comp.run()
+
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.data_dir.name, "out", "files"))),
+            ["profile.collapsed", "profile.pstats", "profile_allocations.txt"],
+        )
+
+    def test_recorded_traffic_is_saved(self):
+        comp = self._component("wb1", record_traffic=True)
+        comp.traffic_cassette = TrafficRecorder()
+        comp.traffic_cassette.exchanges.append({"method": "POST", "path": "/api/3.19/auth/signin"})
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        comp.run()
+
+        with open(os.path.join(self.data_dir.name, "out", "files", "tableau_traffic.json")) as cassette_file:
+            self.assertEqual(len(json.load(cassette_file)["exchanges"]), 1)
+
+    def test_missing_cassette_is_a_user_error(self):
+        comp = Component.__new__(Component)
+        comp.data_folder_path = self.data_dir.name
+        comp.cfg_params = {"replay_traffic": "in/files/missing.json", "replay_latency_scale": "0.5"}
+        with self.assertRaisesRegex(UserException, "Cannot read the traffic cassette"):
+            comp._traffic_replay()
+
+        comp.cfg_params["replay_latency_scale"] = -1
+        with self.assertRaisesRegex(UserException, "Replay latency scale"):
+            comp._traffic_replay()
+
+    def test_job_events_are_appended_to_the_output_file(self):
+        comp = self._component("wb1", job_events_file=True, poll_mode=1)
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+        comp.server.jobs.get_by_id.side_effect = [
+            mock.Mock(id="job-1", finish_code=-1, started_at=None, created_at=None),
+            mock.Mock(id="job-1", finish_code=0, created_at=None),
+        ]
+
+        comp.run()
+
+        with open(os.path.join(self.data_dir.name, "out", "files", "job_events.jsonl")) as events_file:
+            states = [json.loads(line)["state"] for line in events_file]
+        self.assertEqual(states, ["queued", "success"])
+
+    def test_no_table_without_the_option(self):
+        comp = self._component("wb1")
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        comp.run()
+
+        self.assertFalse(os.listdir(os.path.join(self.data_dir.name, "out", "tables")))
+        comp.write_manifest.assert_not_called()
+
+
+class TestTargetCatalogueSyncActions(unittest.TestCase):
+    """The ``list_datasources`` / ``list_workbooks`` sync actions offer LUIDs from one scan of the site's tasks."""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(component, "CATALOGUE_CACHE_DIR", cache_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _item(luid, name, project="Sales", tags=()):
+        item = mock.Mock(id=luid, project_name=project, tags=set(tags))
+        item.name = name  # must be set post-construction: Mock(name=...) sets the repr
+        return item
+
+    def _component(self):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"endpoint": "https://tableau.example", "site_id": "site", "token_name": "pat"}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        return comp
+
+    def _pager(self):
+        tasks = [
+            mock.Mock(target=mock.Mock(type="datasource", id="ds-1"), task_type="RefreshExtractTask"),
+            mock.Mock(target=mock.Mock(type="datasource", id="ds-1"), task_type="IncrementExtractTask"),
+            mock.Mock(target=mock.Mock(type="workbook", id="wb-1"), task_type="RefreshExtractTask"),
+        ]
+        listings = {
+            "datasources": [self._item("ds-1", "Orders", tags={"prod"}), self._item("ds-2", "No extract")],
+            "workbooks": [self._item("wb-1", "Dashboard", project="Finance")],
+        }
+
+        def pager(endpoint, options=None):
+            if isinstance(endpoint, component.TaskCustom):
+                return list(tasks)
+            return list(next(items for name, items in listings.items() if endpoint is getattr(self.server, name)))
+
+        return pager
+
+    def test_datasources_with_refresh_tasks_are_listed(self):
+        comp = self._component()
+        self.server = comp.server
+        with mock.patch.object(component, "fetch_all_pages", side_effect=self._pager()):
+            elements = comp._list_refresh_targets("datasource")
+
+        self.assertEqual([e.value for e in elements], ["ds-1"])
+        self.assertEqual(elements[0].label, "Orders (project: Sales, tags: prod, refresh: Full, Incremental)")
+
+    def test_workbooks_are_listed_from_the_same_scan(self):
+        comp = self._component()
+        self.server = comp.server
+        with mock.patch.object(component, "fetch_all_pages", side_effect=self._pager()):
+            elements = comp._list_refresh_targets("workbook")
+
+        self.assertEqual([e.value for e in elements], ["wb-1"])
+        self.assertIn("project: Finance", elements[0].label)
+
+    def test_repeated_listing_uses_the_cache(self):
+        comp = self._component()
+        self.server = comp.server
+        with mock.patch.object(component, "fetch_all_pages", side_effect=self._pager()) as pager:
+            comp._list_refresh_targets("datasource")
+            calls = pager.call_count
+            comp._list_refresh_targets("workbook")
+
+        self.assertEqual(pager.call_count, calls)
+        comp.server.auth.sign_in.assert_called_once()
+
+
+class TestDatasourceSelectors(unittest.TestCase):
+    """``datasource_selectors`` expand a project (and tag) into every datasource with the selected refresh task."""
+
+    @staticmethod
+    def _item(luid, name, project_id=None):
+        item = mock.Mock(id=luid, project_id=project_id)
+        item.name = name  # must be set post-construction: Mock(name=...) sets the repr
+        return item
+
+    def _component(self, datasources, projects=(), **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"datasources": [], **cfg}
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        comp._run_task = mock.Mock(side_effect=lambda task: f"job-{task.target.id}")
+        tasks = [
+            mock.Mock(id="t-1", target=mock.Mock(type="datasource", id="ds-1"), task_type="RefreshExtractTask"),
+            mock.Mock(id="t-2", target=mock.Mock(type="datasource", id="ds-2"), task_type="IncrementExtractTask"),
+            mock.Mock(id="t-3", target=mock.Mock(type="datasource", id="ds-3"), task_type="RefreshExtractTask"),
+        ]
+        self.listing_options = []
+
+        def pager(endpoint, options=None):
+            if isinstance(endpoint, component.TaskCustom):
+                return list(tasks)
+            if endpoint is comp.server.projects:
+                return list(projects)
+            self.listing_options.append(options)
+            return list(datasources(options) if callable(datasources) else datasources)
+
+        patcher = mock.patch.object(component, "fetch_all_pages", side_effect=pager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return comp
+
+    def test_selector_is_filtered_server_side_and_joined_with_the_tasks(self):
+        datasources = [self._item("ds-1", "Orders"), self._item("ds-2", "Customers"), self._item("ds-3", "Items")]
+        comp = self._component(
+            datasources, datasource_selectors=[{"project": "Sales", "tag": "prod", "type": "RefreshExtractTask"}]
+        )
+
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        (options,) = self.listing_options
+        self.assertEqual({str(f) for f in options.filter}, {"projectName:eq:Sales", "tags:eq:prod"})
+        self.assertEqual([c.args[0].id for c in comp._run_task.call_args_list], ["t-1", "t-3"])
+        self.assertTrue(any('"Orders" (LUID: ds-1), "Items" (LUID: ds-3)' in line for line in logs.output))
+
+    def test_subprojects_are_included_by_id(self):
+        projects = [
+            self._item("p-1", "Sales"),
+            mock.Mock(id="p-2", parent_id="p-1"),
+            self._item("p-3", "Marketing"),
+            mock.Mock(id="p-4", parent_id="p-3"),
+        ]
+        for project, name in ((projects[1], "Archive"), (projects[3], "Archive")):
+            project.name = name
+        projects[0].parent_id = projects[2].parent_id = None
+        datasources = [self._item("ds-1", "Orders", project_id="p-2"), self._item("ds-3", "Items", project_id="p-4")]
+        comp = self._component(
+            datasources, projects, datasource_selectors=[{"project": "Sales", "include_subprojects": True}]
+        )
+
+        comp.run()
+
+        self.assertEqual({str(f) for f in self.listing_options[0].filter}, {"projectName:in:[Archive,Sales]"})
+        self.assertEqual([c.args[0].id for c in comp._run_task.call_args_list], ["t-1"])
+
+    def test_subproject_with_a_comma_is_listed_on_its_own(self):
+        projects = [self._item("p-1", "Sales"), mock.Mock(id="p-2", parent_id="p-1")]
+        projects[1].name = "Archive, 2023"
+        projects[0].parent_id = None
+        datasources = {
+            "Sales": self._item("ds-3", "Items", "p-1"),
+            "Archive, 2023": self._item("ds-1", "Orders", "p-2"),
+        }
+
+        def listing(options):
+            (project_filter,) = [f for f in options.filter if f.field == "projectName"]
+            names = project_filter.value if isinstance(project_filter.value, list) else [project_filter.value]
+            return [datasources[name] for name in names]
+
+        comp = self._component(
+            listing,
+            projects,
+            datasource_selectors=[{"project": "Sales", "include_subprojects": True}],
+        )
+
+        comp.run()
+
+        self.assertEqual(
+            [{str(f) for f in options.filter} for options in self.listing_options],
+            [{"projectName:in:[Sales]"}, {"projectName:eq:Archive, 2023"}],
+        )
+        self.assertEqual([c.args[0].id for c in comp._run_task.call_args_list], ["t-3", "t-1"])
+
+    def test_selector_without_a_match_raises_user_exception(self):
+        comp = self._component(
+            [self._item("ds-2", "Customers")], datasource_selectors=[{"project": "Sales", "type": "RefreshExtractTask"}]
+        )
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+        self.assertIn("matched no datasource", str(ctx.exception))
+
+
+class TestMultiSite(unittest.TestCase):
+    """``sites`` groups datasources and workbooks per site; every site is signed in to and refreshed concurrently."""
+
+    def setUp(self):
+        self.servers = []
+
+        def server(endpoint, use_server_version, session_factory=None):
+            self.assertFalse(use_server_version)  # the version negotiated at start-up is reused
+            site_server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+            site_server.workbooks.refresh.side_effect = lambda wb: mock.Mock(id=f"job-{wb.name}")
+            self.servers.append(site_server)
+            return site_server
+
+        patcher = mock.patch.object(component.tsc, "Server", side_effect=server)
+        self.server_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _component(self, sites, **cfg):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "endpoint": "https://tableau.example",
+            "authentication_type": "Personal Access Token",
+            "token_name": "pat",
+            "#token_secret": "secret",
+            "datasources": [],
+            "sites": [
+                {"site_id": site_id, "workbooks": [{"name": n} for n in names]} for site_id, names in sites.items()
+            ],
+            **cfg,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock(version="3.19")
+
+        def get_all_ds_by_filter(kind, entries):
+            workbooks = []
+            for entry in entries:
+                workbook = mock.Mock(id=f"{entry['name']}-luid")
+                workbook.name = entry["name"]  # must be set post-construction: Mock(name=...) sets the repr
+                workbooks.append(workbook)
+            return workbooks, []
+
+        comp._get_all_ds_by_filter = mock.Mock(side_effect=get_all_ds_by_filter)
+        _look_up_per_entry(comp)
+        return comp
+
+    def test_every_site_is_signed_in_to_and_refreshed(self):
+        comp = self._component({"sales": ["wb1"], "finance": ["wb2"]})
+        site_components = []
+        run_site = Component._run_site
+
+        def record(site_component, *args):
+            site_components.append(site_component)
+            return run_site(site_component, *args)
+
+        with mock.patch.object(Component, "_run_site", autospec=True, side_effect=record):
+            comp.run()
+
+        self.assertEqual(sorted(c.auth.site_id for c in site_components), ["finance", "sales"])
+        for site_component in site_components:
+            self.assertEqual(site_component.server.version, "3.19")
+            site_component.server.auth.sign_in.assert_called_once_with(site_component.auth)
+            site_component.server.workbooks.refresh.assert_called_once()
+        comp.server.auth.sign_in.assert_not_called()  # no top-level datasources or workbooks
+
+    def test_failed_site_does_not_stop_the_others(self):
+        comp = self._component({"sales": ["wb1"], "finance": ["wb2"]})
+        get_all_ds_by_filter = comp._get_all_ds_by_filter.side_effect
+
+        def fail_on_finance(kind, entries):
+            if entries[0]["name"] == "wb2":
+                raise UserException("Workbook not found.")
+            return get_all_ds_by_filter(kind, entries)
+
+        comp._get_all_ds_by_filter.side_effect = fail_on_finance
+
+        with self.assertRaises(UserException) as ctx:
+            comp.run()
+
+        self.assertEqual(str(ctx.exception), "Site 'finance': Workbook not found.")
+        refreshed = [c.args[0].name for server in self.servers for c in server.workbooks.refresh.call_args_list]
+        self.assertEqual(refreshed, ["wb1"])
+
+    def test_terminated_run_stops_every_site(self):
+        comp = self._component({"sales": ["wb1"], "finance": ["wb2"]}, poll_mode=1, cancel_on_abort=True)
+        terminated = threading.Event()
+
+        def sleep(_):
+            # the first site to poll terminates the run; the signal is handled on the main thread
+            if not terminated.is_set():
+                terminated.set()
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        polls = []
+        new_server = self.server_class.side_effect
+
+        def polled_server(*args, **kwargs):
+            site_server = new_server(*args, **kwargs)
+            site_server.jobs.get_by_id.side_effect = lambda job_id: polls.append(job_id) or mock.Mock(finish_code=-1)
+            return site_server
+
+        self.server_class.side_effect = polled_server
+        real_sleep = time.sleep
+        with mock.patch.object(component.time, "sleep", side_effect=sleep):
+            with self.assertLogs(level="WARNING"), self.assertRaises(UserException) as ctx:
+                comp.run()
+            polls_at_the_end = len(polls)
+            real_sleep(0.2)
+
+        self.assertIn("Cancelled 2 of 2 unfinished extract refresh jobs", str(ctx.exception))
+        self.assertEqual(len(polls), polls_at_the_end)  # no site polls on after the run ended
+
+    def test_single_site_configuration_is_unchanged(self):
+        comp = self._component({}, workbooks=[{"name": "wb1"}])
+        comp.server.workbooks.refresh.return_value = mock.Mock(id="job-1")
+
+        comp.run()
+
+        self.server_class.assert_not_called()
+        comp.server.workbooks.refresh.assert_called_once()
+
+
+class TestCancelOnAbort(unittest.TestCase):
+    """With ``cancel_on_abort``, terminating the job while it polls cancels the refreshes it still waits for."""
+
+    def test_sigterm_while_polling_cancels_unfinished_jobs(self):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "datasources": [],
+            "workbooks": [{"name": "wb1"}, {"name": "wb2"}],
+            "poll_mode": 1,
+            "cancel_on_abort": True,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        workbooks = []
+        for name in ("wb1", "wb2"):
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+        comp.server.workbooks.refresh.side_effect = [mock.Mock(id="job-1"), mock.Mock(id="job-2")]
+        comp.server.jobs.get_by_id.side_effect = lambda job_id: mock.Mock(finish_code=0 if job_id == "job-1" else -1)
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        with mock.patch.object(component.time, "sleep", side_effect=lambda _: os.kill(os.getpid(), signal.SIGTERM)):
+            with self.assertLogs(level="WARNING"), self.assertRaises(UserException) as ctx:
+                comp.run()
+
+        comp.server.jobs.cancel.assert_called_once_with("job-2")
+        self.assertIn("Cancelled 1 of 1 unfinished extract refresh jobs: 'wb2' (job-2)", str(ctx.exception))
+        self.assertEqual(signal.getsignal(signal.SIGTERM), previous_handler)
+
+    def test_sigterm_while_triggering_is_not_taken_for_a_failed_trigger(self):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {
+            "datasources": [],
+            "workbooks": [{"name": "wb1"}, {"name": "wb2"}, {"name": "wb3"}],
+            "continue_on_error": True,
+            "cancel_on_abort": True,
+        }
+        comp.auth = mock.Mock()
+        comp.server = mock.MagicMock()  # MagicMock: sign_in() is used as a context manager
+        workbooks = []
+        for name in ("wb1", "wb2", "wb3"):
+            workbook = mock.Mock(id=f"{name}-luid")
+            workbook.name = name  # must be set post-construction: Mock(name=...) sets the repr
+            workbooks.append(workbook)
+        comp._get_all_ds_by_filter = mock.Mock(return_value=(workbooks, []))
+        _look_up_per_entry(comp)
+
+        def refresh(workbook):
+            if workbook.name == "wb2":
+                # the signal arrives while the trigger request is in flight
+                os.kill(os.getpid(), signal.SIGTERM)
+            return mock.Mock(id=f"job-{workbook.name[-1]}")
+
+        comp.server.workbooks.refresh.side_effect = refresh
+
+        with self.assertLogs(level="WARNING") as logs, self.assertRaises(UserException) as ctx:
+            comp.run()
+
+        self.assertEqual(comp.server.workbooks.refresh.call_count, 2)
+        comp.server.jobs.cancel.assert_called_once_with("job-1")
+        self.assertIn("Cancelled 1 of 1 unfinished extract refresh jobs: 'wb1' (job-1)", str(ctx.exception))
+        self.assertNotIn("Failed to trigger", "\n".join(logs.output))
+
+
+class TestTaskListCache(unittest.TestCase):
+    """With ``cache_task_list`` a warm run takes the site's tasks from the state after one small request."""
+
+    def setUp(self):
+        self.tasks = [
+            mock.Mock(id=f"t-{i}", task_type="RefreshExtractTask", target=mock.Mock(type="datasource", id=f"ds-{i}"))
+            for i in range(30)
+        ]
+        for task in self.tasks:
+            task.configure_mock(priority=50, consecutive_failed_count=0, schedule_id="s", last_run_at=None)
+        pager = mock.patch.object(component, "fetch_all_pages", side_effect=lambda endpoint: list(self.tasks))
+        self.pager = pager.start()
+        self.addCleanup(pager.stop)
+        get = mock.patch.object(component.TaskCustom, "get", side_effect=self._first_page)
+        self.get = get.start()
+        self.addCleanup(get.stop)
+
+    def _first_page(self, req_options=None):
+        page = self.tasks[: req_options.pagesize]
+        return page, mock.Mock(total_available=len(self.tasks))
+
+    def _component(self, task_snapshots):
+        comp = Component.__new__(Component)  # bypass __init__ (needs a live server + datadir)
+        comp.cfg_params = {"endpoint": "https://tableau.example", "site_id": "site"}
+        comp.server = mock.Mock()
+        comp.task_snapshots = task_snapshots
+        return comp
+
+    def test_warm_run_uses_the_snapshot(self):
+        snapshots = {}
+        self._component(snapshots)._get_site_tasks()
+        self.assertEqual(self.pager.call_count, 1)
+
+        tasks = self._component(snapshots)._get_site_tasks()
+
+        self.assertEqual(self.pager.call_count, 1)  # no full scan
+        self.assertEqual(self.get.call_count, 2)  # one small request per run
+        self.assertEqual([t.id for t in tasks], [t.id for t in self.tasks])
+        self.assertEqual(list(snapshots), ["https://tableau.example|site"])
+
+    def test_changed_task_count_rescans(self):
+        snapshots = {}
+        self._component(snapshots)._get_site_tasks()
+        self.tasks.pop()
+
+        tasks = self._component(snapshots)._get_site_tasks()
+
+        self.assertEqual(self.pager.call_count, 2)
+        self.assertEqual(len(tasks), 29)
+        self.assertEqual(snapshots["https://tableau.example|site"]["total"], 29)
+
+    def test_deleted_task_ahead_of_an_added_one_rescans(self):
+        snapshots = {}
+        self._component(snapshots)._get_site_tasks()
+        self.tasks.pop(0)
+        self.tasks.append(mock.Mock(id="t-new", task_type="RefreshExtractTask", target=mock.Mock(id="ds-new")))
+        self.tasks[-1].configure_mock(priority=50, consecutive_failed_count=0, schedule_id="s", last_run_at=None)
+
+        tasks = self._component(snapshots)._get_site_tasks()
+
+        self.assertEqual(self.pager.call_count, 2)
+        self.assertNotIn("t-0", [t.id for t in tasks])
+
+    def test_complete_first_page_is_used_over_the_snapshot(self):
+        snapshots = {}
+        del self.tasks[5:]
+        self._component(snapshots)._get_site_tasks()
+        deleted = self.tasks.pop()
+
+        for total in (4, None):
+            with self.subTest(total=total):
+                self.get.side_effect = lambda req_options=None: (list(self.tasks), mock.Mock(total_available=total))
+
+                tasks = self._component(snapshots)._get_site_tasks()
+
+                self.assertNotIn(deleted.id, [t.id for t in tasks])
+                self.pager.assert_not_called()
+
+    def test_unpaged_listing_without_a_total_is_used_as_it_is(self):
+        self.get.side_effect = lambda req_options=None: (list(self.tasks), mock.Mock(total_available=None))
+        snapshots = {}
+
+        for _ in range(2):
+            tasks = self._component(snapshots)._get_site_tasks()
+
+        self.assertEqual([t.id for t in tasks], [t.id for t in self.tasks])
+        self.assertEqual(self.get.call_count, 2)  # one request per run
+        self.pager.assert_not_called()
+
+    def test_without_the_option_the_list_is_scanned(self):
+        self._component(None)._get_site_tasks()
+
+        self.get.assert_not_called()
+        self.assertEqual(self.pager.call_count, 1)
+
+
 class TestConnectToServer(unittest.TestCase):
     """``_connect_to_server`` retries a refused connection and then raises a ``UserException``.
 
@@ -552,7 +2510,7 @@ class TestConnectToServer(unittest.TestCase):
 
         self.assertIs(returned_server, server)
         self.assertIs(returned_info, server.server_info.get.return_value)
-        server_cls.assert_called_once_with("https://tableau.example", use_server_version=True)
+        server_cls.assert_called_once_with("https://tableau.example", use_server_version=True, session_factory=None)
         self.sleep.assert_not_called()
 
     def test_explicit_api_version_is_still_applied(self):
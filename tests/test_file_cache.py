@@ -0,0 +1,31 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import file_cache
+from file_cache import FileCache
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = FileCache(directory.name, ttl=60)
+
+    def test_value_is_returned_until_it_expires(self):
+        with mock.patch.object(file_cache.time, "time", return_value=1000):
+            self.cache.set("https://tableau.example|site", [{"luid": "ds-1"}])
+        with mock.patch.object(file_cache.time, "time", return_value=1059):
+            self.assertEqual(self.cache.get("https://tableau.example|site"), [{"luid": "ds-1"}])
+        with mock.patch.object(file_cache.time, "time", return_value=1061):
+            self.assertIsNone(self.cache.get("https://tableau.example|site"))
+
+    def test_missing_or_unreadable_entry_is_none(self):
+        self.assertIsNone(self.cache.get("nothing stored"))
+        with open(self.cache._path("broken"), "w") as broken:
+            broken.write("{not json")
+        self.assertIsNone(self.cache.get("broken"))
+
+
+if __name__ == "__main__":
+    unittest.main()
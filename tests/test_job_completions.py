@@ -0,0 +1,93 @@
+import unittest
+from datetime import UTC, datetime
+from unittest import mock
+
+import requests
+
+from job_completions import JobCompletions
+
+TRIGGERED_AT = datetime(2024, 5, 1, 12, 0, tzinfo=UTC)
+
+
+def _event(luid, created_at="2024-05-01T12:10:00Z", event_type="DatasourceRefreshSucceeded"):
+    return {"event_type": event_type, "resource_luid": luid, "created_at": created_at, "resource_name": "Orders"}
+
+
+class TestJobCompletions(unittest.TestCase):
+    def setUp(self):
+        self.completions = JobCompletions()
+        self.completions.expect("job-1", "ds-1", TRIGGERED_AT)
+        self.completions.expect("job-2", "ds-2", TRIGGERED_AT)
+
+    def test_event_after_the_trigger_confirms_the_job(self):
+        self.assertTrue(self.completions.add_event(_event("ds-1", event_type="DatasourceRefreshFailed")))
+
+        self.assertEqual(self.completions.confirmed(["job-1", "job-2", "job-3"]), {"job-1"})
+
+    def test_event_of_an_earlier_refresh_does_not_confirm(self):
+        self.completions.add_event(_event("ds-1", created_at="2024-05-01T11:50:00Z"))
+
+        self.assertEqual(self.completions.confirmed(["job-1"]), set())
+
+    def test_recheck_waits_for_a_newer_event(self):
+        self.completions.add_event(_event("ds-1"))
+        self.completions.recheck_later("job-1", datetime(2024, 5, 1, 12, 20, tzinfo=UTC))
+        self.assertEqual(self.completions.confirmed(["job-1"]), set())
+
+        self.completions.add_event(_event("ds-1", created_at="2024-05-01T12:30:00Z"))
+        self.assertEqual(self.completions.confirmed(["job-1"]), {"job-1"})
+
+    def test_other_events_are_ignored(self):
+        self.assertFalse(self.completions.add_event(_event("ds-1", event_type="DatasourceCreated")))
+
+        self.assertEqual(self.completions.confirmed(["job-1"]), set())
+
+    def test_invalid_events_are_rejected(self):
+        for payload in (
+            ["not", "an", "event"],
+            {"event_type": "DatasourceRefreshSucceeded"},
+            _event("ds-1", created_at="yesterday"),
+            # a timestamp without a timezone cannot be compared with the trigger time
+            _event("ds-1", created_at="2024-05-01T12:10:00"),
+        ):
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                self.completions.add_event(payload)
+
+        self.assertEqual(self.completions.confirmed(["job-1"]), set())
+
+    def test_listener_receives_webhooks_from_a_local_sender(self):
+        port = self.completions.listen(0)
+        self.addCleanup(self.completions.close)
+
+        response = requests.post(f"http://127.0.0.1:{port}/", json=_event("ds-2"), timeout=5)
+        self.assertEqual(response.status_code, 200)
+        bad_response = requests.post(f"http://127.0.0.1:{port}/", data="{not json", timeout=5)
+        self.assertEqual(bad_response.status_code, 400)
+        naive_response = requests.post(
+            f"http://127.0.0.1:{port}/", json=_event("ds-1", created_at="2024-05-01T12:10:00"), timeout=5
+        )
+        self.assertEqual(naive_response.status_code, 400)
+        self.assertEqual(self.completions._server.server_address[0], "127.0.0.1")
+
+        self.assertEqual(self.completions.confirmed(["job-1", "job-2"]), {"job-2"})
+
+    def test_events_are_fetched_from_the_relay(self):
+        completions = JobCompletions("https://relay.example/events")
+        completions.expect("job-1", "ds-1", TRIGGERED_AT)
+        response = mock.Mock(json=mock.Mock(return_value=[_event("ds-1")]))
+
+        with mock.patch("job_completions.requests.get", return_value=response) as get:
+            self.assertEqual(completions.confirmed(["job-1"]), {"job-1"})
+        get.assert_called_once_with("https://relay.example/events", timeout=JobCompletions.RELAY_TIMEOUT_SECONDS)
+
+    def test_unreachable_relay_leaves_the_jobs_to_polling(self):
+        completions = JobCompletions("https://relay.example/events")
+        completions.expect("job-1", "ds-1", TRIGGERED_AT)
+
+        with mock.patch("job_completions.requests.get", side_effect=requests.ConnectionError("refused")):
+            with self.assertLogs(level="WARNING"):
+                self.assertEqual(completions.confirmed(["job-1"]), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
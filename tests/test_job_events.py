@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import UTC, datetime
+from unittest import mock
+
+from job_events import JobEventLog
+
+
+class TestJobEventLog(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "job_events.jsonl")
+        self.events = JobEventLog(self.path)
+
+    @staticmethod
+    def _job(finish_code, started_at=None, completed_at=None, notes=None):
+        return mock.Mock(
+            id="job-1",
+            finish_code=finish_code,
+            created_at=datetime(2024, 5, 1, 12, 0, tzinfo=UTC),
+            started_at=started_at,
+            completed_at=completed_at,
+            notes=notes,
+        )
+
+    def _written(self):
+        with open(self.path) as events_file:
+            return [json.loads(line) for line in events_file]
+
+    def test_only_state_changes_are_reported(self):
+        started = datetime(2024, 5, 1, 12, 1, tzinfo=UTC)
+        with self.assertLogs(level="INFO") as logs:
+            self.events.observe("wb1", self._job(-1))
+            self.events.observe("wb1", self._job(-1))
+            self.events.observe("wb1", self._job(-1, started_at=started))
+            self.events.observe(
+                "wb1",
+                self._job(1, started, datetime(2024, 5, 1, 12, 5, tzinfo=UTC), notes=["Extract is too large"]),
+            )
+
+        written = self._written()
+        self.assertEqual([e["state"] for e in written], ["queued", "in-progress", "failed"])
+        self.assertEqual([e["previous_state"] for e in written], [None, "queued", "in-progress"])
+        self.assertEqual(written[-1]["elapsed_seconds"], 300.0)
+        self.assertEqual(written[-1]["notes"], ["Extract is too large"])
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("WARNING", logs.output[-1])
+        self.assertIn("job-1 for 'wb1' is failed after 300s: Extract is too large", logs.output[-1])
+
+    def test_without_a_path_events_are_only_logged(self):
+        events = JobEventLog()
+        with self.assertLogs(level="INFO"):
+            events.observe("wb1", self._job(0, completed_at=datetime(2024, 5, 1, 12, 2, tzinfo=UTC)))
+
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import threading
+import unittest
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tableauserverclient as tsc
+
+from metadata_resolver import MetadataResolver, MetadataUnavailableError
+
+SIGN_IN_RESPONSE = (
+    '<tsResponse xmlns="http://tableau.com/api"><credentials token="session-token">'
+    '<site id="site-luid" contentUrl="sales"/><user id="user-luid"/></credentials></tsResponse>'
+)
+
+GRAPHQL_DATA = {
+    "publishedDatasources": [
+        {"luid": "ds-luid", "name": "Orders", "projectName": "Sales", "tags": [{"name": "daily"}]},
+        # not indexed yet
+        {"luid": "", "name": "Orders", "projectName": "Finance", "tags": []},
+    ],
+    "workbooks": [
+        {
+            "luid": "wb-luid",
+            "name": "Revenue",
+            "projectName": "Sales",
+            "tags": [],
+            "embeddedDatasources": [
+                {
+                    "hasExtracts": True,
+                    "extractLastRefreshTime": "2024-05-01T10:00:00Z",
+                    "extractLastIncrementalUpdateTime": "2024-05-01T11:30:00Z",
+                },
+                {"hasExtracts": False, "extractLastRefreshTime": None, "extractLastIncrementalUpdateTime": None},
+            ],
+        },
+        {"luid": "live-luid", "name": "Live", "projectName": "Sales", "tags": [], "embeddedDatasources": []},
+    ],
+}
+
+
+class _GraphQLStandIn:
+    """A local HTTP server answering a sign-in and Metadata API queries the way Tableau would."""
+
+    def __init__(self):
+        self.queries = []
+        self.auth_headers = []
+        self.status = 200
+        self.response = {"data": GRAPHQL_DATA}
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.endswith("/auth/signin"):
+                    self._answer(200, SIGN_IN_RESPONSE, "application/xml;charset=utf-8")
+                    return
+                stand_in.queries.append(json.loads(body)["query"])
+                stand_in.auth_headers.append(self.headers.get("X-Tableau-Auth"))
+                self._answer(stand_in.status, json.dumps(stand_in.response), "application/json")
+
+            def _answer(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestMetadataResolver(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = _GraphQLStandIn()
+        self.addCleanup(self.stand_in.close)
+        server = tsc.Server(self.stand_in.url, use_server_version=False)
+        server.version = "3.19"
+        server.auth.sign_in(tsc.PersonalAccessTokenAuth("token-name", "token-secret", "sales"))
+        self.resolver = MetadataResolver(server)
+
+    def test_datasources_and_workbooks_are_resolved_with_one_query(self):
+        datasources, workbooks = self.resolver.resolve(["Orders", "Orders", 'Say "hi"'], ["Revenue", "Live"])
+
+        self.assertEqual(len(self.stand_in.queries), 1)
+        query = self.stand_in.queries[0]
+        self.assertIn('publishedDatasources(filter: {nameWithin: ["Orders", "Say \\"hi\\""]})', query)
+        self.assertIn('workbooks(filter: {nameWithin: ["Live", "Revenue"]})', query)
+        self.assertEqual(self.stand_in.auth_headers, ["session-token"])
+        # the datasource without a LUID is left to the REST lookup
+        self.assertEqual(
+            [(ds.id, ds.name, ds.project_name, ds.tags) for ds in datasources],
+            [("ds-luid", "Orders", "Sales", {"daily"})],
+        )
+        self.assertEqual(
+            [(wb.id, wb.last_refreshed_at) for wb in workbooks],
+            [("wb-luid", datetime(2024, 5, 1, 11, 30, tzinfo=UTC)), ("live-luid", None)],
+        )
+
+    def test_only_the_asked_kinds_are_queried(self):
+        self.resolver.resolve(["Orders"], [])
+
+        self.assertNotIn("workbooks", self.stand_in.queries[0])
+        self.assertEqual(self.resolver.resolve([], []), ([], []))
+        self.assertEqual(len(self.stand_in.queries), 1)
+
+    def test_disabled_metadata_api_raises(self):
+        self.stand_in.status = 404
+        self.stand_in.response = {"error": "Not found"}
+        with self.assertRaises(MetadataUnavailableError):
+            self.resolver.resolve(["Orders"], [])
+
+        self.stand_in.status = 200
+        self.stand_in.response = {"data": None, "errors": [{"message": "The Metadata API is disabled."}]}
+        with self.assertRaisesRegex(MetadataUnavailableError, "The Metadata API is disabled."):
+            self.resolver.resolve(["Orders"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
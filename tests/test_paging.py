@@ -0,0 +1,47 @@
+import threading
+import unittest
+from unittest import mock
+
+import tableauserverclient as tsc
+
+from paging import MAX_PAGE_SIZE, fetch_all_pages
+
+
+class TestFetchAllPages(unittest.TestCase):
+    def _endpoint(self, total, page_size=3):
+        endpoint = mock.Mock()
+        endpoint.requested = []
+        lock = threading.Lock()
+
+        def get(options):
+            with lock:
+                endpoint.requested.append((options.pagenumber, options.pagesize, {str(f) for f in options.filter}))
+            start = (options.pagenumber - 1) * page_size
+            items = list(range(start, min(start + page_size, total)))
+            return items, mock.Mock(total_available=total, page_size=page_size)
+
+        endpoint.get.side_effect = get
+        return endpoint
+
+    def test_single_page_is_fetched_once(self):
+        endpoint = self._endpoint(total=2)
+
+        self.assertEqual(fetch_all_pages(endpoint), [0, 1])
+        self.assertEqual(endpoint.requested, [(1, MAX_PAGE_SIZE, set())])
+
+    def test_remaining_pages_are_fetched_in_order_with_the_same_filters(self):
+        endpoint = self._endpoint(total=10)
+        options = tsc.RequestOptions()
+        options.filter.add(tsc.Filter("projectName", tsc.RequestOptions.Operator.Equals, "Sales"))
+
+        self.assertEqual(fetch_all_pages(endpoint, options, max_workers=2), list(range(10)))
+        self.assertEqual(sorted(page for page, _, _ in endpoint.requested), [1, 2, 3, 4])
+        self.assertEqual({str(f) for _, _, filters in endpoint.requested for f in filters}, {"projectName:eq:Sales"})
+        self.assertEqual(options.pagenumber, 1)
+
+    def test_empty_listing(self):
+        self.assertEqual(fetch_all_pages(self._endpoint(total=0)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from datetime import UTC, datetime
+from unittest import mock
+
+from run_checkpoint import RunCheckpoint
+
+
+class TestRunCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.state = {
+            "checkpoint": {
+                "started_at": "2024-05-01T11:30:00+00:00",
+                "targets": {"workbook:wb-luid": {"job_id": "job-1", "outcome": "triggered"}},
+            }
+        }
+
+    def test_retry_within_the_window_keeps_the_first_start(self):
+        checkpoint = RunCheckpoint(self.state, mock.Mock(), datetime(2024, 5, 1, 12, 0, tzinfo=UTC), 60)
+
+        self.assertEqual(checkpoint.resumable, {"workbook:wb-luid": {"job_id": "job-1", "outcome": "triggered"}})
+        self.assertEqual(checkpoint.started_at, datetime(2024, 5, 1, 11, 30, tzinfo=UTC))
+        self.assertEqual(self.state["checkpoint"]["started_at"], "2024-05-01T11:30:00+00:00")
+
+    def test_run_after_the_window_starts_a_new_checkpoint(self):
+        write_state = mock.Mock()
+        checkpoint = RunCheckpoint(self.state, write_state, datetime(2024, 5, 1, 13, 0, tzinfo=UTC), 60)
+        checkpoint.record("workbook:other-luid", mock.Mock(job_id="job-2", outcome="triggered"))
+
+        self.assertEqual(checkpoint.resumable, {})
+        write_state.assert_called_once_with(
+            {
+                "checkpoint": {
+                    "started_at": "2024-05-01T13:00:00+00:00",
+                    "targets": {"workbook:other-luid": {"job_id": "job-2", "outcome": "triggered"}},
+                }
+            }
+        )
+
+    def test_clear_removes_the_checkpoint(self):
+        checkpoint = RunCheckpoint(self.state, mock.Mock(), datetime(2024, 5, 1, 12, 0, tzinfo=UTC), 60)
+        checkpoint.clear()
+
+        self.assertNotIn("checkpoint", self.state)
+
+
+if __name__ == "__main__":
+    unittest.main()
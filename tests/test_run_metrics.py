@@ -0,0 +1,128 @@
+import threading
+import unittest
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from refresh_target import RefreshTarget
+from run_metrics import RunMetrics
+
+
+def _target(outcome, trigger_latency=0.2, error_code=None, job=None):
+    target = RefreshTarget(RefreshTarget.Kind.Workbook, "Orders", "wb-luid", mock.Mock())
+    target.outcome = outcome
+    target.trigger_latency = trigger_latency
+    target.error_code = error_code
+    target.job = job
+    return target
+
+
+class _Receiver:
+    """A local stand-in for a pushgateway (or a Tableau server), answering every request with ``status``."""
+
+    def __init__(self, status=200):
+        self.requests = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _answer(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                receiver.requests.append((self.command, self.path, self.headers.get("Content-Type"), body))
+                self.send_response(status)
+                self.end_headers()
+
+            do_GET = do_POST = do_PUT = _answer
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RunMetrics()
+
+    def test_targets_are_counted(self):
+        finished = mock.Mock(
+            started_at=datetime(2024, 5, 1, 12, 1, tzinfo=UTC), completed_at=datetime(2024, 5, 1, 12, 4, tzinfo=UTC)
+        )
+        self.metrics.observe_targets(
+            [
+                _target(RefreshTarget.Outcome.Triggered, 0.2, job=finished),
+                _target(RefreshTarget.Outcome.AlreadyQueued, 3),
+                _target(RefreshTarget.Outcome.Failed, 0.4, error_code="403069"),
+                _target(RefreshTarget.Outcome.Failed, 0.4, error_code="404004"),
+                _target(RefreshTarget.Outcome.Failed, 0.4),
+                _target(RefreshTarget.Outcome.Skipped, None),
+            ]
+        )
+
+        lines = self.metrics.render().splitlines()
+        self.assertIn("tableau_refresh_trigger_attempts_total 5", lines)
+        self.assertIn("tableau_refresh_already_queued_skipped_total 1", lines)
+        self.assertIn('tableau_refresh_trigger_failures_total{code_family="4xx"} 2', lines)
+        self.assertIn('tableau_refresh_trigger_failures_total{code_family="none"} 1', lines)
+        self.assertIn('tableau_refresh_trigger_latency_seconds_bucket{le="0.25"} 1', lines)
+        self.assertIn('tableau_refresh_trigger_latency_seconds_bucket{le="2.5"} 4', lines)
+        self.assertIn('tableau_refresh_trigger_latency_seconds_bucket{le="+Inf"} 5', lines)
+        self.assertIn("tableau_refresh_trigger_latency_seconds_count 5", lines)
+        self.assertIn('tableau_refresh_duration_seconds_bucket{le="120"} 0', lines)
+        self.assertIn('tableau_refresh_duration_seconds_bucket{le="300"} 1', lines)
+        self.assertIn("tableau_refresh_duration_seconds_sum 180.0", lines)
+        self.assertEqual(lines[-1], "# EOF")
+
+    def test_rest_calls_are_counted_by_endpoint(self):
+        receiver = _Receiver()
+        self.addCleanup(receiver.close)
+        session = requests.Session()
+        self.metrics.watch(session)
+
+        for task_id in ("0b5a1e2c-1111-4c6e-9a55-1f2d3c4b5a61", "9f8e7d6c-2222-4b3a-8c1d-0e9f8a7b6c5d"):
+            session.post(f"{receiver.url}/api/3.19/sites/{task_id}/tasks/extractRefreshes/{task_id}/runNow", timeout=5)
+        session.get(f"{receiver.url}/api/3.19/sites/0b5a1e2c-1111-4c6e-9a55-1f2d3c4b5a61/jobs?pageSize=1", timeout=5)
+        self.metrics.stop()
+        session.get(f"{receiver.url}/api/3.19/serverInfo", timeout=5)
+
+        lines = self.metrics.render().splitlines()
+        self.assertIn(
+            'tableau_refresh_rest_calls_total{method="POST",endpoint="/api/{version}/sites/{id}/tasks/extractRefreshes'
+            '/{id}/runNow"} 2',
+            lines,
+        )
+        self.assertIn(
+            'tableau_refresh_rest_calls_total{method="GET",endpoint="/api/{version}/sites/{id}/jobs"} 1', lines
+        )
+        self.assertFalse([line for line in lines if "serverInfo" in line])
+        self.assertEqual(session.hooks["response"], [])
+
+    def test_metrics_are_pushed_to_the_receiver(self):
+        receiver = _Receiver()
+        self.addCleanup(receiver.close)
+        self.metrics.observe_targets([_target(RefreshTarget.Outcome.Triggered)])
+
+        self.metrics.push(f"{receiver.url}/metrics/job/tableau_refresh")
+
+        ((method, path, content_type, body),) = receiver.requests
+        self.assertEqual((method, path), ("PUT", "/metrics/job/tableau_refresh"))
+        self.assertTrue(content_type.startswith("application/openmetrics-text"))
+        self.assertEqual(body.decode("utf-8"), self.metrics.render())
+
+    def test_failed_push_is_only_logged(self):
+        receiver = _Receiver(status=500)
+        self.addCleanup(receiver.close)
+
+        with self.assertLogs(level="WARNING"):
+            self.metrics.push(f"{receiver.url}/metrics/job/tableau_refresh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+
+from run_profile import ALLOCATIONS_FILE_NAME, COLLAPSED_STACKS_FILE_NAME, PSTATS_FILE_NAME, RunProfile
+
+
+def _build_items():
+    return [{"id": str(i), "name": f"item {i}"} for i in range(20000)]
+
+
+def _wait_in_worker():
+    time.sleep(0.1)
+
+
+class TestRunProfile(unittest.TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.out_dir.cleanup)
+
+    def test_profile_files_are_written(self):
+        profile = RunProfile(top_n=5)
+        profile.start()
+        worker = threading.Thread(target=_wait_in_worker, name="worker")
+        worker.start()
+        items = _build_items()
+        worker.join()
+        profile.stop()
+
+        paths = profile.write(self.out_dir.name)
+
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            [PSTATS_FILE_NAME, ALLOCATIONS_FILE_NAME, COLLAPSED_STACKS_FILE_NAME],
+        )
+        stats = pstats.Stats(paths[0])
+        self.assertIn("_build_items", {function for _, _, function in stats.stats})
+        with open(paths[1]) as allocations_file:
+            lines = allocations_file.read().splitlines()
+        self.assertTrue(lines[0].startswith("Top 5 of "))
+        self.assertLessEqual(len(lines), 6)
+        self.assertIn("test_run_profile.py", "\n".join(lines))
+        with open(paths[2]) as collapsed_file:
+            stacks = collapsed_file.read().splitlines()
+        worker_stacks = [stack for stack in stacks if stack.startswith("worker;")]
+        self.assertTrue(worker_stacks)
+        self.assertIn("_wait_in_worker (test_run_profile.py:", worker_stacks[0])
+        self.assertTrue(worker_stacks[0].rsplit(" ", 1)[1].isdigit())
+        self.assertEqual(len(items), 20000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from target_catalogue import TargetCatalogue
+
+
+class TestTargetCatalogue(unittest.TestCase):
+    @staticmethod
+    def _item(luid, name, project="Sales", tags=()):
+        item = mock.Mock(id=luid, project_name=project, tags=set(tags))
+        item.name = name  # must be set post-construction: Mock(name=...) sets the repr
+        return item
+
+    def setUp(self):
+        self.catalogue = TargetCatalogue()
+        self.orders = self._item("ds-1", "Orders", tags={"Prod"})
+        self.finance_orders = self._item("ds-2", "Orders", project="Finance")
+        self.dashboard = self._item("wb-1", "Orders")
+        self.catalogue.add_items("datasource", [self.orders, self.finance_orders, self.orders])
+        self.catalogue.add_items("workbook", [self.dashboard])
+
+    def test_items_are_found_by_luid_per_kind(self):
+        self.assertIs(self.catalogue.item("datasource", "ds-1"), self.orders)
+        self.assertIsNone(self.catalogue.item("workbook", "ds-1"))
+
+    def test_items_are_found_by_name_tag_and_project(self):
+        self.assertEqual(self.catalogue.find("datasource", "orders"), [self.orders, self.finance_orders])
+        self.assertEqual(self.catalogue.find("datasource", "Orders", tag="prod"), [self.orders])
+        self.assertEqual(self.catalogue.find("datasource", "Orders", project="Finance"), [self.finance_orders])
+        self.assertEqual(self.catalogue.find("workbook", "Orders"), [self.dashboard])
+        self.assertEqual(self.catalogue.find("datasource", "Orders", tag="dev"), [])
+
+    def test_tasks_are_found_by_target_and_type(self):
+        full = mock.Mock(task_type="RefreshExtractTask", target=mock.Mock(id="ds-1"))
+        incremental = mock.Mock(task_type="IncrementExtractTask", target=mock.Mock(id="ds-1"))
+        self.catalogue.set_tasks([full, incremental, mock.Mock(target=None)])
+
+        self.assertIs(self.catalogue.task("ds-1", "refreshextracttask"), full)
+        self.assertIs(self.catalogue.task("ds-1", "IncrementExtractTask"), incremental)
+        self.assertIsNone(self.catalogue.task("ds-2", "RefreshExtractTask"))
+
+        self.catalogue.set_tasks([incremental])
+        self.assertIsNone(self.catalogue.task("ds-1", "RefreshExtractTask"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+
+from tableauserverclient import Target
+
+from tableau_custom.custom_daos import TaskItem
+from task_snapshot import TaskSnapshot
+
+TAKEN_AT = datetime(2024, 5, 1, 12, 0, tzinfo=UTC)
+MAX_AGE = timedelta(hours=24)
+
+
+def _task(task_id, target_id, task_type="RefreshExtractTask"):
+    return TaskItem(task_id, task_type, 50, 0, "schedule-1", target=Target(target_id, "datasource"))
+
+
+class TestTaskSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tasks = [_task("t-1", "ds-1"), _task("t-2", "ds-2", "IncrementExtractTask")]
+        self.tasks[0].last_run_at = datetime(2024, 5, 1, 11, 0, tzinfo=UTC)
+        self.snapshot = TaskSnapshot(self.tasks, 2, TAKEN_AT)
+
+    def test_state_round_trip(self):
+        restored = TaskSnapshot.from_state(self.snapshot.to_state())
+
+        self.assertEqual(restored.total, 2)
+        self.assertEqual(restored.taken_at, TAKEN_AT)
+        self.assertEqual([t.id for t in restored.tasks], ["t-1", "t-2"])
+        self.assertEqual(restored.tasks[0].target.id, "ds-1")
+        self.assertEqual(restored.tasks[0].last_run_at, datetime(2024, 5, 1, 11, 0, tzinfo=UTC))
+        self.assertEqual(restored.tasks[1].task_type, "IncrementExtractTask")
+
+    def test_matches_only_an_unchanged_signature(self):
+        now = TAKEN_AT + timedelta(hours=1)
+
+        self.assertTrue(self.snapshot.matches(2, [_task("t-1", "ds-1")], now, MAX_AGE))
+        self.assertFalse(self.snapshot.matches(3, [_task("t-1", "ds-1")], now, MAX_AGE))
+        self.assertFalse(self.snapshot.matches(2, [_task("t-3", "ds-3")], now, MAX_AGE))
+        self.assertFalse(self.snapshot.matches(2, [_task("t-1", "ds-9")], now, MAX_AGE))
+        self.assertFalse(self.snapshot.matches(2, [_task("t-1", "ds-1")], TAKEN_AT + timedelta(days=2), MAX_AGE))
+
+    def test_moved_ids_or_an_unknown_total_do_not_match(self):
+        now = TAKEN_AT + timedelta(hours=1)
+
+        # t-1 deleted and t-3 added keep the total, but move t-2 up the list
+        self.assertFalse(self.snapshot.matches(2, [_task("t-2", "ds-2", "IncrementExtractTask")], now, MAX_AGE))
+        self.assertFalse(self.snapshot.matches(None, [_task("t-1", "ds-1")], now, MAX_AGE))
+        self.assertFalse(TaskSnapshot(self.tasks, None, TAKEN_AT).matches(None, [_task("t-1", "ds-1")], now, MAX_AGE))
+
+    def test_unreadable_state_is_no_snapshot(self):
+        self.assertIsNone(TaskSnapshot.from_state(None))
+        self.assertIsNone(TaskSnapshot.from_state({"total": 2, "tasks": [{"id": "t-1"}]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
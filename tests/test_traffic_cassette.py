@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import traffic_cassette
+from traffic_cassette import ReplayMissError, TrafficRecorder, TrafficReplay
+
+SIGN_IN_RESPONSE = (
+    '<tsResponse><credentials token="secret-session-token" estimatedTimeToExpiration="365:23:59">'
+    '<site id="site-luid" contentUrl="sales"/><user id="user-luid"/></credentials></tsResponse>'
+)
+
+
+class _TableauStandIn:
+    """A local HTTP server answering a sign-in and job polls the way Tableau would."""
+
+    def __init__(self):
+        self.job_polls = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self._answer(SIGN_IN_RESPONSE, cookie=True)
+
+            def do_GET(self):
+                stand_in.job_polls += 1
+                finish_code = 0 if stand_in.job_polls > 1 else -1
+                self._answer(f'<tsResponse><job id="job-1" finishCode="{finish_code}"/></tsResponse>')
+
+            def _answer(self, body, cookie=False):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml;charset=utf-8")
+                if cookie:
+                    self.send_header("Set-Cookie", "workgroup_session_id=secret-cookie")
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestTrafficCassette(unittest.TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.out_dir.cleanup)
+        self.cassette_path = os.path.join(self.out_dir.name, "tableau_traffic.json")
+
+    def _record(self):
+        stand_in = _TableauStandIn()
+        self.addCleanup(stand_in.close)
+        recorder = TrafficRecorder()
+        session = recorder.session_factory()
+        sign_in = '<credentials personalAccessTokenSecret="pat-secret"/>'
+        session.post(f"{stand_in.url}/api/3.19/auth/signin", data=sign_in)
+        session.get(f"{stand_in.url}/api/3.19/sites/site-luid/jobs/job-1")
+        session.get(f"{stand_in.url}/api/3.19/sites/site-luid/jobs/job-1")
+        recorder.save(self.cassette_path)
+
+    def test_secrets_are_not_recorded(self):
+        self._record()
+
+        with open(self.cassette_path) as cassette_file:
+            cassette = cassette_file.read()
+        self.assertNotIn("secret-session-token", cassette)
+        self.assertNotIn("secret-cookie", cassette)
+        self.assertNotIn("pat-secret", cassette)
+        self.assertNotIn("127.0.0.1", cassette)
+        sign_in = json.loads(cassette)["exchanges"][0]
+        self.assertEqual((sign_in["method"], sign_in["path"]), ("POST", "/api/3.19/auth/signin"))
+        self.assertIn('token="REDACTED"', sign_in["body"])
+        self.assertEqual(sign_in["headers"], {"Content-Type": "application/xml;charset=utf-8"})
+
+    def test_exchanges_are_replayed_in_order_without_a_server(self):
+        self._record()
+        session = TrafficReplay(self.cassette_path, latency_scale=0).session_factory()
+
+        sign_in = session.post("https://tableau.example/api/3.19/auth/signin", data="<credentials/>")
+        polls = [session.get("https://tableau.example/api/3.19/sites/site-luid/jobs/job-1") for _ in range(3)]
+
+        self.assertEqual(sign_in.status_code, 200)
+        self.assertIn('id="site-luid"', sign_in.text)
+        self.assertEqual(sign_in.headers["content-type"], "application/xml;charset=utf-8")
+        # the final state is served again once the recorded polls are used up
+        self.assertEqual([poll.text.count('finishCode="0"') for poll in polls], [0, 1, 1])
+        with self.assertRaises(ReplayMissError):
+            session.get("https://tableau.example/api/3.19/sites/site-luid/workbooks")
+
+    def test_latency_is_scaled(self):
+        exchange = {
+            "method": "GET",
+            "path": "/api/3.19/serverInfo",
+            "status": 200,
+            "headers": {},
+            "body": "<tsResponse/>",
+            "elapsed": 0.8,
+        }
+        with open(self.cassette_path, "w") as cassette_file:
+            json.dump({"exchanges": [exchange]}, cassette_file)
+        session = TrafficReplay(self.cassette_path, latency_scale=0.5).session_factory()
+
+        with mock.patch.object(traffic_cassette.time, "sleep") as sleep:
+            session.get("https://tableau.example/api/3.19/serverInfo")
+        sleep.assert_called_once_with(0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
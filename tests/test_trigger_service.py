@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from refresh_target import RefreshTarget
+from trigger_service import TriggerService
+
+
+def _wait_for(url, statuses=("succeeded", "failed"), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = requests.get(url, timeout=5).json()
+        if run["status"] in statuses:
+            return run
+        time.sleep(0.01)
+    raise AssertionError(f"The run did not finish in {timeout}s: {run}")
+
+
+class TestTriggerService(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = []
+        self.service = TriggerService(self._runner, lambda: [{"kind": "workbook", "name": "Sales"}])
+        self.url = f"http://127.0.0.1:{self.service.listen(0)}"
+        self.addCleanup(self.service.close)
+
+    def _runner(self, parameters, targets):
+        self.calls.append(parameters)
+        target = RefreshTarget(RefreshTarget.Kind.Workbook, "Sales", "wb-luid", mock.Mock())
+        target.outcome = RefreshTarget.Outcome.Triggered
+        target.job_id = "job-1"
+        targets.append(target)
+        self.release.wait(5)
+        if parameters.get("workbooks") == [{"name": "broken"}]:
+            raise ValueError("Workbook broken not found.")
+
+    def test_run_is_triggered_and_reported(self):
+        response = requests.post(f"{self.url}/runs", json={"workbooks": [{"name": "Sales"}]}, timeout=5)
+
+        self.assertEqual(response.status_code, 202)
+        run = _wait_for(f"{self.url}/runs/{response.json()['id']}")
+        self.assertEqual(run["status"], "succeeded")
+        self.assertEqual(run["targets"][0]["job_id"], "job-1")
+        self.assertEqual(run["targets"][0]["outcome"], "triggered")
+        self.assertEqual(self.calls, [{"workbooks": [{"name": "Sales"}]}])
+
+    def test_targets_are_reported_while_the_run_runs(self):
+        self.release.clear()
+        run_id = requests.post(f"{self.url}/runs", timeout=5).json()["id"]
+
+        run = _wait_for(f"{self.url}/runs/{run_id}", statuses=("running",))
+        while not run["targets"]:
+            run = requests.get(f"{self.url}/runs/{run_id}", timeout=5).json()
+        self.assertEqual(run["targets"][0]["luid"], "wb-luid")
+        self.release.set()
+        self.assertEqual(_wait_for(f"{self.url}/runs/{run_id}")["status"], "succeeded")
+        self.assertEqual(self.calls, [{}])
+
+    def test_failed_run_reports_its_error(self):
+        with self.assertLogs(level="ERROR"):
+            response = requests.post(f"{self.url}/runs", json={"workbooks": [{"name": "broken"}]}, timeout=5)
+            run_id = response.json()["id"]
+            run = _wait_for(f"{self.url}/runs/{run_id}")
+        self.assertEqual((run["status"], run["error"]), ("failed", "Workbook broken not found."))
+        self.assertEqual([listed["id"] for listed in requests.get(f"{self.url}/runs", timeout=5).json()], [run_id])
+
+    def test_invalid_requests_are_refused(self):
+        response = requests.post(f"{self.url}/runs", json={"token": "stolen"}, timeout=5)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cannot be set for a run: token", response.json()["error"])
+        self.assertEqual(requests.post(f"{self.url}/runs", data="{not json", timeout=5).status_code, 400)
+        self.assertEqual(requests.get(f"{self.url}/runs/unknown", timeout=5).status_code, 404)
+        self.assertEqual(self.calls, [])
+
+    def test_targets_are_listed(self):
+        response = requests.get(f"{self.url}/targets", timeout=5)
+
+        self.assertEqual(response.json(), [{"kind": "workbook", "name": "Sales"}])
+
+
+if __name__ == "__main__":
+    unittest.main()